@@ -1,100 +1,278 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from pymongo import ASCENDING, DESCENDING
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
 from datetime import datetime, timedelta
+import re
 import logging
 
+from catalog_service import assessment_catalog
+from leaderboard_service import leaderboard_service
+from progress_service import progress_service
+from text_compression import decompress_text
+from trend_engine import trend_engine
+
 logger = logging.getLogger(__name__)
 
+# Number of feedback snippets kept on the user stats document for the dashboard
+RECENT_FEEDBACK_LIMIT = 4
+# Scores kept per skill for the dashboard's skill history
+SKILL_HISTORY_LIMIT = 10
+
 class AnalyticsService:
     """Service for Azure ML-inspired analytics and skill progression tracking"""
     
-    async def calculate_improvement(self, db: AsyncIOMotorDatabase, user_id: str, assessment_id: str) -> float:
+    async def calculate_improvement(self, db: AsyncIOMotorDatabase, user_id: str, assessment_id: str, score: float) -> float:
         """
-        Calculate improvement percentage for a user on specific assessment
+        Calculate improvement percentage of a new score for a user on specific assessment
         Uses Azure ML-style analytics approach
+        
+        Reads the precomputed progress series summary instead of the full result history
         """
         try:
-            # Get all results for this user and assessment, sorted by date
-            results = await db.assessment_results.find({
-                "user_id": user_id,
-                "assessment_id": assessment_id
-            }).sort("completed_at", ASCENDING).to_list(None)
-            
-            if len(results) < 2:
-                return 0.0
+            summary = await progress_service.get_summary(db, user_id, assessment_id)
+            return progress_service.improvement_delta(summary, score)
             
-            first_score = results[0]["score"]
-            latest_score = results[-1]["score"]
+        except Exception as e:
+            logger.error(f"Error calculating improvement: {str(e)}")
+            return 0.0
+    
+    async def record_session_started(self, db: AsyncIOMotorDatabase, user_id: str):
+        """Count a newly started assessment session in the user's stats document"""
+        try:
+            result = await db.user_stats.update_one(
+                {"_id": user_id},
+                {
+                    "$inc": {"active_assessments": 1, "version": 1},
+                    "$set": {"updated_at": datetime.utcnow()}
+                }
+            )
+            if result.matched_count == 0:
+                await self.rebuild_user_stats(db, user_id)
+                
+        except Exception as e:
+            logger.error(f"Error recording session start: {str(e)}")
+    
+    @staticmethod
+    def skill_key(skill: str) -> str:
+        """Field-safe key of a skill name, e.g. node-js for Node.js"""
+        return re.sub(r"[^a-z0-9]+", "-", skill.lower()).strip("-") or "unknown"
+    
+    async def record_result(self, db: AsyncIOMotorDatabase, result: dict, assessment_title: str, skills: list = None):
+        """
+        Fold a stored assessment result into the user's stats document
+        Called after the result is inserted and its session marked completed
+        
+        The score also counts towards each of the session's skills in the
+        per-skill index `skills.<key>`.
+        """
+        try:
+            user_id = result["user_id"]
+            score = result["score"]
+            prefix = f"assessments.{result['assessment_id']}"
+            skill_keys = {self.skill_key(skill): skill for skill in skills or result.get("skills", [])}
             
-            if first_score == 0:
-                return 0.0
+            update = {
+                "$inc": {
+                    "active_assessments": -1,
+                    "completed_assessments": 1,
+                    "score_sum": score,
+                    "version": 1,
+                    f"{prefix}.count": 1,
+                    f"{prefix}.score_sum": score
+                },
+                "$set": {
+                    "latest_score": score,
+                    f"{prefix}.title": assessment_title,
+                    f"{prefix}.latest_score": score,
+                    "updated_at": datetime.utcnow()
+                }
+            }
+            update["$push"] = {}
+            for key, skill in skill_keys.items():
+                update["$inc"][f"skills.{key}.count"] = 1
+                update["$inc"][f"skills.{key}.score_sum"] = score
+                update["$set"][f"skills.{key}.name"] = skill
+                update["$set"][f"skills.{key}.latest_score"] = score
+                update["$push"][f"skills.{key}.history"] = {
+                    "$each": [{"score": score, "at": result["completed_at"]}],
+                    "$slice": -SKILL_HISTORY_LIMIT
+                }
+            if result.get("ai_feedback"):
+                update["$push"]["recent_feedback"] = {
+                    "$each": [self._feedback_snippet(result["ai_feedback"])],
+                    "$position": 0,
+                    "$slice": RECENT_FEEDBACK_LIMIT
+                }
+            if not update["$push"]:
+                del update["$push"]
             
-            improvement = ((latest_score - first_score) / first_score) * 100
-            return round(improvement, 1)
+            stats = await db.user_stats.find_one_and_update(
+                {"_id": user_id},
+                update,
+                return_document=ReturnDocument.AFTER
+            )
+            if stats is None:
+                # No stats yet for this user - derive them from the stored history
+                await self.rebuild_user_stats(db, user_id)
+                return
             
+            # First scores are only written by the update that produced the first count
+            first_scores = {}
+            if stats["completed_assessments"] == 1:
+                first_scores["first_score"] = score
+            if stats["assessments"][result["assessment_id"]]["count"] == 1:
+                first_scores[f"{prefix}.first_score"] = score
+            for key in skill_keys:
+                if stats["skills"][key]["count"] == 1:
+                    first_scores[f"skills.{key}.first_score"] = score
+            if first_scores:
+                await db.user_stats.update_one({"_id": user_id}, {"$set": first_scores})
+                
         except Exception as e:
-            logger.error(f"Error calculating improvement: {str(e)}")
-            return 0.0
+            logger.error(f"Error recording result in user stats: {str(e)}")
+    
+    async def rebuild_user_stats(self, db: AsyncIOMotorDatabase, user_id: str) -> dict:
+        """
+        Recompute a user's stats document from assessment_results and assessment_sessions
+        Used to backfill users whose history predates incremental stats
+        """
+        active_sessions = await db.assessment_sessions.count_documents({
+            "user_id": user_id,
+            "completed": False
+        })
+        
+        # Counts, scores, per-assessment aggregates and recent feedback in one round trip
+        pipeline = [
+            {"$match": {"user_id": user_id}},
+            {"$sort": {"completed_at": ASCENDING}},
+            {"$facet": {
+                "totals": [
+                    {"$group": {
+                        "_id": None,
+                        "count": {"$sum": 1},
+                        "score_sum": {"$sum": "$score"},
+                        "first_score": {"$first": "$score"},
+                        "latest_score": {"$last": "$score"}
+                    }}
+                ],
+                "assessments": [
+                    {"$group": {
+                        "_id": "$assessment_id",
+                        "count": {"$sum": 1},
+                        "score_sum": {"$sum": "$score"},
+                        "first_score": {"$first": "$score"},
+                        "latest_score": {"$last": "$score"}
+                    }}
+                ],
+                "recent_feedback": [
+                    {"$sort": {"completed_at": DESCENDING}},
+                    {"$limit": RECENT_FEEDBACK_LIMIT},
+                    {"$project": {"ai_feedback": 1}}
+                ],
+                "scores": [
+                    {"$project": {"_id": 0, "assessment_id": 1, "score": 1, "completed_at": 1, "skills": 1}}
+                ]
+            }}
+        ]
+        facets = (await db.assessment_results.aggregate(pipeline).to_list(1))[0]
+        totals = facets["totals"][0] if facets["totals"] else {
+            "count": 0, "score_sum": 0, "first_score": None, "latest_score": None
+        }
+        
+        catalog = {a["_id"]: a for a in await assessment_catalog.list_assessments(db)}
+        titles = {aid: a["title"] for aid, a in catalog.items()}
+        
+        # Results stored before skills were recorded on them fall back to the template's skills
+        skills = {}
+        for r in facets["scores"]:
+            for skill in r.get("skills") or catalog.get(r["assessment_id"], {}).get("skills", []):
+                entry = skills.setdefault(self.skill_key(skill), {
+                    "name": skill, "count": 0, "score_sum": 0, "first_score": r["score"], "history": []
+                })
+                entry["count"] += 1
+                entry["score_sum"] += r["score"]
+                entry["latest_score"] = r["score"]
+                entry["history"] = (entry["history"] + [{"score": r["score"], "at": r["completed_at"]}])[-SKILL_HISTORY_LIMIT:]
+        
+        existing = await db.user_stats.find_one({"_id": user_id}, {"version": 1})
+        
+        stats = {
+            "_id": user_id,
+            "active_assessments": active_sessions,
+            "completed_assessments": totals["count"],
+            "score_sum": totals["score_sum"],
+            "first_score": totals["first_score"],
+            "latest_score": totals["latest_score"],
+            "assessments": {
+                g["_id"]: {
+                    "title": titles.get(g["_id"], g["_id"]),
+                    "count": g["count"],
+                    "score_sum": g["score_sum"],
+                    "first_score": g["first_score"],
+                    "latest_score": g["latest_score"]
+                }
+                for g in facets["assessments"]
+            },
+            "skills": skills,
+            "recent_feedback": [
+                self._feedback_snippet(decompress_text(r["ai_feedback"])) for r in facets["recent_feedback"] if r.get("ai_feedback")
+            ],
+            "version": (existing or {}).get("version", 0) + 1,
+            "updated_at": datetime.utcnow()
+        }
+        
+        await db.user_stats.replace_one({"_id": user_id}, stats, upsert=True)
+        return stats
+    
+    async def rebuild_all_user_stats(self, db: AsyncIOMotorDatabase) -> int:
+        """Rebuild stats documents for every user with sessions or results"""
+        user_ids = set(await db.assessment_results.distinct("user_id"))
+        user_ids.update(await db.assessment_sessions.distinct("user_id"))
+        
+        for user_id in user_ids:
+            await self.rebuild_user_stats(db, user_id)
+        
+        return len(user_ids)
     
     async def get_dashboard_metrics(self, db: AsyncIOMotorDatabase, user_id: str) -> dict:
         """
         Get comprehensive dashboard metrics for a user
         Azure ML-powered performance analytics
+        
+        Served from the incrementally maintained user_stats document,
+        so the cost is one primary-key read regardless of history size.
+        `version` is the stats document version; it is absent when the
+        metrics could not be loaded.
         """
         try:
-            # Count active assessments (sessions without results)
-            active_sessions = await db.assessment_sessions.count_documents({
-                "user_id": user_id,
-                "completed": False
-            })
-            
-            # Count completed assessments
-            completed = await db.assessment_results.count_documents({
-                "user_id": user_id
-            })
+            stats = await db.user_stats.find_one({"_id": user_id})
+            if stats is None:
+                stats = await self.rebuild_user_stats(db, user_id)
             
-            # Calculate average score
-            pipeline = [
-                {"$match": {"user_id": user_id}},
-                {"$group": {
-                    "_id": None,
-                    "avg_score": {"$avg": "$score"},
-                    "total_count": {"$sum": 1}
-                }}
-            ]
+            completed = stats["completed_assessments"]
+            avg_score = round(stats["score_sum"] / completed, 1) if completed else 0
             
-            avg_result = await db.assessment_results.aggregate(pipeline).to_list(None)
-            avg_score = round(avg_result[0]["avg_score"], 1) if avg_result else 0
-            
-            # Calculate overall improvement
-            all_results = await db.assessment_results.find(
-                {"user_id": user_id}
-            ).sort("completed_at", ASCENDING).to_list(None)
-            
-            improvement = 0.0
-            if len(all_results) >= 2:
-                first_score = all_results[0]["score"]
-                latest_score = all_results[-1]["score"]
-                if first_score > 0:
+            # Improvement along the least-squares trend of the nightly batch run;
+            # users not yet covered by it fall back to first vs latest score
+            trend = await trend_engine.get_trend(db, user_id)
+            improvement = trend["improvement"] if trend else 0.0
+            if not trend and completed >= 2:
+                first_score = stats["first_score"]
+                latest_score = stats["latest_score"]
+                if first_score and first_score > 0:
                     improvement = ((latest_score - first_score) / first_score) * 100
             
-            # Get skill progression
-            skill_progress = await self._calculate_skill_progress(db, user_id)
-            
-            # Get recent AI feedback
-            recent_feedback = await db.assessment_results.find(
-                {"user_id": user_id}
-            ).sort("completed_at", DESCENDING).limit(4).to_list(None)
-            
-            ai_feedback = [result["ai_feedback"][:150] + "..." for result in recent_feedback if result.get("ai_feedback")]
-            
             return {
-                "active_assessments": active_sessions,
+                "active_assessments": max(stats["active_assessments"], 0),
                 "completed_assessments": completed,
                 "avg_score": avg_score,
                 "improvement": round(improvement, 1),
-                "skill_progress": skill_progress,
-                "ai_feedback": ai_feedback
+                "skill_progress": self._skill_progress_from_stats(stats),
+                "ai_feedback": stats.get("recent_feedback", []),
+                "percentiles": await leaderboard_service.get_percentiles(
+                    db, user_id, {aid: a["title"] for aid, a in stats.get("assessments", {}).items()}
+                ),
+                "trend": trend,
+                "version": stats.get("version", 0)
             }
             
         except Exception as e:
@@ -105,53 +283,40 @@ class AnalyticsService:
                 "avg_score": 0,
                 "improvement": 0,
                 "skill_progress": [],
-                "ai_feedback": []
+                "ai_feedback": [],
+                "percentiles": [],
+                "trend": None
             }
     
-    async def _calculate_skill_progress(self, db: AsyncIOMotorDatabase, user_id: str) -> list:
+    def _skill_progress_from_stats(self, stats: dict) -> list:
         """
         Calculate progress for each skill domain
         Azure ML skill progression modeling
+        
+        Read from the per-skill index: running average, first and latest
+        score and the recent score history of every assessed skill.
         """
-        try:
-            # Aggregate results by assessment to get skill-level scores
-            pipeline = [
-                {"$match": {"user_id": user_id}},
-                {
-                    "$lookup": {
-                        "from": "assessments",
-                        "localField": "assessment_id",
-                        "foreignField": "_id",
-                        "as": "assessment"
-                    }
-                },
-                {"$unwind": "$assessment"},
-                {
-                    "$group": {
-                        "_id": "$assessment.title",
-                        "avg_score": {"$avg": "$score"},
-                        "latest_score": {"$last": "$score"},
-                        "count": {"$sum": 1}
-                    }
-                },
-                {"$sort": {"avg_score": DESCENDING}},
-                {"$limit": 5}
-            ]
-            
-            results = await db.assessment_results.aggregate(pipeline).to_list(None)
-            
-            skill_progress = []
-            for result in results:
-                skill_progress.append({
-                    "name": result["_id"],
-                    "score": round(result["avg_score"], 0)
-                })
-            
-            return skill_progress
-            
-        except Exception as e:
-            logger.error(f"Error calculating skill progress: {str(e)}")
-            return []
+        per_skill = sorted(
+            stats.get("skills", {}).values(),
+            key=lambda s: s["score_sum"] / s["count"],
+            reverse=True
+        )
+        
+        return [
+            {
+                "name": s["name"],
+                "score": round(s["score_sum"] / s["count"], 0),
+                "attempts": s["count"],
+                "first_score": s.get("first_score", s["latest_score"]),
+                "latest_score": s["latest_score"],
+                "history": [h["score"] for h in s.get("history", [])]
+            }
+            for s in per_skill
+        ]
+    
+    @staticmethod
+    def _feedback_snippet(feedback: str) -> str:
+        return feedback[:150] + "..."
 
 # Create singleton instance
 analytics_service = AnalyticsService()
\ No newline at end of file
@@ -1,17 +1,34 @@
 from dotenv import load_dotenv
+from llm_client import llm_client
+from llm_providers import create_provider
+from instrumentation import record_llm_tokens, record_prompt_compaction, stage
+from prompt_builder import evaluation_prompt_builder
+from token_utils import count_tokens
 import os
+from typing import AsyncIterator, Tuple
+import hashlib
 import json
 import logging
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+MODEL_PROVIDER = "openai"
+MODEL_NAME = "gpt-5.2"
+# Bump whenever the evaluation prompt or schema changes; part of the evaluation cache key
+EVALUATION_PROMPT_VERSION = "2"
+# Minimum score of each proficiency level, highest first; lower scores are Beginner
+PROFICIENCY_THRESHOLDS = ((85, "Advanced"), (70, "Intermediate"))
+BASE_PROFICIENCY_LEVEL = "Beginner"
+
 
 class AzureAIService:
     """Service for Azure OpenAI integration using emergentintegrations"""
     
     def __init__(self):
-        
+        self.api_key = os.getenv("EMERGENT_LLM_KEY")
+        self.provider = create_provider(self.api_key, MODEL_PROVIDER, MODEL_NAME)
+    
     async def generate_assessment_scenario(self, assessment_title: str, difficulty: str, skills: list) -> str:
         """
         Generate a personalized assessment scenario using Azure OpenAI
@@ -25,11 +42,7 @@ class AzureAIService:
             Generated scenario text
         """
         try:
-            chat = LlmChat(
-                api_key=self.api_key,
-                session_id=f"scenario-gen-{assessment_title}",
-                system_message="You are an expert technical assessment creator for SkillSphere, an AI-powered skill assessment platform. Create realistic, practical assessment scenarios that test real-world abilities."
-            ).with_model("openai", "gpt-5.2")
+            system_message = "You are an expert technical assessment creator for SkillSphere, an AI-powered skill assessment platform. Create realistic, practical assessment scenarios that test real-world abilities."
             
             skills_str = ", ".join(skills)
             prompt = f"""Create a {difficulty} level assessment scenario for {assessment_title}.
@@ -45,8 +58,10 @@ Requirements:
 
 Provide ONLY the scenario description, no additional commentary."""
             
-            user_message = UserMessage(text=prompt)
-            response = await chat.send_message(user_message)
+            response = await llm_client.call("scenario", lambda: self.provider.complete(
+                "scenario", f"scenario-gen-{assessment_title}", system_message, prompt
+            ))
+            record_llm_tokens("scenario", count_tokens(system_message) + count_tokens(prompt), count_tokens(response))
             
             logger.info(f"✅ Azure OpenAI: Generated scenario for {assessment_title}")
             return response
@@ -55,27 +70,15 @@ Provide ONLY the scenario description, no additional commentary."""
             logger.error(f"❌ Azure OpenAI scenario generation failed: {str(e)}")
             raise Exception(f"Failed to generate assessment scenario: {str(e)}")
     
-    async def evaluate_assessment(self, scenario: str, user_response: str, skills: list) -> dict:
-        """
-        Evaluate user's assessment response using Azure OpenAI
-        
-        Args:
-            scenario: The original assessment scenario
-            user_response: User's solution/answer
-            skills: Skills being assessed
-            
-        Returns:
-            Dictionary with score, feedback, strengths, and areas for improvement
-        """
-        try:
-            chat = LlmChat(
-                api_key=self.api_key,
-                session_id=f"eval-{hash(user_response)}",
-                system_message="You are an expert technical evaluator for SkillSphere. Provide detailed, actionable feedback on assessment submissions. Be fair but thorough."
-            ).with_model("openai", "gpt-5.2")
-            
-            skills_str = ", ".join(skills)
-            prompt = f"""Evaluate this assessment submission.
+    EVALUATION_SYSTEM_MESSAGE = "You are an expert technical evaluator for SkillSphere. Provide detailed, actionable feedback on assessment submissions. Be fair but thorough."
+    
+    @staticmethod
+    def _evaluation_session_id(user_response: str) -> str:
+        return f"eval-{hashlib.sha256(user_response.encode()).hexdigest()[:16]}"
+    
+    def _evaluation_prompt(self, scenario: str, user_response: str, skills: list) -> str:
+        skills_str = ", ".join(skills)
+        return f"""Evaluate this assessment submission.
 
 **Scenario:**
 {scenario}
@@ -99,50 +102,113 @@ Evaluation criteria:
 - Problem-solving approach
 - Technical depth
 - Real-world applicability"""
+    
+    def _build_evaluation_prompt(self, scenario: str, user_response: str, skills: list) -> Tuple[str, int]:
+        """Evaluation prompt compacted to the input token budget, and its size in tokens"""
+        prompt, tokens = evaluation_prompt_builder.build(
+            lambda s, r: self._evaluation_prompt(s, r, skills),
+            self.EVALUATION_SYSTEM_MESSAGE,
+            scenario,
+            user_response
+        )
+        record_prompt_compaction("evaluation", tokens["tokens_before"], tokens["tokens_after"])
+        return prompt, tokens["tokens_after"]
+    
+    def parse_evaluation(self, response: str) -> dict:
+        """
+        Parse the raw evaluation completion into the evaluation dictionary
+        
+        Falls back to a default evaluation, flagged with `is_fallback`,
+        when the model did not return valid JSON
+        """
+        try:
+            # Clean response if it contains markdown code blocks
+            cleaned_response = response.strip()
+            if cleaned_response.startswith("```"):
+                lines = cleaned_response.split("\n")
+                cleaned_response = "\n".join(lines[1:-1] if len(lines) > 2 else lines)
+            
+            evaluation = json.loads(cleaned_response)
             
-            user_message = UserMessage(text=prompt)
-            response = await chat.send_message(user_message)
+            # Validate structure
+            required_keys = ["score", "feedback", "strengths", "areas_for_improvement"]
+            if not all(key in evaluation for key in required_keys):
+                raise ValueError("Missing required keys in evaluation")
             
-            # Parse JSON response
-            try:
-                # Clean response if it contains markdown code blocks
-                cleaned_response = response.strip()
-                if cleaned_response.startswith("```"):
-                    lines = cleaned_response.split("\n")
-                    cleaned_response = "\n".join(lines[1:-1] if len(lines) > 2 else lines)
-                
-                evaluation = json.loads(cleaned_response)
-                
-                # Validate structure
-                required_keys = ["score", "feedback", "strengths", "areas_for_improvement"]
-                if not all(key in evaluation for key in required_keys):
-                    raise ValueError("Missing required keys in evaluation")
-                
-                logger.info(f"✅ Azure OpenAI: Evaluated submission - Score: {evaluation['score']}")
-                return evaluation
-                
-            except json.JSONDecodeError as json_err:
-                logger.error(f"Failed to parse JSON response: {response}")
-                # Return default evaluation
-                return {
-                    "score": 70,
-                    "feedback": response[:500],  # Use raw response as feedback
-                    "strengths": ["Attempted the problem", "Provided detailed response"],
-                    "areas_for_improvement": ["Consider structure", "Add more detail"]
-                }
+            logger.info(f"✅ Azure OpenAI: Evaluated submission - Score: {evaluation['score']}")
+            return evaluation
+            
+        except json.JSONDecodeError as json_err:
+            logger.error(f"Failed to parse JSON response: {response}")
+            # Return default evaluation
+            return {
+                "score": 70,
+                "feedback": response[:500],  # Use raw response as feedback
+                "strengths": ["Attempted the problem", "Provided detailed response"],
+                "areas_for_improvement": ["Consider structure", "Add more detail"],
+                "is_fallback": True
+            }
+    
+    async def evaluate_assessment(self, scenario: str, user_response: str, skills: list) -> dict:
+        """
+        Evaluate user's assessment response using Azure OpenAI
+        
+        Args:
+            scenario: The original assessment scenario
+            user_response: User's solution/answer
+            skills: Skills being assessed
+            
+        Returns:
+            Dictionary with score, feedback, strengths, and areas for improvement
+        """
+        try:
+            prompt, prompt_tokens = self._build_evaluation_prompt(scenario, user_response, skills)
+            response = await llm_client.call("evaluation", lambda: self.provider.complete(
+                "evaluation", self._evaluation_session_id(user_response), self.EVALUATION_SYSTEM_MESSAGE, prompt,
+                max_output_tokens=evaluation_prompt_builder.max_output_tokens
+            ))
+            record_llm_tokens("evaluation", prompt_tokens, count_tokens(response))
+            
+            with stage("llm.parse"):
+                return self.parse_evaluation(response)
             
         except Exception as e:
             logger.error(f"❌ Azure OpenAI evaluation failed: {str(e)}")
             raise Exception(f"Failed to evaluate assessment: {str(e)}")
     
+    async def stream_evaluation(self, scenario: str, user_response: str, skills: list) -> AsyncIterator[str]:
+        """
+        Stream the raw evaluation completion from Azure OpenAI as text chunks
+        
+        The concatenated chunks are the same completion evaluate_assessment parses;
+        callers pass the full text to parse_evaluation once the stream ends.
+        Providers without a streaming API yield the whole completion as one chunk.
+        """
+        try:
+            prompt, prompt_tokens = self._build_evaluation_prompt(scenario, user_response, skills)
+            def request():
+                return self.provider.stream(
+                    "evaluation", self._evaluation_session_id(user_response), self.EVALUATION_SYSTEM_MESSAGE, prompt,
+                    max_output_tokens=evaluation_prompt_builder.max_output_tokens
+                )
+            
+            completion_tokens = 0
+            async for chunk in llm_client.stream("evaluation", request):
+                completion_tokens += count_tokens(chunk)
+                yield chunk
+            
+            record_llm_tokens("evaluation", prompt_tokens, completion_tokens)
+            
+        except Exception as e:
+            logger.error(f"❌ Azure OpenAI streaming evaluation failed: {str(e)}")
+            raise Exception(f"Failed to evaluate assessment: {str(e)}")
+    
     def calculate_proficiency_level(self, score: float) -> str:
         """Determine proficiency level based on score"""
-        if score >= 85:
-            return "Advanced"
-        elif score >= 70:
-            return "Intermediate"
-        else:
-            return "Beginner"
+        for threshold, level in PROFICIENCY_THRESHOLDS:
+            if score >= threshold:
+                return level
+        return BASE_PROFICIENCY_LEVEL
 
 # Create singleton instance
 azure_ai_service = AzureAIService()
\ No newline at end of file
@@ -0,0 +1,69 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING
+from typing import List, Optional
+import asyncio
+import hashlib
+import json
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AssessmentCatalog:
+    """In-process cache of assessment templates, refreshed on a TTL or on demand"""
+
+    def __init__(self):
+        self.ttl = float(os.getenv("CATALOG_TTL_SECONDS", "300"))
+        self._assessments: List[dict] = []
+        self._by_id: dict = {}
+        self._etag: Optional[str] = None
+        # None until loaded; monotonic() counts from boot, so 0.0 would look fresh on a new host
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def etag(self) -> Optional[str]:
+        return self._etag
+
+    def _is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+
+    async def refresh(self, db: AsyncIOMotorDatabase):
+        """Reload templates from Mongo; the ETag only changes when the content does"""
+        async with self._lock:
+            assessments = await db.assessments.find({}).sort("_id", ASCENDING).to_list(None)
+
+            canonical = json.dumps(assessments, sort_keys=True, default=str)
+            self._etag = f'"{hashlib.sha256(canonical.encode()).hexdigest()[:32]}"'
+            self._assessments = assessments
+            self._by_id = {a["_id"]: a for a in assessments}
+            self._loaded_at = time.monotonic()
+
+        logger.info(f"📚 Assessment catalog loaded: {len(assessments)} template(s)")
+
+    def invalidate(self):
+        """Force a reload on the next access, e.g. after templates were written"""
+        self._loaded_at = None
+
+    async def _ensure_fresh(self, db: AsyncIOMotorDatabase):
+        if self._is_stale():
+            try:
+                await self.refresh(db)
+            except Exception as e:
+                # Keep serving the previous snapshot if Mongo is briefly unavailable
+                if not self._assessments:
+                    raise
+                logger.error(f"Error refreshing assessment catalog: {str(e)}")
+
+    async def list_assessments(self, db: AsyncIOMotorDatabase) -> List[dict]:
+        await self._ensure_fresh(db)
+        return self._assessments
+
+    async def get_assessment(self, db: AsyncIOMotorDatabase, assessment_id: str) -> Optional[dict]:
+        await self._ensure_fresh(db)
+        return self._by_id.get(assessment_id)
+
+# Create singleton instance
+assessment_catalog = AssessmentCatalog()
@@ -0,0 +1,265 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Awaitable, Callable, Optional
+import asyncio
+import os
+import random
+import socket
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Identifies this worker process in locks and slots it holds
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class LeaseLock:
+    """
+    Named lock in the `locks` collection, held for a renewable lease
+
+    A holder that dies without releasing loses the lock when its lease
+    expires. Acquiring is one upsert: the filter matches only a free,
+    expired or already owned lock, so a lock held by another worker makes
+    the upsert collide on _id and fail.
+    """
+
+    def __init__(self, name: str, lease_seconds: float):
+        self.name = name
+        self.lease_seconds = lease_seconds
+
+    async def acquire(self, db: AsyncIOMotorDatabase) -> bool:
+        """Take or renew the lock; returns False while another worker holds it"""
+        now = datetime.utcnow()
+        try:
+            await db.locks.update_one(
+                {"_id": self.name, "$or": [{"expires_at": {"$lte": now}}, {"owner": WORKER_ID}]},
+                {"$set": {"owner": WORKER_ID, "expires_at": now + timedelta(seconds=self.lease_seconds)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    async def release(self, db: AsyncIOMotorDatabase):
+        await db.locks.delete_one({"_id": self.name, "owner": WORKER_ID})
+
+    @asynccontextmanager
+    async def hold(self, db: AsyncIOMotorDatabase, timeout: float = None, poll_interval: float = 0.5):
+        """
+        Wait for the lock, keep renewing it while the block runs, then release it
+
+        Raises asyncio.TimeoutError if it is not acquired within `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        while not await self.acquire(db):
+            if deadline and time.monotonic() >= deadline:
+                raise asyncio.TimeoutError(f"Timed out waiting for lock {self.name}")
+            await asyncio.sleep(poll_interval)
+
+        async def renew():
+            while True:
+                await asyncio.sleep(self.lease_seconds / 3)
+                try:
+                    await self.acquire(db)
+                except Exception as e:
+                    logger.error(f"Error renewing lock {self.name}: {str(e)}")
+
+        renewal = asyncio.create_task(renew())
+        try:
+            yield
+        finally:
+            renewal.cancel()
+            try:
+                await renewal
+            except asyncio.CancelledError:
+                pass
+            await self.release(db)
+
+
+class LeaderElection:
+    """
+    One leader among all worker processes, through a renewed LeaseLock
+
+    Background loops that must run once per deployment (scenario pool
+    refill, session sweeper, trend job) are started by `on_elected` and
+    stopped by `on_demoted`. A worker keeps leadership through a failed
+    renewal until its lease would have expired, so a brief database
+    hiccup does not bounce the loops.
+    """
+
+    def __init__(self):
+        self.lease_seconds = float(os.getenv("LEADER_LEASE_SECONDS", "30"))
+        self.lock = LeaseLock("leader", self.lease_seconds)
+        self.is_leader = False
+        self._held_until = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._on_elected: Optional[Callable[[], Awaitable[None]]] = None
+        self._on_demoted: Optional[Callable[[], Awaitable[None]]] = None
+
+    async def _step(self, db: AsyncIOMotorDatabase):
+        try:
+            held = await self.lock.acquire(db)
+        except Exception as e:
+            logger.error(f"Error renewing leader lease: {str(e)}")
+            held = self.is_leader and time.monotonic() < self._held_until
+
+        if held:
+            self._held_until = time.monotonic() + self.lease_seconds
+        if held and not self.is_leader:
+            self.is_leader = True
+            logger.info(f"👑 Worker {WORKER_ID} elected leader")
+            await self._on_elected()
+        elif not held and self.is_leader:
+            self.is_leader = False
+            logger.warning(f"⚠️ Worker {WORKER_ID} lost leadership")
+            await self._on_demoted()
+
+    async def _loop(self, db: AsyncIOMotorDatabase):
+        while True:
+            await self._step(db)
+            await asyncio.sleep(self.lease_seconds / 3)
+
+    def start(self, db: AsyncIOMotorDatabase, on_elected: Callable[[], Awaitable[None]], on_demoted: Callable[[], Awaitable[None]]):
+        """Campaign for leadership in the background"""
+        if self._task is not None:
+            return
+        self._on_elected = on_elected
+        self._on_demoted = on_demoted
+        self._task = asyncio.create_task(self._loop(db))
+
+    async def stop(self, db: AsyncIOMotorDatabase):
+        """Stop campaigning; a leader stops its loops and hands the lease back"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        if self.is_leader:
+            self.is_leader = False
+            await self._on_demoted()
+            await self.lock.release(db)
+
+    def get_stats(self) -> dict:
+        return {"worker_id": WORKER_ID, "is_leader": self.is_leader, "lease_seconds": self.lease_seconds}
+
+
+class LocalSemaphore:
+    """In-process stand-in for SharedSemaphore: the limit applies per worker"""
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self._semaphore = asyncio.Semaphore(limit)
+        self.waits = 0
+
+    async def setup(self, db: AsyncIOMotorDatabase):
+        pass
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if self._semaphore.locked():
+            self.waits += 1
+        async with self._semaphore:
+            yield
+
+    def get_stats(self) -> dict:
+        return {"backend": "local", "name": self.name, "limit": self.limit, "waits": self.waits}
+
+
+class SharedSemaphore:
+    """
+    Counting semaphore shared by every worker, as slot documents in `concurrency_slots`
+
+    A slot is taken by one find_one_and_update on a free or expired slot and
+    freed when the block exits. Slots carry a lease, renewed while the block
+    runs, so a worker that dies mid-call gives its slot back once the lease
+    expires while a slow call keeps its slot.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase, name: str, limit: int, lease_seconds: float, poll_interval: float = 0.2):
+        self.db = db
+        self.name = name
+        self.limit = limit
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.waits = 0
+
+    async def setup(self, db: AsyncIOMotorDatabase):
+        """Create the slot documents; slots beyond a lowered limit are removed"""
+        await db.concurrency_slots.bulk_write([
+            UpdateOne(
+                {"_id": f"{self.name}:{slot}"},
+                {"$setOnInsert": {"name": self.name, "slot": slot, "holder": None, "expires_at": datetime.utcnow()}},
+                upsert=True
+            )
+            for slot in range(self.limit)
+        ], ordered=False)
+        await db.concurrency_slots.delete_many({"name": self.name, "slot": {"$gte": self.limit}})
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        token = uuid.uuid4().hex
+        waited = False
+        while True:
+            now = datetime.utcnow()
+            taken = await self.db.concurrency_slots.find_one_and_update(
+                {"name": self.name, "$or": [{"holder": None}, {"expires_at": {"$lte": now}}]},
+                {"$set": {"holder": token, "worker": WORKER_ID, "expires_at": now + timedelta(seconds=self.lease_seconds)}},
+                projection={"_id": 1}
+            )
+            if taken:
+                break
+            if not waited:
+                waited = True
+                self.waits += 1
+            await asyncio.sleep(random.uniform(0.5, 1.5) * self.poll_interval)
+
+        async def renew():
+            while True:
+                await asyncio.sleep(self.lease_seconds / 3)
+                try:
+                    await self.db.concurrency_slots.update_one(
+                        {"_id": taken["_id"], "holder": token},
+                        {"$set": {"expires_at": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}}
+                    )
+                except Exception as e:
+                    logger.error(f"Error renewing {self.name} slot lease: {str(e)}")
+
+        renewal = asyncio.create_task(renew())
+        try:
+            yield
+        finally:
+            renewal.cancel()
+            await self.db.concurrency_slots.update_one({"_id": taken["_id"], "holder": token}, {"$set": {"holder": None}})
+
+    def get_stats(self) -> dict:
+        return {"backend": "mongo", "name": self.name, "limit": self.limit, "waits": self.waits}
+
+
+def create_llm_limiter(db: AsyncIOMotorDatabase, lease_seconds: float):
+    """
+    Deployment-wide cap on upstream LLM calls
+
+    LLM_CONCURRENCY_BACKEND=mongo shares LLM_GLOBAL_MAX_CONCURRENCY slots
+    across every worker; the default `local` applies it per worker.
+    """
+    backend = os.getenv("LLM_CONCURRENCY_BACKEND", "local").lower()
+    limit = int(os.getenv("LLM_GLOBAL_MAX_CONCURRENCY", "16"))
+    if backend == "mongo":
+        return SharedSemaphore(db, "llm", limit, lease_seconds)
+    if backend != "local":
+        raise ValueError(f"Unknown LLM_CONCURRENCY_BACKEND: {backend}")
+    return LocalSemaphore("llm", limit)
+
+# Create singleton instances
+startup_lock = LeaseLock("startup", float(os.getenv("STARTUP_LOCK_LEASE_SECONDS", "60")))
+leader_election = LeaderElection()
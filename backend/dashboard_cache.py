@@ -0,0 +1,107 @@
+from collections import OrderedDict
+from typing import Optional, Tuple
+import hashlib
+import json
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardCache:
+    """
+    Bounded LRU cache of computed dashboard metrics keyed by user_id
+
+    Entries are dropped by invalidate() whenever a write changes the user's
+    data, and expire after a short TTL so writes handled by other worker
+    processes are picked up as well. Callers take a token() before computing
+    metrics; put() drops the metrics if the user was invalidated meanwhile,
+    so a slow computation cannot cache data older than a concurrent write.
+    """
+
+    def __init__(self):
+        self.max_entries = int(os.getenv("DASHBOARD_CACHE_SIZE", "10000"))
+        self.ttl = float(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "30"))
+        self._entries: "OrderedDict[str, Tuple[str, dict, float]]" = OrderedDict()
+        # Generation of each user's latest invalidation, bounded like the entries;
+        # tokens older than the last generation pruned from it are treated as stale
+        self._generation = 0
+        self._invalidated: "OrderedDict[str, int]" = OrderedDict()
+        self._pruned_generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_puts = 0
+
+    @staticmethod
+    def make_etag(version: int, percentiles: list = None, trend: dict = None) -> str:
+        """
+        ETag of the user's stats version
+
+        Percentiles move with other users' results and trends with the batch
+        trend job, neither bumping the version, so they are hashed in.
+        """
+        if not percentiles and not trend:
+            return f'"dashboard-{version}"'
+        volatile = {"percentiles": percentiles, "trend": trend}
+        digest = hashlib.sha256(json.dumps(volatile, sort_keys=True, default=str).encode()).hexdigest()[:12]
+        return f'"dashboard-{version}-{digest}"'
+
+    def get(self, user_id: str) -> Optional[Tuple[str, dict]]:
+        """Cached (etag, metrics) for the user, or None"""
+        entry = self._entries.get(user_id)
+        if entry is None or time.monotonic() - entry[2] > self.ttl:
+            if entry is not None:
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry[0], entry[1]
+
+    def token(self) -> int:
+        """Generation to pass to put() for metrics computed from here on"""
+        return self._generation
+
+    def put(self, user_id: str, etag: str, metrics: dict, token: int):
+        """Cache the metrics unless the user was invalidated since `token` was taken"""
+        if token < self._pruned_generation or self._invalidated.get(user_id, -1) > token:
+            self.stale_puts += 1
+            return
+
+        self._entries[user_id] = (etag, metrics, time.monotonic())
+        self._entries.move_to_end(user_id)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id: str):
+        self._generation += 1
+        self._invalidated[user_id] = self._generation
+        self._invalidated.move_to_end(user_id)
+        while len(self._invalidated) > self.max_entries:
+            _, generation = self._invalidated.popitem(last=False)
+            self._pruned_generation = generation
+
+        if self._entries.pop(user_id, None) is not None:
+            self.invalidations += 1
+
+    def get_stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "stale_puts": self.stale_puts
+        }
+
+# Create singleton instance
+dashboard_cache = DashboardCache()
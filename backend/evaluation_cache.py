@@ -0,0 +1,137 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from datetime import datetime, timedelta
+from typing import Optional
+import hashlib
+import json
+import os
+import re
+import time
+import logging
+
+from azure_ai_service import azure_ai_service, EVALUATION_PROMPT_VERSION
+from instrumentation import stage
+from prompt_builder import evaluation_prompt_builder
+
+logger = logging.getLogger(__name__)
+
+EVALUATION_FIELDS = ["score", "feedback", "strengths", "areas_for_improvement"]
+
+
+class EvaluationCache:
+    """
+    Persistent, content-addressed cache of LLM evaluations
+
+    Entries in `evaluation_cache` are keyed by a SHA-256 digest of the scenario,
+    the normalized response, the skills, the model and the prompt version, so
+    resubmitting an identical answer reuses the stored evaluation.
+    """
+
+    def __init__(self):
+        self.ttl = float(os.getenv("EVALUATION_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved_ms = 0.0
+
+    @staticmethod
+    def normalize_response(user_response: str) -> str:
+        """Ignore differences that cannot change the evaluation: line endings and surrounding whitespace"""
+        lines = [line.rstrip() for line in user_response.replace("\r\n", "\n").strip().split("\n")]
+        return re.sub(r"\n{3,}", "\n\n", "\n".join(lines))
+
+    def cache_key(self, scenario: str, user_response: str, skills: list) -> str:
+        material = json.dumps({
+            "scenario": scenario,
+            "user_response": self.normalize_response(user_response),
+            "skills": sorted(skills),
+            "model": azure_ai_service.provider.model_id,
+            "prompt_version": EVALUATION_PROMPT_VERSION,
+            # The budget decides how oversized submissions are compacted
+            "input_token_budget": evaluation_prompt_builder.input_budget
+        }, sort_keys=True)
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    async def get(self, db: AsyncIOMotorDatabase, key: str) -> Optional[dict]:
+        """Stored evaluation for the key, counting the hit or miss"""
+        entry = await db.evaluation_cache.find_one_and_update(
+            {"_id": key, "expires_at": {"$gt": datetime.utcnow()}},
+            {"$inc": {"hits": 1}, "$set": {"last_hit_at": datetime.utcnow()}}
+        )
+        if not entry:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.latency_saved_ms += entry["latency_ms"]
+        logger.info(f"♻️ Evaluation cache hit - saved {entry['latency_ms']:.0f} ms LLM call")
+        return entry["evaluation"]
+
+    async def put(self, db: AsyncIOMotorDatabase, key: str, evaluation: dict, latency_ms: float):
+        """Store an evaluation; fallback evaluations from unparseable completions are not cached"""
+        if evaluation.get("is_fallback"):
+            return
+
+        now = datetime.utcnow()
+        await db.evaluation_cache.update_one(
+            {"_id": key},
+            {
+                "$set": {
+                    "evaluation": {field: evaluation[field] for field in EVALUATION_FIELDS},
+                    "latency_ms": latency_ms,
+                    "created_at": now,
+                    "expires_at": now + timedelta(seconds=self.ttl)
+                },
+                "$setOnInsert": {"hits": 0}
+            },
+            upsert=True
+        )
+
+    async def evaluate(self, db: AsyncIOMotorDatabase, scenario: str, user_response: str, skills: list) -> dict:
+        """evaluate_assessment, answered from the cache when an identical submission was already evaluated"""
+        key = self.cache_key(scenario, user_response, skills)
+
+        with stage("mongo.evaluation_cache_get"):
+            evaluation = await self.get(db, key)
+        if evaluation:
+            return evaluation
+
+        started = time.perf_counter()
+        evaluation = await azure_ai_service.evaluate_assessment(
+            scenario=scenario,
+            user_response=user_response,
+            skills=skills
+        )
+        with stage("mongo.evaluation_cache_put"):
+            await self.put(db, key, evaluation, (time.perf_counter() - started) * 1000)
+        return evaluation
+
+    async def get_stats(self, db: AsyncIOMotorDatabase) -> dict:
+        """Counters for this process plus totals across all workers from the stored entries"""
+        pipeline = [
+            {"$group": {
+                "_id": None,
+                "entries": {"$sum": 1},
+                "hits": {"$sum": "$hits"},
+                "latency_saved_ms": {"$sum": {"$multiply": ["$hits", "$latency_ms"]}}
+            }}
+        ]
+        totals = await db.evaluation_cache.aggregate(pipeline).to_list(1)
+        totals = totals[0] if totals else {"entries": 0, "hits": 0, "latency_saved_ms": 0}
+
+        lookups = self.hits + self.misses
+        return {
+            "process": {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "llm_calls_saved": self.hits,
+                "latency_saved_ms": round(self.latency_saved_ms, 1)
+            },
+            "total": {
+                "entries": totals["entries"],
+                "llm_calls_saved": totals["hits"],
+                "latency_saved_ms": round(totals["latency_saved_ms"], 1)
+            }
+        }
+
+# Create singleton instance
+evaluation_cache = EvaluationCache()
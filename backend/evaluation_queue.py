@@ -0,0 +1,178 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, ReturnDocument
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional
+import asyncio
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PermanentJobError(Exception):
+    """Raised by a job handler when retrying the job cannot succeed"""
+
+
+class EvaluationQueue:
+    """
+    Mongo-backed queue of assessment evaluation jobs processed by a bounded worker pool
+
+    Jobs live in the `evaluation_jobs` collection, so pending work survives a
+    process restart. A claimed job is invisible to other workers until its
+    visibility timeout expires. While the handler runs, a heartbeat keeps
+    pushing the timeout forward, so slow evaluations (retries included) are
+    not picked up twice; a worker that dies mid-job stops the heartbeat and
+    its job is picked up again once the timeout passes.
+    """
+
+    def __init__(self):
+        self.workers = int(os.getenv("EVALUATION_WORKERS", "4"))
+        self.visibility_timeout = float(os.getenv("EVALUATION_VISIBILITY_TIMEOUT_SECONDS", "180"))
+        self.max_attempts = int(os.getenv("EVALUATION_MAX_ATTEMPTS", "3"))
+        self.poll_interval = float(os.getenv("EVALUATION_POLL_INTERVAL_SECONDS", "2"))
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+
+    async def enqueue(self, db: AsyncIOMotorDatabase, job_id: str, payload: dict) -> dict:
+        """Persist a new pending job and wake a local worker"""
+        now = datetime.utcnow()
+        job = {
+            "_id": job_id,
+            "status": "pending",
+            "payload": payload,
+            "attempts": 0,
+            "max_attempts": self.max_attempts,
+            "visible_at": now,
+            "error": None,
+            "created_at": now,
+            "updated_at": now
+        }
+        await db.evaluation_jobs.insert_one(job)
+        self._wakeup.set()
+        return job
+
+    async def get_job(self, db: AsyncIOMotorDatabase, job_id: str) -> Optional[dict]:
+        return await db.evaluation_jobs.find_one({"_id": job_id})
+
+    async def _claim(self, db: AsyncIOMotorDatabase) -> Optional[dict]:
+        """Atomically take the next visible job, hiding it for the visibility timeout"""
+        now = datetime.utcnow()
+        return await db.evaluation_jobs.find_one_and_update(
+            {
+                "status": {"$in": ["pending", "running"]},
+                "visible_at": {"$lte": now}
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "visible_at": now + timedelta(seconds=self.visibility_timeout),
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("visible_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _finish(self, db: AsyncIOMotorDatabase, job: dict, status: str, error: str = None):
+        await db.evaluation_jobs.update_one(
+            {"_id": job["_id"]},
+            {"$set": {"status": status, "error": error, "updated_at": datetime.utcnow()}}
+        )
+
+    async def _retry_later(self, db: AsyncIOMotorDatabase, job: dict, error: str):
+        # Exponential backoff between attempts
+        delay = min(2 ** job["attempts"], 300)
+        now = datetime.utcnow()
+        await db.evaluation_jobs.update_one(
+            {"_id": job["_id"]},
+            {"$set": {
+                "status": "pending",
+                "visible_at": now + timedelta(seconds=delay),
+                "error": error,
+                "updated_at": now
+            }}
+        )
+
+    async def _heartbeat(self, db: AsyncIOMotorDatabase, job: dict):
+        """Keep a running job hidden while this worker still holds it"""
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 3)
+            now = datetime.utcnow()
+            try:
+                # A job reclaimed after an expired timeout has more attempts; leave it alone
+                await db.evaluation_jobs.update_one(
+                    {"_id": job["_id"], "status": "running", "attempts": job["attempts"]},
+                    {"$set": {"visible_at": now + timedelta(seconds=self.visibility_timeout), "updated_at": now}}
+                )
+            except Exception as e:
+                logger.error(f"Error extending evaluation job {job['_id']}: {str(e)}")
+
+    async def _process(self, db: AsyncIOMotorDatabase, job: dict, handler: Callable[[dict], Awaitable[None]]):
+        if job["attempts"] > job["max_attempts"]:
+            logger.error(f"❌ Evaluation job {job['_id']} exceeded {job['max_attempts']} attempts")
+            await self._finish(db, job, "failed", job.get("error") or "Exceeded retry attempts")
+            return
+
+        heartbeat = asyncio.create_task(self._heartbeat(db, job))
+        try:
+            await handler(job)
+            heartbeat.cancel()
+            await self._finish(db, job, "completed")
+            logger.info(f"✅ Evaluation job {job['_id']} completed")
+
+        except PermanentJobError as e:
+            logger.error(f"❌ Evaluation job {job['_id']} failed: {str(e)}")
+            await self._finish(db, job, "failed", str(e))
+
+        except Exception as e:
+            if job["attempts"] >= job["max_attempts"]:
+                logger.error(f"❌ Evaluation job {job['_id']} failed after {job['attempts']} attempts: {str(e)}")
+                await self._finish(db, job, "failed", str(e))
+            else:
+                logger.warning(f"⚠️ Evaluation job {job['_id']} attempt {job['attempts']} failed, retrying: {str(e)}")
+                await self._retry_later(db, job, str(e))
+
+        finally:
+            heartbeat.cancel()
+
+    async def _worker(self, db: AsyncIOMotorDatabase, handler: Callable[[dict], Awaitable[None]]):
+        while True:
+            try:
+                job = await self._claim(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error claiming evaluation job: {str(e)}")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._process(db, job, handler)
+            except Exception as e:
+                # The job becomes visible again when its timeout passes; keep this worker alive
+                logger.error(f"Error processing evaluation job {job['_id']}: {str(e)}")
+
+    async def start(self, db: AsyncIOMotorDatabase, handler: Callable[[dict], Awaitable[None]]):
+        """Start the worker pool; handler(job) performs the evaluation for one job"""
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._worker(db, handler)) for _ in range(self.workers)]
+        logger.info(f"⚙️ Evaluation queue started with {self.workers} worker(s)")
+
+    async def stop(self):
+        """Cancel the workers; in-flight jobs become visible again after their timeout"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+# Create singleton instance
+evaluation_queue = EvaluationQueue()
@@ -0,0 +1,53 @@
+from typing import List, Tuple
+import json
+import re
+
+# Fields emitted as soon as their value is complete in the stream, in schema order
+STREAMED_FIELDS = ["score", "feedback", "strengths", "areas_for_improvement"]
+
+
+class EvaluationStreamParser:
+    """
+    Incrementally extracts top-level evaluation fields from a streamed JSON completion
+
+    Feed it raw text chunks as they arrive; each call returns the fields whose
+    values became complete with that chunk.
+    """
+
+    def __init__(self, fields: List[str] = None):
+        self.text = ""
+        self._decoder = json.JSONDecoder()
+        self._pending = {
+            field: re.compile(r'"' + re.escape(field) + r'"\s*:\s*')
+            for field in (fields or STREAMED_FIELDS)
+        }
+
+    def feed(self, chunk: str) -> List[Tuple[str, object]]:
+        self.text += chunk
+
+        completed = []
+        for field, pattern in list(self._pending.items()):
+            match = pattern.search(self.text)
+            if not match:
+                continue
+
+            try:
+                value, end = self._decoder.raw_decode(self.text, match.end())
+            except json.JSONDecodeError:
+                continue
+
+            # A number is only complete once a delimiter follows it ("8" may become "85")
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                rest = self.text[end:].lstrip()
+                if not rest or rest[0] not in ",}":
+                    continue
+
+            del self._pending[field]
+            completed.append((field, value))
+
+        return completed
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Encode one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
@@ -0,0 +1,102 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timedelta
+from typing import Optional
+import hashlib
+import json
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyError(Exception):
+    """An Idempotency-Key cannot be used for this request; carries the HTTP status to answer with"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class IdempotencyStore:
+    """
+    Stored responses for requests sent with an Idempotency-Key header
+
+    The first request with a key records it as in progress, runs and stores
+    its response; retries with the same key and body get the stored response
+    back for the cost of one read. Keys expire through a TTL index on
+    `idempotency_keys`.
+    """
+
+    def __init__(self):
+        self.ttl = float(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", str(24 * 3600)))
+        # An in-progress key older than this belongs to a crashed request and may be taken over
+        self.lock_timeout = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "300"))
+        self.replays = 0
+
+    @staticmethod
+    def request_hash(body: dict) -> str:
+        return hashlib.sha256(json.dumps(body, sort_keys=True, default=str).encode()).hexdigest()
+
+    async def begin(self, db: AsyncIOMotorDatabase, scope: str, key: str, body: dict) -> Optional[dict]:
+        """
+        Reserve the key for this request
+
+        Returns:
+            The stored response ({"status_code", "body"}) to replay, or None
+            when this request holds the key and should run
+
+        Raises:
+            IdempotencyError: 422 if the key was used with a different body,
+                409 if the first request with the key is still running
+        """
+        now = datetime.utcnow()
+        request_hash = self.request_hash(body)
+        key_id = f"{scope}:{key}"
+
+        try:
+            await db.idempotency_keys.insert_one({
+                "_id": key_id,
+                "request_hash": request_hash,
+                "status": "in_progress",
+                "locked_at": now,
+                "expires_at": now + timedelta(seconds=self.ttl)
+            })
+            return None
+        except DuplicateKeyError:
+            pass
+
+        stored = await db.idempotency_keys.find_one({"_id": key_id})
+        if stored is None:
+            # Expired between the insert and the read
+            return await self.begin(db, scope, key, body)
+
+        if stored["request_hash"] != request_hash:
+            raise IdempotencyError(422, "Idempotency-Key was already used with a different request")
+
+        if stored["status"] == "completed":
+            self.replays += 1
+            return stored["response"]
+
+        taken_over = await db.idempotency_keys.update_one(
+            {"_id": key_id, "status": "in_progress", "locked_at": {"$lt": now - timedelta(seconds=self.lock_timeout)}},
+            {"$set": {"locked_at": now}}
+        )
+        if taken_over.modified_count:
+            return None
+
+        raise IdempotencyError(409, "A request with this Idempotency-Key is still in progress")
+
+    async def complete(self, db: AsyncIOMotorDatabase, scope: str, key: str, status_code: int, body: dict):
+        await db.idempotency_keys.update_one(
+            {"_id": f"{scope}:{key}"},
+            {"$set": {"status": "completed", "response": {"status_code": status_code, "body": body}}}
+        )
+
+    async def abandon(self, db: AsyncIOMotorDatabase, scope: str, key: str):
+        """Drop the reservation of a failed request so a retry runs again"""
+        await db.idempotency_keys.delete_one({"_id": f"{scope}:{key}", "status": "in_progress"})
+
+# Create singleton instance
+idempotency_store = IdempotencyStore()
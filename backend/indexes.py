@@ -0,0 +1,94 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Dropping an index of a missing collection or a missing index of an existing one
+NAMESPACE_NOT_FOUND_ERROR = 26
+INDEX_NOT_FOUND_ERROR = 27
+
+# Indexes provisioned at startup, keyed by collection
+INDEXES = {
+    "assessment_results": [
+        # Improvement tracking: {"user_id", "assessment_id"} sorted by completed_at
+        IndexModel(
+            [("user_id", ASCENDING), ("assessment_id", ASCENDING), ("completed_at", ASCENDING)],
+            name="user_assessment_completed_at"
+        ),
+        # Dashboard and history queries on {"user_id"} sorted by completed_at,
+        # and result history keyset pages on (completed_at, _id), newest first
+        IndexModel(
+            [("user_id", ASCENDING), ("completed_at", DESCENDING), ("_id", DESCENDING)],
+            name="user_completed_at_id"
+        ),
+        # Bulk exports walk the whole collection in (completed_at, _id) order
+        IndexModel([("completed_at", ASCENDING), ("_id", ASCENDING)], name="completed_at_id"),
+    ],
+    "assessment_sessions": [
+        # Active assessment counts: {"user_id", "completed": False}
+        IndexModel([("user_id", ASCENDING), ("completed", ASCENDING)], name="user_completed"),
+        # Expiry sweeps: {"completed": False, "expires_at": {"$lte": now}}
+        IndexModel([("completed", ASCENDING), ("expires_at", ASCENDING)], name="completed_expires_at"),
+    ],
+    "assessment_sessions_archive": [
+        IndexModel([("user_id", ASCENDING), ("archived_at", DESCENDING)], name="user_archived_at"),
+    ],
+    "progress_buckets": [
+        # Series reads newest bucket first; appends target the open bucket of a series
+        IndexModel([("series_id", ASCENDING), ("start_at", ASCENDING)], name="series_start_at"),
+    ],
+    "scenario_pool": [
+        IndexModel([("pool_key", ASCENDING), ("created_at", ASCENDING)], name="pool_key_created_at"),
+    ],
+    "evaluation_cache": [
+        # TTL expiry of cached evaluations
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"),
+    ],
+    "leaderboard_entries": [
+        # Top scorers of an assessment; earlier best scores rank first on ties
+        IndexModel(
+            [("assessment_id", ASCENDING), ("best_score", DESCENDING), ("best_at", ASCENDING)],
+            name="assessment_best_score"
+        ),
+    ],
+    "idempotency_keys": [
+        # TTL expiry of stored responses
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"),
+    ],
+    "lsh_buckets": [
+        # Candidate lookup by band key within an assessment; one entry per result and band
+        IndexModel(
+            [("assessment_id", ASCENDING), ("key", ASCENDING), ("result_id", ASCENDING)],
+            unique=True,
+            name="assessment_key_result"
+        ),
+    ],
+    "user_trends": [
+        # Removal of trends left over from users no longer in the last batch run
+        IndexModel([("computed_at", ASCENDING)], name="computed_at"),
+    ],
+    "evaluation_jobs": [
+        IndexModel([("status", ASCENDING), ("visible_at", ASCENDING)], name="status_visible_at"),
+    ],
+}
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase):
+    """Create any missing indexes; existing indexes with the same spec are left untouched"""
+    for collection, indexes in INDEXES.items():
+        names = await db[collection].create_indexes(indexes)
+        logger.info(f"🗂️ Indexes ensured on {collection}: {', '.join(names)}")
+
+
+async def drop_index(db: AsyncIOMotorDatabase, collection: str, name: str) -> dict:
+    """Drop an index no longer in INDEXES; a database that never had it is left as is"""
+    try:
+        await db[collection].drop_index(name)
+    except OperationFailure as e:
+        if e.code not in (NAMESPACE_NOT_FOUND_ERROR, INDEX_NOT_FOUND_ERROR):
+            raise
+        return {"dropped": False}
+    logger.info(f"🗂️ Dropped index {name} on {collection}")
+    return {"dropped": True}
@@ -0,0 +1,214 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+from pymongo import monitoring
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from fast Mongo reads to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Prompt size buckets in tokens
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 6000, 8000, 12000, 16000, 32000, 64000)
+
+# Stage timings of the current request, collected for the Server-Timing header
+_request_stages: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_stages", default=None)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Metrics are also updated from pymongo's monitoring threads
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def __init__(self, *args, function: Callable[[], float] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function = function
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self) -> List[str]:
+        if self._function is not None:
+            return [f"{self.name} {self._function()}"]
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, *args, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total, count) in self._series.items():
+                for bound, bucket_count in zip(self.buckets, counts):
+                    le = f'le="{bound}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {bucket_count}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served")
+STAGE_DURATION = Histogram(
+    "stage_duration_seconds", "Latency of request stages: Mongo operations, LLM calls, parsing and analytics", ("stage",)
+)
+MONGO_COMMAND_DURATION = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency as seen by the driver", ("command", "outcome")
+)
+LLM_TOKENS = Counter("llm_tokens_total", "LLM tokens sent and received", ("operation", "direction"))
+PROMPT_TOKENS = Histogram(
+    "llm_prompt_tokens", "Prompt size in tokens before and after compaction", ("operation", "phase"), buckets=TOKEN_BUCKETS
+)
+PROMPTS_COMPACTED = Counter("llm_prompts_compacted_total", "Prompts compacted to fit the input token budget", ("operation",))
+PROMPT_TOKENS_SAVED = Counter("llm_prompt_tokens_saved_total", "Prompt tokens removed by compaction", ("operation",))
+
+
+def render_metrics() -> str:
+    """All registered metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a block as a named stage
+
+    Recorded in the stage histogram and, inside a request, in that request's
+    Server-Timing header. Works around awaits: `with stage("mongo.find_session"): ...`
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_DURATION.observe(elapsed, stage=name)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages.append((name, elapsed))
+
+
+def begin_request_timing() -> List[Tuple[str, float]]:
+    stages: List[Tuple[str, float]] = []
+    _request_stages.set(stages)
+    return stages
+
+
+def server_timing_header(stages: List[Tuple[str, float]], total: float) -> str:
+    """Server-Timing value with per-stage durations in milliseconds, repeated stages summed"""
+    totals: Dict[str, float] = {}
+    for name, elapsed in stages:
+        totals[name] = totals.get(name, 0.0) + elapsed
+
+    entries = [f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in totals.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def record_llm_tokens(operation: str, prompt_tokens: int, completion_tokens: int):
+    LLM_TOKENS.inc(prompt_tokens, operation=operation, direction="prompt")
+    LLM_TOKENS.inc(completion_tokens, operation=operation, direction="completion")
+
+
+def record_prompt_compaction(operation: str, tokens_before: int, tokens_after: int):
+    PROMPT_TOKENS.observe(tokens_before, operation=operation, phase="before")
+    PROMPT_TOKENS.observe(tokens_after, operation=operation, phase="after")
+    if tokens_after < tokens_before:
+        PROMPTS_COMPACTED.inc(operation=operation)
+        PROMPT_TOKENS_SAVED.inc(tokens_before - tokens_after, operation=operation)
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Driver-level timing of every MongoDB command, registered on the Motor client"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, command=event.command_name, outcome="success")
+
+    def failed(self, event):
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, command=event.command_name, outcome="failure")
+
+
+mongo_command_timer = MongoCommandTimer()
@@ -0,0 +1,177 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from datetime import datetime
+from typing import List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Scores are binned by whole point, 0-100
+SCORE_BINS = 101
+
+
+class LeaderboardService:
+    """
+    Precomputed leaderboards and percentile ranks per assessment
+
+    `leaderboard_entries` holds each user's best score per assessment and
+    `score_distributions` a histogram of those best scores per assessment.
+    Both are updated incrementally as results are stored, so top scorers
+    are an indexed top-N read and a percentile rank is computed from a
+    single 101-bin histogram.
+    """
+
+    @staticmethod
+    def entry_id(user_id: str, assessment_id: str) -> str:
+        return f"{user_id}:{assessment_id}"
+
+    @staticmethod
+    def score_bin(score: float) -> int:
+        return int(min(max(score, 0), SCORE_BINS - 1))
+
+    async def record_score(self, db: AsyncIOMotorDatabase, result: dict):
+        """Fold a stored result into its user's best score and the assessment's distribution"""
+        score = result["score"]
+        best = {"$ifNull": ["$best_score", -1]}
+
+        # Fields in one $set stage see the previous document, so best_at moves only on improvement
+        previous = await db.leaderboard_entries.find_one_and_update(
+            {"_id": self.entry_id(result["user_id"], result["assessment_id"])},
+            [{"$set": {
+                "user_id": {"$literal": result["user_id"]},
+                "assessment_id": {"$literal": result["assessment_id"]},
+                "best_score": {"$max": [best, score]},
+                "best_at": {"$cond": [{"$gt": [score, best]}, result["completed_at"], "$best_at"]},
+                "attempts": {"$add": [{"$ifNull": ["$attempts", 0]}, 1]}
+            }}],
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
+        )
+
+        new_bin = self.score_bin(score)
+        if previous is None:
+            increments = {f"bins.{new_bin}": 1, "count": 1}
+        elif score > previous["best_score"] and self.score_bin(previous["best_score"]) != new_bin:
+            # The user's best moved up: shift them to the new bin
+            increments = {f"bins.{new_bin}": 1, f"bins.{self.score_bin(previous['best_score'])}": -1}
+        else:
+            return
+
+        await db.score_distributions.update_one(
+            {"_id": result["assessment_id"]},
+            {"$inc": increments, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+    def percentile(self, distribution: Optional[dict], score: float) -> float:
+        """Percentile rank of a score: share of candidates below it, counting ties as half"""
+        if not distribution or not distribution.get("count"):
+            return 0.0
+
+        score_bin = self.score_bin(score)
+        bins = distribution.get("bins", {})
+        below = sum(n for key, n in bins.items() if int(key) < score_bin)
+        equal = bins.get(str(score_bin), 0)
+        return round((below + equal / 2) / distribution["count"] * 100, 1)
+
+    async def get_leaderboard(self, db: AsyncIOMotorDatabase, assessment_id: str, limit: int = 10, user_id: str = None) -> dict:
+        """Top scorers of an assessment, plus the given user's standing"""
+        cursor = db.leaderboard_entries.find(
+            {"assessment_id": assessment_id},
+            {"_id": 0, "user_id": 1, "best_score": 1, "best_at": 1, "attempts": 1}
+        ).sort([("best_score", DESCENDING), ("best_at", ASCENDING)]).limit(limit)
+        entries = await cursor.to_list(limit)
+
+        distribution = await db.score_distributions.find_one({"_id": assessment_id})
+        leaderboard = {
+            "assessment_id": assessment_id,
+            "participants": distribution["count"] if distribution else 0,
+            "entries": [{"rank": rank, **entry} for rank, entry in enumerate(entries, start=1)],
+            "user": None
+        }
+
+        if user_id:
+            entry = await db.leaderboard_entries.find_one({"_id": self.entry_id(user_id, assessment_id)})
+            if entry:
+                leaderboard["user"] = {
+                    "user_id": user_id,
+                    "best_score": entry["best_score"],
+                    "percentile": self.percentile(distribution, entry["best_score"])
+                }
+
+        return leaderboard
+
+    async def get_percentiles(self, db: AsyncIOMotorDatabase, user_id: str, assessments: dict) -> List[dict]:
+        """
+        Percentile rank of the user's best score on each assessment they completed
+
+        Args:
+            assessments: Titles keyed by assessment id
+        """
+        if not assessments:
+            return []
+
+        entries = db.leaderboard_entries.find(
+            {"_id": {"$in": [self.entry_id(user_id, assessment_id) for assessment_id in assessments]}}
+        )
+        best_scores = {entry["assessment_id"]: entry["best_score"] async for entry in entries}
+
+        distributions = db.score_distributions.find({"_id": {"$in": list(best_scores)}})
+        distributions = {distribution["_id"]: distribution async for distribution in distributions}
+
+        return [
+            {
+                "assessment_id": assessment_id,
+                "name": assessments[assessment_id],
+                "best_score": best_score,
+                "percentile": self.percentile(distributions.get(assessment_id), best_score)
+            }
+            for assessment_id, best_score in best_scores.items()
+        ]
+
+    async def rebuild(self, db: AsyncIOMotorDatabase) -> int:
+        """
+        Recompute leaderboard entries and score distributions from assessment_results
+
+        Both rollups are written server-side with $merge.
+
+        Returns:
+            Number of leaderboard entries
+        """
+        await db.leaderboard_entries.delete_many({})
+        await db.score_distributions.delete_many({})
+
+        await db.assessment_results.aggregate([
+            {"$sort": {"score": -1, "completed_at": 1}},
+            {"$group": {
+                "_id": {"$concat": ["$user_id", ":", "$assessment_id"]},
+                "user_id": {"$first": "$user_id"},
+                "assessment_id": {"$first": "$assessment_id"},
+                "best_score": {"$first": "$score"},
+                "best_at": {"$first": "$completed_at"},
+                "attempts": {"$sum": 1}
+            }},
+            {"$merge": {"into": "leaderboard_entries", "whenMatched": "replace", "whenNotMatched": "insert"}}
+        ], allowDiskUse=True).to_list(None)
+
+        score_bin = {"$toInt": {"$floor": {"$min": [{"$max": ["$best_score", 0]}, SCORE_BINS - 1]}}}
+        await db.leaderboard_entries.aggregate([
+            {"$group": {
+                "_id": {"assessment_id": "$assessment_id", "bin": {"$toString": score_bin}},
+                "n": {"$sum": 1}
+            }},
+            {"$group": {
+                "_id": "$_id.assessment_id",
+                "bins": {"$push": {"k": "$_id.bin", "v": "$n"}},
+                "count": {"$sum": "$n"}
+            }},
+            {"$project": {"bins": {"$arrayToObject": "$bins"}, "count": 1, "updated_at": "$$NOW"}},
+            {"$merge": {"into": "score_distributions", "whenMatched": "replace", "whenNotMatched": "insert"}}
+        ], allowDiskUse=True).to_list(None)
+
+        count = await db.leaderboard_entries.count_documents({})
+        logger.info(f"✅ Rebuilt {count} leaderboard entries")
+        return count
+
+# Create singleton instance
+leaderboard_service = LeaderboardService()
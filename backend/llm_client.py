@@ -0,0 +1,278 @@
+from contextlib import nullcontext
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+import asyncio
+import os
+import random
+import time
+import logging
+
+import httpx
+import litellm
+
+from instrumentation import Gauge, stage
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Upstream statuses worth retrying: throttling, timeouts and provider-side failures
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = ("RateLimit", "Timeout", "APIConnection", "ServiceUnavailable", "InternalServer")
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+
+    Opens after `failure_threshold` retryable failures in a row, fails fast
+    for `reset_timeout` seconds, then lets a single probe call through
+    (half-open) to decide whether to close again.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+
+        if self.state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+
+        return False
+
+    def release_probe(self):
+        """Give back a probe that ended without an outcome (cancelled), leaving the state as is"""
+        self._probe_in_flight = False
+
+    def record_success(self):
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+                logger.warning(f"⚠️ LLM circuit breaker opened after {self.consecutive_failures} failure(s)")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+class LLMClient:
+    """
+    Long-lived client layer for upstream LLM calls
+
+    Caps concurrent upstream calls with a semaphore (plus an optional
+    limiter shared by all worker processes), applies per-operation timeouts, retries retryable errors with exponential backoff and full
+    jitter, and fails fast through a circuit breaker while the provider is down.
+    """
+
+    def __init__(self):
+        self.max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        self.max_retries = int(os.getenv("LLM_MAX_RETRIES", "3"))
+        self.backoff_base = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+        self.backoff_max = float(os.getenv("LLM_RETRY_MAX_SECONDS", "8"))
+        self.timeouts = {
+            "scenario": float(os.getenv("LLM_SCENARIO_TIMEOUT_SECONDS", "90")),
+            "evaluation": float(os.getenv("LLM_EVALUATION_TIMEOUT_SECONDS", "120")),
+        }
+        # Longest wait for the next chunk of a stream once the first one arrived
+        self.stream_chunk_timeout = float(os.getenv("LLM_STREAM_CHUNK_TIMEOUT_SECONDS", "30"))
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5")),
+            reset_timeout=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._global_limiter = None
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self.in_flight = 0
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.timeouts_hit = 0
+        self.rejected = 0
+
+    def start(self, global_limiter=None):
+        """
+        Create the shared keep-alive HTTP connection pool used for litellm calls
+
+        `global_limiter` (see coordination.create_llm_limiter) caps upstream
+        calls across all workers on top of this process's semaphore.
+        """
+        self._global_limiter = global_limiter
+        if self._http_client is not None:
+            return
+        self._http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+                keepalive_expiry=60
+            ),
+            timeout=httpx.Timeout(max(self.timeouts.values()), connect=10)
+        )
+        litellm.aclient_session = self._http_client
+
+    async def stop(self):
+        if self._http_client is None:
+            return
+        await self._http_client.aclose()
+        litellm.aclient_session = None
+        self._http_client = None
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        if isinstance(error, (asyncio.TimeoutError, ConnectionError, httpx.TransportError)):
+            return True
+        if getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES:
+            return True
+        return any(name in type(error).__name__ for name in RETRYABLE_ERROR_NAMES)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _global_slot(self):
+        return self._global_limiter.slot() if self._global_limiter else nullcontext()
+
+    def _admit(self, operation: str):
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise CircuitOpenError(f"LLM provider unavailable, failing fast ({operation})")
+
+    async def _handle_failure(self, operation: str, error: Exception, attempt: int) -> bool:
+        """Record a failed attempt; returns True when the call should be retried"""
+        if isinstance(error, asyncio.TimeoutError):
+            self.timeouts_hit += 1
+
+        retryable = self.is_retryable(error)
+        if not retryable:
+            # Bad requests say nothing about provider health
+            self.breaker.record_success()
+            self.failures += 1
+            return False
+
+        self.breaker.record_failure()
+        if attempt >= self.max_retries:
+            self.failures += 1
+            return False
+
+        self.retries += 1
+        delay = self._backoff(attempt)
+        logger.warning(f"⚠️ LLM {operation} attempt {attempt + 1} failed ({type(error).__name__}), retrying in {delay:.2f}s")
+        await asyncio.sleep(delay)
+        return True
+
+    async def call(self, operation: str, request: Callable[[], Awaitable[T]]) -> T:
+        """Run one upstream request with the concurrency cap, timeout, retries and breaker"""
+        with stage(f"llm.{operation}"):
+            attempt = 0
+            while True:
+                self._admit(operation)
+                try:
+                    async with self._semaphore, self._global_slot():
+                        self.in_flight += 1
+                        self.calls += 1
+                        try:
+                            result = await asyncio.wait_for(request(), timeout=self.timeouts.get(operation))
+                        finally:
+                            self.in_flight -= 1
+                except Exception as e:
+                    if await self._handle_failure(operation, e, attempt):
+                        attempt += 1
+                        continue
+                    raise
+                except BaseException:
+                    # Cancelled (e.g. a batch item deadline): no verdict on provider health
+                    self.breaker.release_probe()
+                    raise
+
+                self.breaker.record_success()
+                return result
+
+    async def stream(self, operation: str, request: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """
+        Streaming counterpart of call()
+
+        The concurrency slot is held for the whole stream. The operation
+        timeout bounds the wait for the first chunk and stream_chunk_timeout
+        each wait after it. Retries only happen before the first chunk, since
+        chunks already forwarded cannot be taken back.
+        """
+        attempt = 0
+        while True:
+            self._admit(operation)
+            started = False
+            try:
+                async with self._semaphore, self._global_slot():
+                    self.in_flight += 1
+                    self.calls += 1
+                    chunks = request().__aiter__()
+                    try:
+                        while True:
+                            timeout = self.stream_chunk_timeout if started else self.timeouts.get(operation)
+                            try:
+                                chunk = await asyncio.wait_for(chunks.__anext__(), timeout=timeout)
+                            except StopAsyncIteration:
+                                break
+                            started = True
+                            yield chunk
+                    finally:
+                        self.in_flight -= 1
+                        if hasattr(chunks, "aclose"):
+                            await chunks.aclose()
+            except Exception as e:
+                if not started and await self._handle_failure(operation, e, attempt):
+                    attempt += 1
+                    continue
+                if started:
+                    self.breaker.record_failure()
+                    self.failures += 1
+                raise
+            except BaseException:
+                # Cancelled, or the consumer closed the stream (client disconnect)
+                self.breaker.release_probe()
+                raise
+
+            self.breaker.record_success()
+            return
+
+    def get_stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "utilisation": round(self.in_flight / self.max_concurrency, 3),
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "timeouts": self.timeouts_hit,
+            "rejected_by_breaker": self.rejected,
+            "global_limit": self._global_limiter.get_stats() if self._global_limiter else None,
+            "breaker": {
+                "state": self.breaker.state,
+                "consecutive_failures": self.breaker.consecutive_failures,
+                "times_opened": self.breaker.times_opened
+            }
+        }
+
+# Create singleton instance
+llm_client = LLMClient()
+
+LLM_REQUESTS_IN_FLIGHT = Gauge(
+    "llm_requests_in_flight", "Upstream LLM calls currently in flight", function=lambda: llm_client.in_flight
+)
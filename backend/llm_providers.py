@@ -0,0 +1,200 @@
+from emergentintegrations.llm.chat import LlmChat, UserMessage
+from typing import AsyncIterator, Optional
+import asyncio
+import hashlib
+import json
+import os
+import random
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LLMProvider:
+    """
+    Completion backend behind AzureAIService
+
+    `operation` is "scenario" or "evaluation"; providers may use it to shape
+    their output but must return the raw completion text either way.
+    `max_output_tokens` caps the completion length when set.
+    """
+
+    name = "base"
+
+    @property
+    def model_id(self) -> str:
+        raise NotImplementedError
+
+    async def complete(
+        self, operation: str, session_id: str, system_message: str, prompt: str,
+        max_output_tokens: Optional[int] = None
+    ) -> str:
+        raise NotImplementedError
+
+    async def stream(
+        self, operation: str, session_id: str, system_message: str, prompt: str,
+        max_output_tokens: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """Stream the completion; providers without streaming yield it as one chunk"""
+        yield await self.complete(operation, session_id, system_message, prompt, max_output_tokens)
+
+
+class EmergentProvider(LLMProvider):
+    """Azure OpenAI through emergentintegrations"""
+
+    name = "emergent"
+
+    def __init__(self, api_key: str, model_provider: str, model_name: str):
+        self.api_key = api_key
+        self.model_provider = model_provider
+        self.model_name = model_name
+
+    @property
+    def model_id(self) -> str:
+        return f"{self.model_provider}/{self.model_name}"
+
+    def _chat(self, session_id: str, system_message: str, max_output_tokens: Optional[int] = None) -> LlmChat:
+        chat = LlmChat(
+            api_key=self.api_key,
+            session_id=session_id,
+            system_message=system_message
+        ).with_model(self.model_provider, self.model_name)
+        with_params = getattr(chat, "with_params", None)
+        if max_output_tokens and with_params is not None:
+            chat = with_params(max_tokens=max_output_tokens)
+        return chat
+
+    async def complete(
+        self, operation: str, session_id: str, system_message: str, prompt: str,
+        max_output_tokens: Optional[int] = None
+    ) -> str:
+        chat = self._chat(session_id, system_message, max_output_tokens)
+        return await chat.send_message(UserMessage(text=prompt))
+
+    async def stream(
+        self, operation: str, session_id: str, system_message: str, prompt: str,
+        max_output_tokens: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        chat = self._chat(session_id, system_message, max_output_tokens)
+        user_message = UserMessage(text=prompt)
+
+        stream_message = getattr(chat, "stream_message", None)
+        if stream_message is None:
+            yield await chat.send_message(user_message)
+            return
+
+        async for chunk in stream_message(user_message):
+            if chunk:
+                yield chunk
+
+
+class FakeProviderError(Exception):
+    """Injected upstream failure; carries a retryable status code like a provider 503"""
+
+    status_code = 503
+
+
+class FakeLLMProvider(LLMProvider):
+    """
+    Deterministic offline provider for load tests and benchmarks
+
+    Completion content depends only on the prompt. Latency and injected
+    failures come from a seeded RNG, so a run with the same seed and call
+    order is reproducible.
+
+    Environment:
+        FAKE_LLM_LATENCY_DISTRIBUTION: fixed, uniform or lognormal (default lognormal)
+        FAKE_LLM_LATENCY_MS: median latency per call (default 800)
+        FAKE_LLM_LATENCY_SPREAD: uniform half-width as a fraction of the median,
+            or lognormal sigma (default 0.5)
+        FAKE_LLM_FAILURE_RATE: probability a call raises FakeProviderError (default 0)
+        FAKE_LLM_SEED: RNG seed (default 42)
+        FAKE_LLM_STREAM_CHUNK_CHARS: characters per streamed chunk (default 24)
+    """
+
+    name = "fake"
+
+    def __init__(self):
+        self.distribution = os.getenv("FAKE_LLM_LATENCY_DISTRIBUTION", "lognormal")
+        self.latency_ms = float(os.getenv("FAKE_LLM_LATENCY_MS", "800"))
+        self.spread = float(os.getenv("FAKE_LLM_LATENCY_SPREAD", "0.5"))
+        self.failure_rate = float(os.getenv("FAKE_LLM_FAILURE_RATE", "0"))
+        self.chunk_chars = int(os.getenv("FAKE_LLM_STREAM_CHUNK_CHARS", "24"))
+        self._rng = random.Random(int(os.getenv("FAKE_LLM_SEED", "42")))
+
+    @property
+    def model_id(self) -> str:
+        return "fake/deterministic"
+
+    def _latency_seconds(self) -> float:
+        if self.distribution == "fixed":
+            latency = self.latency_ms
+        elif self.distribution == "uniform":
+            latency = self._rng.uniform(self.latency_ms * (1 - self.spread), self.latency_ms * (1 + self.spread))
+        else:
+            latency = self.latency_ms * self._rng.lognormvariate(0, self.spread)
+        return max(latency, 0) / 1000
+
+    def _maybe_fail(self, operation: str):
+        if self._rng.random() < self.failure_rate:
+            raise FakeProviderError(f"Injected {operation} failure")
+
+    @staticmethod
+    def _digest(prompt: str) -> int:
+        return int(hashlib.sha256(prompt.encode()).hexdigest()[:8], 16)
+
+    def _completion(self, operation: str, prompt: str) -> str:
+        digest = self._digest(prompt)
+
+        if operation == "evaluation":
+            return json.dumps({
+                "score": 40 + digest % 61,
+                "feedback": f"Deterministic evaluation {digest:08x}. The submission addresses the core "
+                            "requirements, explains its approach and leaves room for deeper error handling "
+                            "and performance considerations.",
+                "strengths": ["Clear structure", "Covers the main requirements", "Reasonable trade-offs"],
+                "areas_for_improvement": ["Error handling", "Testing strategy", "Performance tuning"]
+            }, indent=2)
+
+        return (
+            f"Scenario {digest:08x}: Build a small production-ready service for the described domain. "
+            "Implement the core workflow, handle invalid input, document your design decisions and "
+            "explain how you would test and scale it. Success criteria: correctness, clarity and "
+            "sensible trade-offs within 45 minutes."
+        )
+
+    async def complete(
+        self, operation: str, session_id: str, system_message: str, prompt: str,
+        max_output_tokens: Optional[int] = None
+    ) -> str:
+        await asyncio.sleep(self._latency_seconds())
+        self._maybe_fail(operation)
+        return self._completion(operation, prompt)
+
+    async def stream(
+        self, operation: str, session_id: str, system_message: str, prompt: str,
+        max_output_tokens: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        self._maybe_fail(operation)
+        text = self._completion(operation, prompt)
+        chunks = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)]
+
+        # Spread the call latency over the chunks like a token stream
+        delay = self._latency_seconds() / max(len(chunks), 1)
+        for chunk in chunks:
+            await asyncio.sleep(delay)
+            yield chunk
+
+
+def create_provider(api_key: str, model_provider: str, model_name: str) -> LLMProvider:
+    """Provider selected by LLM_PROVIDER: `emergent` (default) or `fake`"""
+    provider = os.getenv("LLM_PROVIDER", "emergent").lower()
+
+    if provider == "fake":
+        logger.warning("⚠️ Using the fake LLM provider - evaluations are synthetic")
+        return FakeLLMProvider()
+
+    if provider != "emergent":
+        raise ValueError(f"Unknown LLM_PROVIDER: {provider}")
+
+    return EmergentProvider(api_key, model_provider, model_name)
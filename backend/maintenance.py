@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+SkillSphere maintenance commands
+
+Usage:
+    python maintenance.py migrate [--status]
+    python maintenance.py rebuild-user-stats [--user-id USER_ID]
+    python maintenance.py rebuild-progress [--user-id USER_ID]
+    python maintenance.py rebuild-leaderboards
+    python maintenance.py sweep-sessions [--backfill-expiry]
+    python maintenance.py migrate-storage [--batch-size N]
+    python maintenance.py storage-report [--output PATH] [--compare PATH]
+    python maintenance.py export-results OUTPUT_DIR [--format parquet|csv] [--fields a,b] [--since ISO] [--until ISO]
+    python maintenance.py import-results PATH [--dry-run] [--skip-rebuild]
+    python maintenance.py compute-trends
+    python maintenance.py rebuild-similarity [--batch-size N]
+    python maintenance.py benchmark-trends [--results N] [--users N] [--database NAME] [--compute-only]
+"""
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pathlib import Path
+import argparse
+import asyncio
+from datetime import datetime
+import json
+import logging
+import os
+
+from analytics_service import analytics_service
+from leaderboard_service import leaderboard_service
+from progress_service import progress_service
+from session_lifecycle import session_lifecycle
+from storage_migration import storage_migration
+from migrations import migration_runner
+from result_export import result_exporter
+from result_import import result_importer
+from trend_engine import trend_engine
+from similarity_index import similarity_index
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("maintenance")
+
+
+async def migrate(db, args):
+    """Apply pending data migrations, or list them with --status"""
+    if args.status:
+        for migration in await migration_runner.status(db):
+            applied = migration["applied_at"].isoformat() if migration["applied_at"] else "pending"
+            logger.info(f"  {migration['id']:<28} {applied:<28} {migration['description']}")
+        return
+
+    applied = await migration_runner.apply(db)
+    logger.info(f"✅ Applied {len(applied)} migration(s)" + (f": {', '.join(applied)}" if applied else ""))
+
+
+async def rebuild_user_stats(db, args):
+    """Backfill user_stats documents from assessment_results"""
+    if args.user_id:
+        await analytics_service.rebuild_user_stats(db, args.user_id)
+        logger.info(f"✅ Rebuilt stats for user {args.user_id}")
+    else:
+        count = await analytics_service.rebuild_all_user_stats(db)
+        logger.info(f"✅ Rebuilt stats for {count} user(s)")
+
+
+async def rebuild_progress(db, args):
+    """Recreate progress series from assessment_results"""
+    count = await progress_service.rebuild_series(db, args.user_id)
+    logger.info(f"✅ Rebuilt progress series from {count} result(s)")
+
+
+async def rebuild_leaderboards(db, args):
+    """Recompute leaderboard entries and score distributions from assessment_results"""
+    count = await leaderboard_service.rebuild(db)
+    logger.info(f"✅ Rebuilt leaderboards from {count} user/assessment best score(s)")
+
+
+async def sweep_sessions(db, args):
+    """Archive abandoned sessions past their expiry"""
+    if args.backfill_expiry:
+        updated = await session_lifecycle.backfill_expiry(db)
+        logger.info(f"✅ Set expiry on {updated} open session(s)")
+    swept = await session_lifecycle.sweep_all(db)
+    logger.info(f"✅ Swept {swept} expired session(s)")
+
+
+async def migrate_storage(db, args):
+    """Move embedded scenarios into the scenario store and compress large result text"""
+    migrated = await storage_migration.migrate(db, args.batch_size)
+    for collection, count in migrated.items():
+        logger.info(f"✅ {collection}: {count} document(s) migrated")
+
+
+async def storage_report(db, args):
+    """Report storage per collection and the share of result bytes analytics reads"""
+    report = await storage_migration.report(db)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    for collection, stats in report["collections"].items():
+        if not stats:
+            continue
+        line = (f"  {collection:<28} docs={stats['documents']:<8} data={stats['data_bytes']:<12} "
+                f"storage={stats['storage_bytes']:<12} avg_doc={stats['avg_document_bytes']}")
+        previous = ((baseline or {}).get("collections") or {}).get(collection)
+        if previous and previous["data_bytes"]:
+            change = (stats["data_bytes"] - previous["data_bytes"]) / previous["data_bytes"] * 100
+            line += f" ({change:+.1f}% data vs baseline)"
+        logger.info(line)
+
+    results = report["results"]
+    logger.info(f"  results: analytics fields are {results['analytics_share'] * 100:.1f}% of document bytes, "
+                f"{results['legacy_documents']} document(s) not migrated")
+    logger.info(f"  scenarios: {report['scenarios']['unique']} unique, {report['scenarios']['text_bytes']} bytes of text")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"💾 Report written to {args.output}")
+
+
+async def export_results(db, args):
+    """Export assessment_results to Parquet or CSV part files, resuming an interrupted export"""
+    await result_exporter.export_to_directory(
+        db,
+        args.output_dir,
+        export_format=args.format,
+        fields=result_exporter.parse_fields(args.fields),
+        since=datetime.fromisoformat(args.since) if args.since else None,
+        until=datetime.fromisoformat(args.until) if args.until else None
+    )
+
+
+async def import_results(db, args):
+    """Bulk import historical results from .jsonl, .csv or .parquet, recomputing derived fields"""
+    report = await result_importer.import_file(db, args.path, dry_run=args.dry_run)
+    logger.info(f"  read={report['read']} rejected={report['rejected']} inserted={report['inserted']} "
+                f"duplicates={report['duplicates']} failed={report['failed']} rebased={report['rebased_results']}")
+    if "rows_per_second" in report:
+        logger.info(f"  {report['seconds']}s total, derived fields {report['compute_seconds']}s, "
+                    f"{report['rows_per_second']:,} rows/s inserted")
+
+    if args.dry_run or args.skip_rebuild or not report.get("users"):
+        return
+    await result_importer.rebuild_derived(db, report["users"])
+    logger.info(f"✅ Rebuilt stats, progress and leaderboards for {len(report['users'])} user(s)")
+
+
+async def compute_trends(db, args):
+    """Recompute every user's score trends into user_trends"""
+    run = await trend_engine.refresh(db)
+    logger.info(f"✅ Trends for {run['users']} user(s) from {run['results']} result(s)")
+
+
+async def benchmark_trends(db, args):
+    """Time the trend refresh end to end on synthetic results in a scratch database, reporting load, compute and write"""
+    if args.compute_only:
+        run = trend_engine.benchmark_compute(results=args.results, users=args.users)
+        logger.info(f"⏱️ compute only: {run['results']:,} results for {run['users']:,} users in "
+                    f"{run['compute_seconds']}s ({run['results_per_second']:,} results/s)")
+        return
+
+    database = args.database or f"{db.name}_trend_benchmark"
+    if database == db.name:
+        raise SystemExit("--database must not be the application database; its results would be replaced")
+    try:
+        run = await trend_engine.benchmark(db.client[database], results=args.results, users=args.users)
+    finally:
+        await db.client.drop_database(database)
+    logger.info(f"⏱️ refresh: {run['results']:,} results for {run['users']:,} users in {run['seconds']}s "
+                f"({run['results_per_second']:,} results/s) - load {run['load_seconds']}s, "
+                f"compute {run['compute_seconds']}s, write {run['write_seconds']}s "
+                f"(seeding took {run['seed_seconds']}s)")
+
+
+async def rebuild_similarity(db, args):
+    """Recompute MinHash signatures, LSH buckets and similarity flags for every result"""
+    run = await similarity_index.rebuild(db, args.batch_size)
+    logger.info(f"✅ Indexed {run['indexed']} result(s), {run['flagged']} flagged as similar")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="SkillSphere maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = commands.add_parser("migrate", help=migrate.__doc__)
+    migrate_parser.add_argument("--status", action="store_true", help="List migrations and when they were applied")
+    migrate_parser.set_defaults(handler=migrate)
+
+    rebuild = commands.add_parser("rebuild-user-stats", help=rebuild_user_stats.__doc__)
+    rebuild.add_argument("--user-id", help="Only rebuild this user's stats")
+    rebuild.set_defaults(handler=rebuild_user_stats)
+
+    progress = commands.add_parser("rebuild-progress", help=rebuild_progress.__doc__)
+    progress.add_argument("--user-id", help="Only rebuild this user's series")
+    progress.set_defaults(handler=rebuild_progress)
+
+    leaderboards = commands.add_parser("rebuild-leaderboards", help=rebuild_leaderboards.__doc__)
+    leaderboards.set_defaults(handler=rebuild_leaderboards)
+
+    sweep = commands.add_parser("sweep-sessions", help=sweep_sessions.__doc__)
+    sweep.add_argument("--backfill-expiry", action="store_true", help="First set expires_at on sessions created without one")
+    sweep.set_defaults(handler=sweep_sessions)
+
+    storage_parser = commands.add_parser("migrate-storage", help=migrate_storage.__doc__)
+    storage_parser.add_argument("--batch-size", type=int, default=500)
+    storage_parser.set_defaults(handler=migrate_storage)
+
+    report = commands.add_parser("storage-report", help=storage_report.__doc__)
+    report.add_argument("--output", help="Write the report as JSON to this path")
+    report.add_argument("--compare", help="Earlier report JSON to diff against, e.g. taken before migrate-storage")
+    report.set_defaults(handler=storage_report)
+
+    export = commands.add_parser("export-results", help=export_results.__doc__)
+    export.add_argument("output_dir", help="Directory for part files and the checkpoint; rerun with it to resume")
+    export.add_argument("--format", choices=["parquet", "csv"], default="parquet")
+    export.add_argument("--fields", help="Comma-separated columns (default: analytics columns without free text)")
+    export.add_argument("--since", help="Only results completed at or after this ISO timestamp")
+    export.add_argument("--until", help="Only results completed before this ISO timestamp")
+    export.set_defaults(handler=export_results)
+
+    imports = commands.add_parser("import-results", help=import_results.__doc__)
+    imports.add_argument("path", help="File of results: user_id, assessment_id, score, completed_at and optional text fields")
+    imports.add_argument("--dry-run", action="store_true", help="Validate and compute derived fields without writing")
+    imports.add_argument("--skip-rebuild", action="store_true", help="Leave user stats, progress and leaderboards for a later rebuild")
+    imports.set_defaults(handler=import_results)
+
+    trends = commands.add_parser("compute-trends", help=compute_trends.__doc__)
+    trends.set_defaults(handler=compute_trends)
+
+    benchmark = commands.add_parser("benchmark-trends", help=benchmark_trends.__doc__)
+    benchmark.add_argument("--results", type=int, default=1_000_000)
+    benchmark.add_argument("--users", type=int, default=50_000)
+    benchmark.add_argument("--database", help="Scratch database to seed and drop (default: DB_NAME_trend_benchmark)")
+    benchmark.add_argument("--compute-only", action="store_true", help="Time compute() alone, without Mongo")
+    benchmark.set_defaults(handler=benchmark_trends)
+
+    similarity = commands.add_parser("rebuild-similarity", help=rebuild_similarity.__doc__)
+    similarity.add_argument("--batch-size", type=int, default=1000)
+    similarity.set_defaults(handler=rebuild_similarity)
+
+    return parser
+
+
+async def main():
+    args = build_parser().parse_args()
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        await args.handler(client[os.environ['DB_NAME']], args)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
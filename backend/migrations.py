@@ -0,0 +1,71 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime
+from functools import partial
+from typing import List
+import logging
+
+from indexes import drop_index
+from session_lifecycle import session_lifecycle
+
+logger = logging.getLogger(__name__)
+
+# Applied in order, each once per database; ids must never be renamed or reordered
+MIGRATIONS = [
+    ("0001_session_expiry", "Set expires_at on open sessions created before sessions expired", session_lifecycle.backfill_expiry),
+    ("0002_drop_user_completed_at", "Drop user_completed_at, a prefix of user_completed_at_id",
+     partial(drop_index, collection="assessment_results", name="user_completed_at")),
+    ("0003_keep_completed_sessions", "Drop completed_at_ttl so completed sessions keep answering resubmits with 400",
+     partial(drop_index, collection="assessment_sessions", name="completed_at_ttl")),
+]
+
+
+class MigrationRunner:
+    """
+    Ordered data migrations, recorded in `schema_migrations`
+
+    Run at startup under the startup lock, so exactly one worker applies a
+    pending migration, and from `python maintenance.py migrate`. Migrations
+    must be idempotent: one interrupted before it was recorded runs again.
+    """
+
+    async def applied(self, db: AsyncIOMotorDatabase) -> dict:
+        return {doc["_id"]: doc async for doc in db.schema_migrations.find({})}
+
+    async def apply(self, db: AsyncIOMotorDatabase) -> List[str]:
+        """Apply pending migrations; returns the ids applied"""
+        done = await self.applied(db)
+        applied = []
+        for migration_id, description, migrate in MIGRATIONS:
+            if migration_id in done:
+                continue
+
+            logger.info(f"🛠️ Applying migration {migration_id}: {description}")
+            result = await migrate(db)
+            try:
+                await db.schema_migrations.insert_one({
+                    "_id": migration_id,
+                    "description": description,
+                    "result": result,
+                    "applied_at": datetime.utcnow()
+                })
+            except DuplicateKeyError:
+                # Applied concurrently by a process not holding the startup lock (e.g. the CLI)
+                pass
+            applied.append(migration_id)
+
+        return applied
+
+    async def status(self, db: AsyncIOMotorDatabase) -> List[dict]:
+        done = await self.applied(db)
+        return [
+            {
+                "id": migration_id,
+                "description": description,
+                "applied_at": done[migration_id]["applied_at"] if migration_id in done else None
+            }
+            for migration_id, description, _ in MIGRATIONS
+        ]
+
+# Create singleton instance
+migration_runner = MigrationRunner()
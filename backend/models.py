@@ -30,8 +30,9 @@ class AssessmentResult(BaseModel):
     id: Optional[str] = Field(None, alias="_id")
     user_id: str
     assessment_id: str
-    scenario: str
+    scenario_id: str  # key into the scenarios store
     user_response: str
+    skills: List[str] = []
     score: float  # 0-100
     ai_feedback: str
     improvement_delta: float = 0.0
@@ -69,10 +70,79 @@ class SubmitAssessmentResponse(BaseModel):
     strengths: List[str]
     areas_for_improvement: List[str]
 
+class BatchSubmitItem(BaseModel):
+    session_id: str
+    user_id: str
+    user_response: str
+    time_spent_minutes: int = 0
+
+class BatchSubmitRequest(BaseModel):
+    items: List[BatchSubmitItem]
+
+class BatchSubmitItemResult(BaseModel):
+    session_id: str
+    status: str  # completed, not_found, already_submitted, expired, in_progress, duplicate, failed
+    error: Optional[str] = None
+    result: Optional[SubmitAssessmentResponse] = None
+
+class BatchSubmitResponse(BaseModel):
+    completed: int
+    failed: int
+    items: List[BatchSubmitItemResult]
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: str
+    best_score: float
+    attempts: int
+    best_at: datetime
+
+class LeaderboardStanding(BaseModel):
+    user_id: str
+    best_score: float
+    percentile: float
+
+class LeaderboardResponse(BaseModel):
+    assessment_id: str
+    participants: int
+    entries: List[LeaderboardEntry]
+    user: Optional[LeaderboardStanding] = None
+
+class ResultHistoryResponse(BaseModel):
+    items: List[dict]
+    next_cursor: Optional[str] = None
+
 class DashboardMetrics(BaseModel):
     active_assessments: int
     completed_assessments: int
     avg_score: float
     improvement: float
     skill_progress: List[dict]
-    ai_feedback: List[str]
\ No newline at end of file
+    ai_feedback: List[str]
+    percentiles: List[dict] = []
+    # Slope, EMA and projected next score from the batch trend job
+    trend: Optional[dict] = None
+
+class EvaluationStatusResponse(BaseModel):
+    result_id: str
+    status: str  # pending, running, completed, failed
+    attempts: int = 0
+    error: Optional[str] = None
+    result: Optional[SubmitAssessmentResponse] = None
+
+
+class ProgressEvent(BaseModel):
+    result_id: str
+    score: float
+    at: datetime
+
+class ProgressSeriesResponse(BaseModel):
+    user_id: str
+    assessment_id: str
+    count: int
+    first_score: float
+    latest_score: float
+    ema: float
+    improvement: float
+    trend_slope: float
+    events: List[ProgressEvent]
@@ -0,0 +1,242 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Score events stored per bucket document before a new bucket is opened
+BUCKET_SIZE = int(os.getenv("PROGRESS_BUCKET_SIZE", "100"))
+# Smoothing factor of the exponential moving average over scores
+EMA_ALPHA = float(os.getenv("PROGRESS_EMA_ALPHA", "0.3"))
+# Bucket and summary documents per insert_many while rebuilding series
+REBUILD_WRITE_BATCH_SIZE = 1000
+
+
+class ProgressService:
+    """
+    Score series per (user, assessment)
+
+    Events are appended to bucketed documents in `progress_buckets`; a summary
+    document in `progress_series` keeps first/latest score, count, EMA and the
+    running least-squares sums, so improvement and trend are O(1) to read.
+    """
+
+    @staticmethod
+    def series_id(user_id: str, assessment_id: str) -> str:
+        return f"{user_id}:{assessment_id}"
+
+    async def get_summary(self, db: AsyncIOMotorDatabase, user_id: str, assessment_id: str) -> Optional[dict]:
+        return await db.progress_series.find_one({"_id": self.series_id(user_id, assessment_id)})
+
+    async def get_summaries(self, db: AsyncIOMotorDatabase, pairs: list) -> dict:
+        """Summaries for many (user_id, assessment_id) pairs in one query, keyed by series id"""
+        series_ids = list({self.series_id(user_id, assessment_id) for user_id, assessment_id in pairs})
+        cursor = db.progress_series.find({"_id": {"$in": series_ids}})
+        return {summary["_id"]: summary async for summary in cursor}
+
+    async def record_score(self, db: AsyncIOMotorDatabase, result: dict) -> dict:
+        """
+        Append a stored result's score to its series and update the summary
+
+        Returns:
+            The updated summary document
+        """
+        user_id = result["user_id"]
+        assessment_id = result["assessment_id"]
+        series_id = self.series_id(user_id, assessment_id)
+        score = result["score"]
+
+        # A full bucket no longer matches the filter, so the upsert opens the next one
+        await db.progress_buckets.update_one(
+            {"series_id": series_id, "count": {"$lt": BUCKET_SIZE}},
+            {
+                "$push": {"events": {
+                    "result_id": result["_id"],
+                    "score": score,
+                    "at": result["completed_at"]
+                }},
+                "$inc": {"count": 1},
+                "$min": {"start_at": result["completed_at"]},
+                "$max": {"end_at": result["completed_at"]},
+                "$setOnInsert": {"user_id": user_id, "assessment_id": assessment_id}
+            },
+            upsert=True
+        )
+
+        # x is the event index, so the regression sums give the per-attempt slope
+        n = {"$ifNull": ["$count", 0]}
+        return await db.progress_series.find_one_and_update(
+            {"_id": series_id},
+            [{"$set": {
+                "user_id": {"$literal": user_id},
+                "assessment_id": {"$literal": assessment_id},
+                "count": {"$add": [n, 1]},
+                "first_score": {"$ifNull": ["$first_score", score]},
+                "latest_score": score,
+                "ema": {"$cond": [
+                    {"$eq": [n, 0]},
+                    score,
+                    {"$add": [EMA_ALPHA * score, {"$multiply": [1 - EMA_ALPHA, "$ema"]}]}
+                ]},
+                "sum_x": {"$add": [{"$ifNull": ["$sum_x", 0]}, n]},
+                "sum_y": {"$add": [{"$ifNull": ["$sum_y", 0]}, score]},
+                "sum_xx": {"$add": [{"$ifNull": ["$sum_xx", 0]}, {"$multiply": [n, n]}]},
+                "sum_xy": {"$add": [{"$ifNull": ["$sum_xy", 0]}, {"$multiply": [n, score]}]},
+                "updated_at": datetime.utcnow()
+            }}],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+
+    @staticmethod
+    def improvement_delta(summary: Optional[dict], score: float) -> float:
+        """Improvement percentage of `score` over the first score in the series"""
+        if not summary:
+            return 0.0
+
+        first_score = summary["first_score"]
+        if first_score == 0:
+            return 0.0
+
+        return round(((score - first_score) / first_score) * 100, 1)
+
+    @staticmethod
+    def trend_slope(summary: Optional[dict]) -> float:
+        """Least-squares score change per attempt"""
+        if not summary or summary["count"] < 2:
+            return 0.0
+
+        n = summary["count"]
+        denominator = n * summary["sum_xx"] - summary["sum_x"] ** 2
+        if denominator == 0:
+            return 0.0
+
+        return round((n * summary["sum_xy"] - summary["sum_x"] * summary["sum_y"]) / denominator, 3)
+
+    async def get_series(self, db: AsyncIOMotorDatabase, user_id: str, assessment_id: str, limit: int = 100) -> Optional[dict]:
+        """Summary plus the most recent `limit` score events, oldest first"""
+        summary = await self.get_summary(db, user_id, assessment_id)
+        if not summary:
+            return None
+
+        events = []
+        buckets = db.progress_buckets.find(
+            {"series_id": summary["_id"]},
+            {"events": 1}
+        ).sort("start_at", DESCENDING)
+        async for bucket in buckets:
+            events = bucket["events"] + events
+            if len(events) >= limit:
+                break
+
+        return {
+            "user_id": user_id,
+            "assessment_id": assessment_id,
+            "count": summary["count"],
+            "first_score": summary["first_score"],
+            "latest_score": summary["latest_score"],
+            "ema": round(summary["ema"], 1),
+            "improvement": self.improvement_delta(summary, summary["latest_score"]),
+            "trend_slope": self.trend_slope(summary),
+            "events": events[-limit:]
+        }
+
+    @staticmethod
+    def series_documents(series_id: str, results: List[dict]) -> Tuple[List[dict], dict]:
+        """
+        Bucket and summary documents of one series, as record_score would leave them
+
+        Args:
+            results: the series' results sorted by completed_at
+        """
+        user_id = results[0]["user_id"]
+        assessment_id = results[0]["assessment_id"]
+        events = [{"result_id": r["_id"], "score": r["score"], "at": r["completed_at"]} for r in results]
+        buckets = []
+        for start in range(0, len(events), BUCKET_SIZE):
+            chunk = events[start:start + BUCKET_SIZE]
+            buckets.append({
+                "series_id": series_id,
+                "user_id": user_id,
+                "assessment_id": assessment_id,
+                "events": chunk,
+                "count": len(chunk),
+                "start_at": min(event["at"] for event in chunk),
+                "end_at": max(event["at"] for event in chunk)
+            })
+
+        scores = [event["score"] for event in events]
+        ema = scores[0]
+        for score in scores[1:]:
+            ema = EMA_ALPHA * score + (1 - EMA_ALPHA) * ema
+        summary = {
+            "_id": series_id,
+            "user_id": user_id,
+            "assessment_id": assessment_id,
+            "count": len(scores),
+            "first_score": scores[0],
+            "latest_score": scores[-1],
+            "ema": ema,
+            "sum_x": sum(range(len(scores))),
+            "sum_y": sum(scores),
+            "sum_xx": sum(x * x for x in range(len(scores))),
+            "sum_xy": sum(x * score for x, score in enumerate(scores)),
+            "updated_at": datetime.utcnow()
+        }
+        return buckets, summary
+
+    async def rebuild_series(self, db: AsyncIOMotorDatabase, user_ids: Iterable[str] = None) -> int:
+        """
+        Recreate series from assessment_results, for the given users or everyone
+
+        Results are read in series order and each finished series is written
+        as whole documents with batched insert_many, instead of one
+        record_score round trip per result.
+        """
+        if isinstance(user_ids, str):
+            user_ids = [user_ids]
+        query = {"user_id": {"$in": list(user_ids)}} if user_ids else {}
+        await db.progress_buckets.delete_many(query)
+        await db.progress_series.delete_many(query)
+
+        count = 0
+        buckets, summaries, results = [], [], []
+
+        async def flush(force: bool = False):
+            nonlocal buckets, summaries
+            if buckets and (force or len(buckets) >= REBUILD_WRITE_BATCH_SIZE):
+                await db.progress_buckets.insert_many(buckets, ordered=False)
+                buckets = []
+            if summaries and (force or len(summaries) >= REBUILD_WRITE_BATCH_SIZE):
+                await db.progress_series.insert_many(summaries, ordered=False)
+                summaries = []
+
+        async def finish_series():
+            series_buckets, summary = self.series_documents(
+                self.series_id(results[0]["user_id"], results[0]["assessment_id"]), results
+            )
+            buckets.extend(series_buckets)
+            summaries.append(summary)
+            await flush()
+
+        cursor = db.assessment_results.find(
+            query,
+            {"user_id": 1, "assessment_id": 1, "score": 1, "completed_at": 1}
+        ).sort([("user_id", ASCENDING), ("assessment_id", ASCENDING), ("completed_at", ASCENDING)])
+        async for result in cursor:
+            if results and (result["user_id"], result["assessment_id"]) != (results[0]["user_id"], results[0]["assessment_id"]):
+                await finish_series()
+                results = []
+            results.append(result)
+            count += 1
+
+        if results:
+            await finish_series()
+        await flush(force=True)
+        return count
+
+# Create singleton instance
+progress_service = ProgressService()
@@ -0,0 +1,139 @@
+from itertools import groupby
+from typing import Callable, Tuple
+import os
+import re
+import logging
+
+from token_utils import count_tokens, truncate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Runs of at least this many identical lines are collapsed to one line and a marker
+MIN_REPEAT_RUN = 3
+# Share of a truncated section kept from its start; the rest is kept from its end
+TRUNCATION_HEAD_RATIO = 0.7
+# Tokens reserved for the omission marker of a truncated section
+TRUNCATION_MARKER_TOKENS = 16
+
+FENCED_BLOCK = re.compile(r"```.*?```", re.S)
+
+
+class EvaluationPromptBuilder:
+    """
+    Builds evaluation prompts within an input token budget
+
+    Prompts that fit are sent unchanged. Oversized scenarios and responses
+    are compacted in deterministic stages, stopping as soon as a section
+    fits its share of the budget: whitespace normalization, collapsing
+    repeated lines and duplicate code blocks, then head/tail truncation
+    with an explicit omission marker.
+    """
+
+    def __init__(self):
+        self.input_budget = int(os.getenv("EVAL_INPUT_TOKEN_BUDGET", "6000"))
+        # The evaluation JSON (score, one feedback paragraph, three strengths,
+        # three areas) fits comfortably in this; anything longer is rambling
+        self.max_output_tokens = int(os.getenv("EVAL_MAX_OUTPUT_TOKENS", "800"))
+
+    @staticmethod
+    def normalize_whitespace(text: str) -> str:
+        """Trailing whitespace, runs of inner spaces and blank-line runs; indentation is kept"""
+        lines = [
+            re.sub(r"(?<=\S)[ \t]{2,}", " ", line.rstrip())
+            for line in text.replace("\r\n", "\n").expandtabs(4).split("\n")
+        ]
+        return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+    @staticmethod
+    def collapse_repeats(text: str) -> str:
+        """Drop repeated fenced code blocks and collapse runs of identical lines"""
+        seen_blocks = set()
+
+        def dedupe_block(match) -> str:
+            block = match.group(0)
+            if block in seen_blocks:
+                return "[... duplicate code block omitted ...]"
+            seen_blocks.add(block)
+            return block
+
+        text = FENCED_BLOCK.sub(dedupe_block, text)
+
+        lines = []
+        for line, run in groupby(text.split("\n")):
+            run_length = len(list(run))
+            if run_length >= MIN_REPEAT_RUN and line.strip():
+                lines.append(line)
+                lines.append(f"[... previous line repeated {run_length - 1} more times ...]")
+            else:
+                lines.extend([line] * run_length)
+        return "\n".join(lines)
+
+    @staticmethod
+    def truncate(text: str, max_tokens: int) -> str:
+        """Keep the start and the end of the text, marking how much was cut from the middle"""
+        tokens = count_tokens(text)
+        if tokens <= max_tokens:
+            return text
+
+        keep = max(max_tokens - TRUNCATION_MARKER_TOKENS, 0)
+        head_tokens = int(keep * TRUNCATION_HEAD_RATIO)
+        head = truncate_tokens(text, head_tokens)
+        tail = truncate_tokens(text, keep - head_tokens, from_end=True)
+        return f"{head}\n[... {tokens - keep} tokens omitted ...]\n{tail}"
+
+    def compact(self, text: str, max_tokens: int) -> str:
+        """Apply compaction stages until the text fits max_tokens"""
+        if count_tokens(text) <= max_tokens:
+            return text
+
+        text = self.normalize_whitespace(text)
+        if count_tokens(text) <= max_tokens:
+            return text
+
+        text = self.collapse_repeats(text)
+        if count_tokens(text) <= max_tokens:
+            return text
+
+        return self.truncate(text, max_tokens)
+
+    def build(
+        self,
+        render: Callable[[str, str], str],
+        system_message: str,
+        scenario: str,
+        user_response: str
+    ) -> Tuple[str, dict]:
+        """
+        Render the prompt, compacting scenario and response to fit the input budget
+
+        Args:
+            render: Renders the prompt from (scenario, user_response)
+            system_message: System message sent with the prompt, counted against the budget
+            scenario: The assessment scenario
+            user_response: The candidate's response
+
+        Returns:
+            The prompt and its token counts before and after compaction
+        """
+        system_tokens = count_tokens(system_message)
+        prompt = render(scenario, user_response)
+        tokens_before = system_tokens + count_tokens(prompt)
+
+        if tokens_before <= self.input_budget:
+            return prompt, {"tokens_before": tokens_before, "tokens_after": tokens_before, "compacted": False}
+
+        # Budget left for the two sections once the fixed template is paid for.
+        # The scenario keeps at least a third of it, the response gets the rest.
+        available = max(self.input_budget - system_tokens - count_tokens(render("", "")), 2 * TRUNCATION_MARKER_TOKENS)
+        response_tokens = count_tokens(user_response)
+        scenario = self.compact(scenario, max(available // 3, available - response_tokens))
+        user_response = self.compact(user_response, available - count_tokens(scenario))
+
+        prompt = render(scenario, user_response)
+        tokens_after = system_tokens + count_tokens(prompt)
+        logger.info(f"✂️ Compacted evaluation prompt from {tokens_before} to {tokens_after} tokens")
+
+        return prompt, {"tokens_before": tokens_before, "tokens_after": tokens_after, "compacted": True}
+
+# Create singleton instance
+evaluation_prompt_builder = EvaluationPromptBuilder()
@@ -0,0 +1,313 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, List, Optional
+import asyncio
+import csv
+import io
+import json
+import os
+import logging
+
+try:
+    import pyarrow
+    import pyarrow.parquet as parquet
+except ImportError:
+    pyarrow = None
+    parquet = None
+
+from text_compression import decompress_fields, RESULT_TEXT_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Exportable columns of assessment_results; result_id is always the first column
+EXPORT_FIELDS = (
+    "user_id", "assessment_id", "score", "improvement_delta", "proficiency_level", "skills",
+    "strengths", "areas_for_improvement", "ai_feedback", "user_response", "scenario_id", "completed_at"
+)
+# Columns exported by default: what offline modelling needs, without the free text
+DEFAULT_EXPORT_FIELDS = ("user_id", "assessment_id", "score", "improvement_delta", "proficiency_level", "skills", "completed_at")
+LIST_FIELDS = ("skills", "strengths", "areas_for_improvement")
+FLOAT_FIELDS = ("score", "improvement_delta")
+
+CHECKPOINT_FILE = "_checkpoint.json"
+
+
+class _DrainingSink(io.RawIOBase):
+    """Write-only file that hands back what was written since the last drain"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ResultExporter:
+    """
+    Streaming export of assessment_results to Parquet or CSV
+
+    Rows are read in (completed_at, _id) order through a Motor cursor in
+    batches of EXPORT_BATCH_SIZE and written one batch at a time, so memory
+    is bounded by the batch size, not the collection. Directory exports are
+    split into part files of EXPORT_ROWS_PER_PART rows; a checkpoint written
+    after each finished part lets an interrupted export resume where it
+    stopped. Parquet, the default format, needs pyarrow from requirements.txt.
+    """
+
+    def __init__(self):
+        self.batch_size = int(os.getenv("EXPORT_BATCH_SIZE", "10000"))
+        self.rows_per_part = int(os.getenv("EXPORT_ROWS_PER_PART", "1000000"))
+
+    @staticmethod
+    def parse_fields(fields: Optional[str]) -> tuple:
+        """Columns of a comma-separated list; raises ValueError on unknown columns"""
+        if not fields:
+            return DEFAULT_EXPORT_FIELDS
+        requested = tuple(f.strip() for f in fields.split(",") if f.strip())
+        unknown = [f for f in requested if f not in EXPORT_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return requested
+
+    @staticmethod
+    def check_format(export_format: str):
+        if export_format not in ("parquet", "csv"):
+            raise ValueError("format must be parquet or csv")
+        if export_format == "parquet" and pyarrow is None:
+            raise ValueError("Parquet export needs the pyarrow package; use format=csv or install pyarrow")
+
+    async def iter_batches(
+        self,
+        db: AsyncIOMotorDatabase,
+        fields: tuple,
+        since: datetime = None,
+        until: datetime = None,
+        after: tuple = None
+    ) -> AsyncIterator[List[dict]]:
+        """
+        Batches of projected result rows in (completed_at, _id) order
+
+        Args:
+            since, until: completed_at range, inclusive start and exclusive end
+            after: (completed_at, _id) of the last row already exported
+        """
+        query = {}
+        if since or until:
+            query["completed_at"] = {}
+            if since:
+                query["completed_at"]["$gte"] = since
+            if until:
+                query["completed_at"]["$lt"] = until
+        if after:
+            query["$or"] = [
+                {"completed_at": {"$gt": after[0]}},
+                {"completed_at": after[0], "_id": {"$gt": after[1]}}
+            ]
+
+        projection = {field: 1 for field in fields}
+        projection["completed_at"] = 1
+        cursor = db.assessment_results.find(query, projection).sort(
+            [("completed_at", 1), ("_id", 1)]
+        ).batch_size(self.batch_size)
+
+        batch = []
+        async for row in cursor:
+            batch.append(decompress_fields(row, RESULT_TEXT_FIELDS))
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _schema(fields: tuple):
+        types = {
+            "score": pyarrow.float64(),
+            "improvement_delta": pyarrow.float64(),
+            "completed_at": pyarrow.timestamp("ms"),
+            **{field: pyarrow.list_(pyarrow.string()) for field in LIST_FIELDS}
+        }
+        return pyarrow.schema(
+            [("result_id", pyarrow.string())] + [(field, types.get(field, pyarrow.string())) for field in fields]
+        )
+
+    @staticmethod
+    def _table(batch: List[dict], fields: tuple, schema):
+        columns = {"result_id": [row["_id"] for row in batch]}
+        for field in fields:
+            values = [row.get(field) for row in batch]
+            if field in FLOAT_FIELDS:
+                values = [float(v) if v is not None else None for v in values]
+            columns[field] = values
+        return pyarrow.Table.from_pydict(columns, schema=schema)
+
+    @staticmethod
+    def _csv_rows(batch: List[dict], fields: tuple) -> List[list]:
+        rows = []
+        for row in batch:
+            values = [row["_id"]]
+            for field in fields:
+                value = row.get(field)
+                if isinstance(value, datetime):
+                    value = value.isoformat()
+                elif isinstance(value, list):
+                    value = json.dumps(value)
+                values.append(value)
+            rows.append(values)
+        return rows
+
+    # ---- Streaming (HTTP) ----
+
+    async def stream(
+        self,
+        db: AsyncIOMotorDatabase,
+        export_format: str,
+        fields: tuple,
+        since: datetime = None,
+        until: datetime = None
+    ) -> AsyncIterator[bytes]:
+        """The export as a byte stream: CSV rows, or Parquet row groups as they are encoded"""
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(("result_id",) + fields)
+            async for batch in self.iter_batches(db, fields, since, until):
+                writer.writerows(self._csv_rows(batch, fields))
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+            yield buffer.getvalue().encode("utf-8")
+            return
+
+        schema = self._schema(fields)
+        sink = _DrainingSink()
+        writer = parquet.ParquetWriter(sink, schema, compression="zstd")
+        async for batch in self.iter_batches(db, fields, since, until):
+            # Encoding is CPU-bound; keep it off the event loop
+            await asyncio.to_thread(writer.write_table, self._table(batch, fields, schema))
+            yield sink.drain()
+        writer.close()
+        yield sink.drain()
+
+    # ---- Directory export with checkpoints (maintenance command) ----
+
+    def _read_checkpoint(self, output_dir: Path, params: dict) -> dict:
+        path = output_dir / CHECKPOINT_FILE
+        if not path.exists():
+            return {"params": params, "parts": 0, "rows": 0, "after": None, "complete": False}
+
+        checkpoint = json.loads(path.read_text())
+        if checkpoint["params"] != params:
+            raise ValueError(f"{output_dir} holds an export with different parameters; use a new directory")
+        return checkpoint
+
+    @staticmethod
+    def _write_checkpoint(output_dir: Path, checkpoint: dict):
+        tmp = output_dir / (CHECKPOINT_FILE + ".tmp")
+        tmp.write_text(json.dumps(checkpoint, indent=2))
+        tmp.replace(output_dir / CHECKPOINT_FILE)
+
+    async def export_to_directory(
+        self,
+        db: AsyncIOMotorDatabase,
+        output_dir: str,
+        export_format: str = "parquet",
+        fields: tuple = DEFAULT_EXPORT_FIELDS,
+        since: datetime = None,
+        until: datetime = None
+    ) -> dict:
+        """
+        Export into part files under output_dir, resuming from its checkpoint
+
+        Returns:
+            The final checkpoint: parts and rows written
+        """
+        self.check_format(export_format)
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        params = {
+            "format": export_format,
+            "fields": list(fields),
+            "since": since.isoformat() if since else None,
+            "until": until.isoformat() if until else None
+        }
+        checkpoint = self._read_checkpoint(output_dir, params)
+        if checkpoint["complete"]:
+            logger.info(f"✅ Export in {output_dir} is already complete")
+            return checkpoint
+
+        after = None
+        if checkpoint["after"]:
+            after = (datetime.fromisoformat(checkpoint["after"][0]), checkpoint["after"][1])
+            logger.info(f"↩️ Resuming export after {checkpoint['rows']} row(s) in {checkpoint['parts']} part(s)")
+
+        schema = self._schema(fields) if export_format == "parquet" else None
+        part = None
+
+        def open_part():
+            name = output_dir / f"part-{checkpoint['parts']:05d}.{export_format}"
+            tmp = name.with_suffix(name.suffix + ".tmp")
+            handle = None
+            if export_format == "parquet":
+                writer = parquet.ParquetWriter(str(tmp), schema, compression="zstd")
+            else:
+                handle = open(tmp, "w", newline="")
+                writer = csv.writer(handle)
+                writer.writerow(("result_id",) + fields)
+            return {"name": name, "tmp": tmp, "writer": writer, "handle": handle, "rows": 0, "last": None}
+
+        def close_part(part: dict):
+            if export_format == "parquet":
+                part["writer"].close()
+            else:
+                part["handle"].close()
+            part["tmp"].replace(part["name"])
+            checkpoint["parts"] += 1
+            checkpoint["rows"] += part["rows"]
+            checkpoint["after"] = [part["last"]["completed_at"].isoformat(), part["last"]["_id"]]
+            self._write_checkpoint(output_dir, checkpoint)
+
+        async for batch in self.iter_batches(db, fields, since, until, after):
+            while batch:
+                if part is None:
+                    part = open_part()
+                chunk, batch = batch[:self.rows_per_part - part["rows"]], batch[self.rows_per_part - part["rows"]:]
+                if export_format == "parquet":
+                    part["writer"].write_table(self._table(chunk, fields, schema))
+                else:
+                    part["writer"].writerows(self._csv_rows(chunk, fields))
+                part["rows"] += len(chunk)
+                part["last"] = chunk[-1]
+                if part["rows"] >= self.rows_per_part:
+                    close_part(part)
+                    logger.info(f"💾 Exported part {checkpoint['parts']} ({checkpoint['rows']} rows)")
+                    part = None
+
+        if part is not None and part["rows"]:
+            close_part(part)
+
+        checkpoint["complete"] = True
+        self._write_checkpoint(output_dir, checkpoint)
+        logger.info(f"✅ Exported {checkpoint['rows']} row(s) in {checkpoint['parts']} part(s) to {output_dir}")
+        return checkpoint
+
+# Create singleton instance
+result_exporter = ResultExporter()
@@ -0,0 +1,128 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import DESCENDING
+from datetime import datetime
+from typing import AsyncIterator, Optional
+import base64
+import json
+import logging
+
+from text_compression import decompress_fields, RESULT_TEXT_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Fields returned when the caller does not ask for specific ones: enough for a list view
+DEFAULT_FIELDS = ("assessment_id", "score", "improvement_delta", "proficiency_level", "skills", "completed_at")
+# Fields callers may request; the scenario text lives in the scenario store
+ALLOWED_FIELDS = DEFAULT_FIELDS + ("scenario_id", "ai_feedback", "strengths", "areas_for_improvement", "user_response")
+MAX_PAGE_SIZE = 100
+# Documents fetched per round trip while streaming
+STREAM_BATCH_SIZE = 200
+
+
+class ResultHistory:
+    """
+    A user's assessment results, newest first, without loading the history
+
+    Pages use keyset pagination on (completed_at, _id): the opaque cursor
+    encodes the last row returned and the next page starts strictly after
+    it, so every page is one index range scan regardless of depth. Only the
+    requested fields are projected.
+    """
+
+    @staticmethod
+    def encode_cursor(row: dict) -> str:
+        position = json.dumps([row["completed_at"].isoformat(), row["_id"]])
+        return base64.urlsafe_b64encode(position.encode()).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> tuple:
+        """(completed_at, _id) of a cursor; raises ValueError if it is malformed"""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            completed_at, result_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            return datetime.fromisoformat(completed_at), result_id
+        except Exception:
+            raise ValueError("Invalid cursor")
+
+    @staticmethod
+    def parse_fields(fields: Optional[str]) -> tuple:
+        """Requested fields of a comma-separated list; raises ValueError on unknown fields"""
+        if not fields:
+            return DEFAULT_FIELDS
+        requested = tuple(f.strip() for f in fields.split(",") if f.strip())
+        unknown = [f for f in requested if f not in ALLOWED_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return requested
+
+    def _query(self, user_id: str, assessment_id: Optional[str], cursor: Optional[str]) -> dict:
+        query = {"user_id": user_id}
+        if assessment_id:
+            query["assessment_id"] = assessment_id
+        if cursor:
+            completed_at, result_id = self.decode_cursor(cursor)
+            query["$or"] = [
+                {"completed_at": {"$lt": completed_at}},
+                {"completed_at": completed_at, "_id": {"$lt": result_id}}
+            ]
+        return query
+
+    def _find(self, db: AsyncIOMotorDatabase, user_id: str, assessment_id: Optional[str], cursor: Optional[str], fields: tuple):
+        # completed_at is always fetched to build the next cursor
+        projection = {field: 1 for field in fields}
+        projection["completed_at"] = 1
+        return db.assessment_results.find(
+            self._query(user_id, assessment_id, cursor),
+            projection
+        ).sort([("completed_at", DESCENDING), ("_id", DESCENDING)])
+
+    @staticmethod
+    def _serialize(row: dict, fields: tuple) -> dict:
+        row = decompress_fields(row, RESULT_TEXT_FIELDS)
+        item = {"result_id": row["_id"]}
+        for field in fields:
+            value = row.get(field)
+            item[field] = value.isoformat() if isinstance(value, datetime) else value
+        return item
+
+    async def get_page(
+        self,
+        db: AsyncIOMotorDatabase,
+        user_id: str,
+        limit: int = 20,
+        cursor: str = None,
+        assessment_id: str = None,
+        fields: tuple = DEFAULT_FIELDS
+    ) -> dict:
+        """
+        One page of results
+
+        Returns:
+            {"items": [...], "next_cursor": str or None}
+        """
+        limit = min(max(limit, 1), MAX_PAGE_SIZE)
+        # One extra row tells whether another page exists
+        rows = await self._find(db, user_id, assessment_id, cursor, fields).limit(limit + 1).to_list(limit + 1)
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            "items": [self._serialize(row, fields) for row in rows],
+            "next_cursor": self.encode_cursor(rows[-1]) if has_more else None
+        }
+
+    async def stream_ndjson(
+        self,
+        db: AsyncIOMotorDatabase,
+        user_id: str,
+        cursor: str = None,
+        assessment_id: str = None,
+        fields: tuple = DEFAULT_FIELDS
+    ) -> AsyncIterator[str]:
+        """Every result after the cursor as newline-delimited JSON, one document in memory at a time"""
+        rows = self._find(db, user_id, assessment_id, cursor, fields).batch_size(STREAM_BATCH_SIZE)
+        async for row in rows:
+            yield json.dumps(self._serialize(row, fields)) + "\n"
+
+# Create singleton instance
+result_history = ResultHistory()
@@ -0,0 +1,318 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, UpdateMany
+from pymongo.errors import BulkWriteError
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator
+import csv
+import json
+import os
+import time
+import uuid
+import logging
+
+import numpy as np
+
+try:
+    import pyarrow.parquet as parquet
+except ImportError:
+    parquet = None
+
+from analytics_service import analytics_service
+from azure_ai_service import PROFICIENCY_THRESHOLDS, BASE_PROFICIENCY_LEVEL
+from catalog_service import assessment_catalog
+from leaderboard_service import leaderboard_service
+from progress_service import progress_service
+from scenario_store import scenario_store
+from text_compression import compress_fields, RESULT_TEXT_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# List columns; CSV files carry them as JSON arrays, as written by export-results
+LIST_FIELDS = ("skills", "strengths", "areas_for_improvement")
+# Users per $in query when reading the existing first score of each series
+EXISTING_LOOKUP_CHUNK = 1000
+DUPLICATE_KEY_ERROR = 11000
+
+
+class ResultImporter:
+    """
+    Bulk import of historical assessment results, without LLM evaluation
+
+    The file is read twice. The first pass loads only the key columns into
+    NumPy arrays; `improvement_delta` (against the first score of each
+    (user, assessment) series by completed_at, including results already
+    stored) and `proficiency_level` are computed over the whole arrays at
+    once. The second pass streams the rows again and writes them with
+    unordered insert_many batches, so text columns never sit in memory for
+    the whole file. Rows carry their source `result_id` or a deterministic
+    one, so re-running an import skips what was already inserted.
+    """
+
+    def __init__(self):
+        self.batch_size = int(os.getenv("IMPORT_BATCH_SIZE", "5000"))
+
+    # ---- Reading ----
+
+    @staticmethod
+    def read_rows(path: str) -> Iterator[dict]:
+        """Raw rows of a .jsonl/.ndjson, .csv or .parquet file"""
+        suffix = Path(path).suffix.lower()
+        if suffix in (".jsonl", ".ndjson"):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        elif suffix == ".csv":
+            with open(path, newline="") as f:
+                for row in csv.DictReader(f):
+                    for field in LIST_FIELDS:
+                        if row.get(field):
+                            row[field] = json.loads(row[field])
+                    yield row
+        elif suffix == ".parquet":
+            if parquet is None:
+                raise ValueError("Parquet import needs the pyarrow package")
+            for batch in parquet.ParquetFile(path).iter_batches():
+                yield from batch.to_pylist()
+        else:
+            raise ValueError(f"Unsupported file type {suffix}; use .jsonl, .csv or .parquet")
+
+    @staticmethod
+    def normalize(row: dict) -> dict:
+        """Validated copy of a raw row; raises ValueError if a required field is missing or invalid"""
+        for field in ("user_id", "assessment_id", "score", "completed_at"):
+            if row.get(field) in (None, ""):
+                raise ValueError(f"missing {field}")
+
+        score = float(row["score"])
+        if not 0 <= score <= 100:
+            raise ValueError(f"score {score} out of range")
+
+        completed_at = row["completed_at"]
+        if not isinstance(completed_at, datetime):
+            completed_at = datetime.fromisoformat(str(completed_at))
+        # Stored timestamps are naive UTC
+        if completed_at.tzinfo is not None:
+            completed_at = completed_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+        return {**row, "user_id": str(row["user_id"]), "assessment_id": str(row["assessment_id"]),
+                "score": score, "completed_at": completed_at}
+
+    @staticmethod
+    def result_id(row: dict) -> str:
+        """Source id of a row, or a deterministic one so re-imports are idempotent"""
+        if row.get("result_id"):
+            return str(row["result_id"])
+        key = f"import:{row['user_id']}:{row['assessment_id']}:{row['completed_at'].isoformat()}:{row['score']}"
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, key))
+
+    # ---- Derived fields ----
+
+    async def _existing_first_scores(self, db: AsyncIOMotorDatabase, user_ids: list) -> dict:
+        """(first score, completed_at) of each stored series of the given users, keyed by series id"""
+        firsts = {}
+        for start in range(0, len(user_ids), EXISTING_LOOKUP_CHUNK):
+            pipeline = [
+                {"$match": {"user_id": {"$in": user_ids[start:start + EXISTING_LOOKUP_CHUNK]}}},
+                {"$sort": {"user_id": ASCENDING, "assessment_id": ASCENDING, "completed_at": ASCENDING}},
+                {"$group": {
+                    "_id": {"user_id": "$user_id", "assessment_id": "$assessment_id"},
+                    "score": {"$first": "$score"},
+                    "completed_at": {"$first": "$completed_at"}
+                }}
+            ]
+            async for group in db.assessment_results.aggregate(pipeline):
+                series_id = progress_service.series_id(group["_id"]["user_id"], group["_id"]["assessment_id"])
+                firsts[series_id] = (group["score"], group["completed_at"])
+        return firsts
+
+    @staticmethod
+    def proficiency_levels(scores: np.ndarray) -> np.ndarray:
+        """calculate_proficiency_level over an array of scores"""
+        return np.select(
+            [scores >= threshold for threshold, _ in PROFICIENCY_THRESHOLDS],
+            [level for _, level in PROFICIENCY_THRESHOLDS],
+            BASE_PROFICIENCY_LEVEL
+        )
+
+    @staticmethod
+    def improvement_deltas(scores: np.ndarray, base: np.ndarray) -> np.ndarray:
+        """progress_service.improvement_delta over arrays of scores and first scores"""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(base == 0, 0.0, np.round((scores - base) / base * 100, 1))
+
+    async def compute_derived(self, db: AsyncIOMotorDatabase, keys: dict) -> dict:
+        """
+        improvement_delta and proficiency_level of every valid row
+
+        Args:
+            keys: column lists of the valid rows: user_id, assessment_id, score, completed_at
+
+        Returns:
+            {"improvement_delta": array, "proficiency_level": array,
+             "rebased": [(user_id, assessment_id, first_score)] of stored series
+             whose first score is now an imported, earlier result}
+        """
+        scores = np.asarray(keys["score"], dtype=np.float64)
+        times = np.asarray(keys["completed_at"], dtype="datetime64[ms]")
+        series = np.asarray([
+            progress_service.series_id(user_id, assessment_id)
+            for user_id, assessment_id in zip(keys["user_id"], keys["assessment_id"])
+        ])
+        series_ids, codes = np.unique(series, return_inverse=True)
+
+        # Sort by (series, completed_at); the first row of each run is the series' first imported score
+        order = np.lexsort((times, codes))
+        sorted_codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        first_scores = scores[order][starts]
+        first_times = times[order][starts]
+
+        # A stored result that predates every imported one stays the series' first score
+        existing = await self._existing_first_scores(db, sorted(set(keys["user_id"])))
+        existing_scores = np.array([existing.get(sid, (np.nan, None))[0] for sid in series_ids], dtype=np.float64)
+        existing_times = np.array(
+            [existing[sid][1] if sid in existing else np.datetime64("NaT") for sid in series_ids],
+            dtype="datetime64[ms]"
+        )
+        keep_existing = existing_times <= first_times
+        base_scores = np.where(keep_existing, existing_scores, first_scores)
+
+        users = np.asarray(keys["user_id"], dtype=object)[order][starts]
+        assessments = np.asarray(keys["assessment_id"], dtype=object)[order][starts]
+        rebased = [
+            (users[g], assessments[g], float(first_scores[g]))
+            for g in np.flatnonzero(~keep_existing & ~np.isnat(existing_times))
+        ]
+
+        return {
+            "improvement_delta": self.improvement_deltas(scores, base_scores[codes]),
+            "proficiency_level": self.proficiency_levels(scores),
+            "rebased": rebased
+        }
+
+    async def rebase_existing(self, db: AsyncIOMotorDatabase, rebased: list) -> int:
+        """Recompute improvement_delta of stored results whose series gained an earlier first score"""
+        operations = [
+            UpdateMany(
+                {"user_id": user_id, "assessment_id": assessment_id},
+                [{"$set": {"improvement_delta": 0.0 if first_score == 0 else {
+                    "$round": [{"$multiply": [{"$divide": [{"$subtract": ["$score", first_score]}, first_score]}, 100]}, 1]
+                }}}]
+            )
+            for user_id, assessment_id, first_score in rebased
+        ]
+        if not operations:
+            return 0
+        result = await db.assessment_results.bulk_write(operations, ordered=False)
+        return result.modified_count
+
+    # ---- Import ----
+
+    async def _insert_batch(self, db: AsyncIOMotorDatabase, docs: list, report: dict):
+        try:
+            result = await db.assessment_results.insert_many(docs, ordered=False)
+            report["inserted"] += len(result.inserted_ids)
+        except BulkWriteError as e:
+            errors = e.details["writeErrors"]
+            duplicates = sum(1 for error in errors if error["code"] == DUPLICATE_KEY_ERROR)
+            report["inserted"] += e.details["nInserted"]
+            report["duplicates"] += duplicates
+            report["failed"] += len(errors) - duplicates
+
+    async def import_file(self, db: AsyncIOMotorDatabase, path: str, dry_run: bool = False) -> dict:
+        """
+        Import a file of historical results
+
+        Returns:
+            Report: rows read, rejected, inserted, duplicates (already imported),
+            failed, stored results rebased, timings and rows per second
+        """
+        started = time.perf_counter()
+        report = {"read": 0, "rejected": 0, "inserted": 0, "duplicates": 0, "failed": 0, "rebased_results": 0}
+
+        # Pass 1: key columns only
+        keys = {"user_id": [], "assessment_id": [], "score": [], "completed_at": []}
+        for line, row in enumerate(self.read_rows(path), start=1):
+            report["read"] += 1
+            try:
+                row = self.normalize(row)
+            except (ValueError, TypeError) as e:
+                report["rejected"] += 1
+                if report["rejected"] <= 10:
+                    logger.warning(f"⚠️ Row {line} rejected: {e}")
+                continue
+            for field in keys:
+                keys[field].append(row[field])
+
+        if not keys["score"]:
+            logger.warning(f"⚠️ No valid rows in {path}")
+            return report
+
+        derived = await self.compute_derived(db, keys)
+        report["compute_seconds"] = round(time.perf_counter() - started, 2)
+        report["users"] = sorted(set(keys["user_id"]))
+        logger.info(f"🧮 Derived fields computed for {len(keys['score'])} row(s) in {report['compute_seconds']}s")
+        del keys
+
+        if dry_run:
+            report["seconds"] = round(time.perf_counter() - started, 2)
+            return report
+
+        # Pass 2: stream full rows, attaching the derived values by position among valid rows
+        catalog = {a["_id"]: a for a in await assessment_catalog.list_assessments(db)}
+        imported_at = datetime.utcnow()
+        position = 0
+        batch = []
+        insert_started = time.perf_counter()
+        for row in self.read_rows(path):
+            try:
+                row = self.normalize(row)
+            except (ValueError, TypeError):
+                continue
+
+            scenario = row.get("scenario")
+            doc = {
+                "_id": self.result_id(row),
+                "user_id": row["user_id"],
+                "assessment_id": row["assessment_id"],
+                "scenario_id": await scenario_store.put(db, scenario) if scenario else None,
+                "user_response": row.get("user_response") or "",
+                "skills": row.get("skills") or catalog.get(row["assessment_id"], {}).get("skills", []),
+                "score": row["score"],
+                "ai_feedback": row.get("ai_feedback") or "",
+                "improvement_delta": float(derived["improvement_delta"][position]),
+                "strengths": row.get("strengths") or [],
+                "areas_for_improvement": row.get("areas_for_improvement") or [],
+                "proficiency_level": str(derived["proficiency_level"][position]),
+                "completed_at": row["completed_at"],
+                "imported_at": imported_at
+            }
+            position += 1
+            batch.append(compress_fields(doc, RESULT_TEXT_FIELDS))
+
+            if len(batch) >= self.batch_size:
+                await self._insert_batch(db, batch, report)
+                batch = []
+                rate = position / (time.perf_counter() - insert_started)
+                logger.info(f"📥 Imported {position} row(s) ({rate:,.0f} rows/s)")
+
+        if batch:
+            await self._insert_batch(db, batch, report)
+
+        report["rebased_results"] = await self.rebase_existing(db, derived["rebased"])
+        report["insert_seconds"] = round(time.perf_counter() - insert_started, 2)
+        report["seconds"] = round(time.perf_counter() - started, 2)
+        report["rows_per_second"] = round(position / report["insert_seconds"]) if report["insert_seconds"] else position
+        return report
+
+    async def rebuild_derived(self, db: AsyncIOMotorDatabase, user_ids: list):
+        """Rebuild stats, progress series and leaderboards after an import"""
+        for user_id in user_ids:
+            await analytics_service.rebuild_user_stats(db, user_id)
+        await progress_service.rebuild_series(db, user_ids)
+        await leaderboard_service.rebuild(db)
+
+# Create singleton instance
+result_importer = ResultImporter()
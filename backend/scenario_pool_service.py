@@ -0,0 +1,130 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING
+from datetime import datetime
+from typing import Optional
+import asyncio
+import os
+import logging
+
+from azure_ai_service import azure_ai_service
+from catalog_service import assessment_catalog
+
+logger = logging.getLogger(__name__)
+
+
+class ScenarioPoolService:
+    """Keeps a warm pool of pre-generated scenarios per assessment template"""
+
+    def __init__(self):
+        self.depth = int(os.getenv("SCENARIO_POOL_DEPTH", "3"))
+        self.refill_interval = float(os.getenv("SCENARIO_POOL_REFILL_INTERVAL_SECONDS", "60"))
+        self.hits = 0
+        self.misses = 0
+        self._refill_event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def pool_key(assessment: dict) -> str:
+        """Pool key for a template - scenarios are only interchangeable per template and difficulty"""
+        return f"{assessment['_id']}:{assessment['difficulty']}"
+
+    async def pop_scenario(self, db: AsyncIOMotorDatabase, assessment: dict) -> Optional[str]:
+        """
+        Take the oldest pooled scenario for this template
+
+        Returns:
+            Scenario text, or None when the pool is empty
+        """
+        doc = await db.scenario_pool.find_one_and_delete(
+            {"pool_key": self.pool_key(assessment)},
+            sort=[("created_at", ASCENDING)]
+        )
+
+        if doc:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+        # Wake the refill loop so the slot we just used is replaced
+        self._refill_event.set()
+
+        return doc["scenario"] if doc else None
+
+    async def fill_pool(self, db: AsyncIOMotorDatabase, assessment: dict) -> int:
+        """Generate scenarios until the template's pool reaches the configured depth"""
+        key = self.pool_key(assessment)
+        current = await db.scenario_pool.count_documents({"pool_key": key})
+
+        generated = 0
+        for _ in range(max(self.depth - current, 0)):
+            scenario = await azure_ai_service.generate_assessment_scenario(
+                assessment_title=assessment["title"],
+                difficulty=assessment["difficulty"],
+                skills=assessment["skills"]
+            )
+            await db.scenario_pool.insert_one({
+                "pool_key": key,
+                "assessment_id": assessment["_id"],
+                "difficulty": assessment["difficulty"],
+                "scenario": scenario,
+                "created_at": datetime.utcnow()
+            })
+            generated += 1
+
+        if generated:
+            logger.info(f"♻️ Scenario pool {key} refilled with {generated} scenario(s)")
+        return generated
+
+    async def _refill_loop(self, db: AsyncIOMotorDatabase):
+        while True:
+            self._refill_event.clear()
+            try:
+                for assessment in await assessment_catalog.list_assessments(db):
+                    await self.fill_pool(db, assessment)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error refilling scenario pool: {str(e)}")
+
+            try:
+                await asyncio.wait_for(self._refill_event.wait(), timeout=self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self, db: AsyncIOMotorDatabase):
+        """Start the background refill task"""
+        if self.depth <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._refill_loop(db))
+        logger.info(f"♻️ Scenario pool started (depth {self.depth})")
+
+    async def stop(self):
+        """Cancel the background refill task"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def get_stats(self, db: AsyncIOMotorDatabase) -> dict:
+        """Pool depth per template plus hit/miss counters"""
+        pipeline = [
+            {"$group": {"_id": "$pool_key", "depth": {"$sum": 1}}},
+            {"$sort": {"_id": ASCENDING}}
+        ]
+        depths = await db.scenario_pool.aggregate(pipeline).to_list(None)
+
+        total = self.hits + self.misses
+        return {
+            "target_depth": self.depth,
+            "pools": {d["_id"]: d["depth"] for d in depths},
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0
+        }
+
+# Create singleton instance
+scenario_pool_service = ScenarioPoolService()
@@ -0,0 +1,105 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
+from collections import OrderedDict
+from datetime import datetime
+from typing import Iterable, Optional
+import hashlib
+import os
+import logging
+
+from text_compression import compress_text, decompress_text
+
+logger = logging.getLogger(__name__)
+
+
+class ScenarioStore:
+    """
+    Content-addressed store of generated scenarios
+
+    Each scenario text is stored once in `scenarios` under the SHA-256 of its
+    content, compressed when large. Sessions and results keep only the
+    `scenario_id`. Scenarios are immutable, so recently used ones are kept
+    in a small in-process LRU.
+    """
+
+    def __init__(self):
+        self.cache_size = int(os.getenv("SCENARIO_CACHE_SIZE", "1000"))
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+
+    @staticmethod
+    def scenario_id(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _remember(self, scenario_id: str, text: str):
+        self._cache[scenario_id] = text
+        self._cache.move_to_end(scenario_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def put(self, db: AsyncIOMotorDatabase, text: str) -> str:
+        """Store a scenario if it is new; returns its id"""
+        scenario_id = self.scenario_id(text)
+        if scenario_id in self._cache:
+            return scenario_id
+
+        try:
+            await db.scenarios.update_one(
+                {"_id": scenario_id},
+                {"$setOnInsert": {
+                    "text": compress_text(text),
+                    "size": len(text.encode("utf-8")),
+                    "created_at": datetime.utcnow()
+                }},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # A concurrent upsert stored the same scenario first
+            pass
+
+        self._remember(scenario_id, text)
+        return scenario_id
+
+    async def get(self, db: AsyncIOMotorDatabase, scenario_id: str) -> Optional[str]:
+        if scenario_id in self._cache:
+            self._cache.move_to_end(scenario_id)
+            return self._cache[scenario_id]
+
+        doc = await db.scenarios.find_one({"_id": scenario_id})
+        if not doc:
+            return None
+
+        text = decompress_text(doc["text"])
+        self._remember(scenario_id, text)
+        return text
+
+    async def get_many(self, db: AsyncIOMotorDatabase, scenario_ids: Iterable[str]) -> dict:
+        """Scenario texts by id, fetching the ones not cached with one query"""
+        scenario_ids = set(scenario_ids)
+        texts = {sid: self._cache[sid] for sid in scenario_ids if sid in self._cache}
+
+        missing = [sid for sid in scenario_ids if sid not in texts]
+        if missing:
+            async for doc in db.scenarios.find({"_id": {"$in": missing}}):
+                texts[doc["_id"]] = decompress_text(doc["text"])
+                self._remember(doc["_id"], texts[doc["_id"]])
+
+        return texts
+
+    async def hydrate(self, db: AsyncIOMotorDatabase, sessions: Iterable[dict]):
+        """
+        Give sessions both `scenario` (text) and `scenario_id`, in place
+
+        Sessions stored before the scenario store embed the text; it is
+        stored here so results written for them can reference it.
+        """
+        sessions = list(sessions)
+        texts = await self.get_many(db, [s["scenario_id"] for s in sessions if "scenario_id" in s])
+        for session in sessions:
+            if "scenario_id" in session:
+                session["scenario"] = texts.get(session["scenario_id"], "")
+            else:
+                session["scenario"] = decompress_text(session.get("scenario", ""))
+                session["scenario_id"] = await self.put(db, session["scenario"])
+
+# Create singleton instance
+scenario_store = ScenarioStore()
@@ -1,29 +1,63 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+import asyncio
+import hmac
 import os
 import logging
 from pathlib import Path
 from datetime import datetime
+from typing import List, Optional, Tuple
+import time
 import uuid
 from bson import ObjectId
 
 # Import models and services
 from models import (
-    StartAssessmentRequest, StartAssessmentResponse,
+    Assessment, StartAssessmentRequest, StartAssessmentResponse,
     SubmitAssessmentRequest, SubmitAssessmentResponse,
-    DashboardMetrics
+    BatchSubmitRequest, BatchSubmitResponse, BatchSubmitItemResult,
+    DashboardMetrics, EvaluationStatusResponse, ProgressSeriesResponse, LeaderboardResponse,
+    ResultHistoryResponse
 )
 from azure_ai_service import azure_ai_service
 from analytics_service import analytics_service
+from scenario_pool_service import scenario_pool_service
+from evaluation_stream import EvaluationStreamParser, STREAMED_FIELDS, format_sse
+from evaluation_queue import evaluation_queue, PermanentJobError
+from indexes import ensure_indexes
+from progress_service import progress_service
+from leaderboard_service import leaderboard_service
+from session_claims import session_claims, SessionClaimError
+from session_lifecycle import session_lifecycle
+from scenario_store import scenario_store
+from result_history import result_history
+from result_export import result_exporter
+from trend_engine import trend_engine
+from similarity_index import similarity_index
+from coordination import create_llm_limiter, leader_election, startup_lock
+from migrations import migration_runner
+from text_compression import compress_fields, decompress_text, RESULT_TEXT_FIELDS
+from idempotency import idempotency_store, IdempotencyError
+from catalog_service import assessment_catalog
+from dashboard_cache import dashboard_cache
+from evaluation_cache import evaluation_cache
+from llm_client import llm_client
+from instrumentation import (
+    stage, begin_request_timing, server_timing_header, render_metrics,
+    mongo_command_timer, HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT
+)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[mongo_command_timer])
 db = client[os.environ['DB_NAME']]
 
 # Create the main app
@@ -39,15 +73,32 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Browser/CDN freshness for the assessment catalog listing
+CATALOG_CACHE_MAX_AGE = int(os.getenv("CATALOG_CACHE_MAX_AGE_SECONDS", "60"))
+
+# Admin endpoints are disabled unless a token is configured
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN")
+
+# Batch grading: evaluations in flight per batch (the LLM client caps upstream calls
+# on top of this), items accepted per request and the per-item evaluation deadline
+BATCH_EVAL_CONCURRENCY = int(os.getenv("BATCH_EVAL_CONCURRENCY", "16"))
+BATCH_SUBMIT_MAX_ITEMS = int(os.getenv("BATCH_SUBMIT_MAX_ITEMS", "500"))
+BATCH_ITEM_TIMEOUT_SECONDS = float(os.getenv("BATCH_ITEM_TIMEOUT_SECONDS", "180"))
+
+# Multi-worker startup: how long a worker waits for another to finish startup tasks,
+# and whether pending migrations are applied then (otherwise: maintenance.py migrate)
+STARTUP_LOCK_TIMEOUT_SECONDS = float(os.getenv("STARTUP_LOCK_TIMEOUT_SECONDS", "600"))
+RUN_MIGRATIONS_ON_STARTUP = os.getenv("RUN_MIGRATIONS_ON_STARTUP", "true").lower() == "true"
+
 # Seed assessments on startup
 async def seed_assessments():
-    """Seed initial assessment templates if they don't exist"""
+    """
+    Seed initial assessment templates that don't exist yet
+    
+    Each template is an upsert on its _id with $setOnInsert, so concurrent
+    workers cannot race into duplicates and existing templates are left as edited
+    """
     try:
-        count = await db.assessments.count_documents({})
-        if count > 0:
-            logger.info("Assessments already seeded")
-            return
-        
         assessments = [
             {
                 "_id": "frontend-engineering",
@@ -81,20 +132,215 @@ async def seed_assessments():
             }
         ]
         
-        await db.assessments.insert_many(assessments)
-        logger.info(f"✅ Seeded {len(assessments)} assessments")
+        result = await db.assessments.bulk_write([
+            UpdateOne(
+                {"_id": assessment["_id"]},
+                {"$setOnInsert": {k: v for k, v in assessment.items() if k != "_id"}},
+                upsert=True
+            )
+            for assessment in assessments
+        ], ordered=False)
+        if result.upserted_count:
+            logger.info(f"✅ Seeded {result.upserted_count} assessments")
+        else:
+            logger.info("Assessments already seeded")
         
     except Exception as e:
         logger.error(f"Error seeding assessments: {str(e)}")
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database and seed data"""
-    await seed_assessments()
+    """
+    Initialize database and seed data
+    
+    Safe under several worker processes: indexes, migrations and seeding run
+    one worker at a time under the startup lock (later workers find nothing
+    left to do), background loops run on the elected leader only, and every
+    worker processes evaluation jobs.
+    """
+    llm_limiter = create_llm_limiter(db, lease_seconds=max(llm_client.timeouts.values()) + 60)
+    llm_client.start(llm_limiter)
+    
+    async with startup_lock.hold(db, timeout=STARTUP_LOCK_TIMEOUT_SECONDS):
+        await ensure_indexes(db)
+        if RUN_MIGRATIONS_ON_STARTUP:
+            applied = await migration_runner.apply(db)
+            if applied:
+                logger.info(f"✅ Applied migrations: {', '.join(applied)}")
+        await seed_assessments()
+        await llm_limiter.setup(db)
+    
+    await assessment_catalog.refresh(db)
+    leader_election.start(db, start_leader_tasks, stop_leader_tasks)
+    await evaluation_queue.start(db, process_evaluation_job)
     logger.info("🚀 SkillSphere API started successfully")
 
+async def start_leader_tasks():
+    """Background loops that run once per deployment, on the leader"""
+    scenario_pool_service.start(db)
+    session_lifecycle.start(db)
+    trend_engine.start(db)
+
+async def stop_leader_tasks():
+    await scenario_pool_service.stop()
+    await session_lifecycle.stop()
+    await trend_engine.stop()
+
+def build_result(session: dict, user_id: str, user_response: str, evaluation: dict, improvement_delta: float, result_id: str = None) -> dict:
+    """Assessment result document for an evaluated submission"""
+    return {
+        "_id": result_id or str(uuid.uuid4()),
+        "user_id": user_id,
+        "assessment_id": session["assessment_id"],
+        "scenario_id": session["scenario_id"],
+        "user_response": user_response,
+        "minhash": similarity_index.signature_binary(user_response),
+        "skills": session["skills"],
+        "score": evaluation["score"],
+        "ai_feedback": evaluation["feedback"],
+        "improvement_delta": improvement_delta,
+        "strengths": evaluation["strengths"],
+        "areas_for_improvement": evaluation["areas_for_improvement"],
+        "proficiency_level": azure_ai_service.calculate_proficiency_level(evaluation["score"]),
+        "completed_at": datetime.utcnow()
+    }
+
+async def store_evaluation_result(session: dict, user_id: str, user_response: str, evaluation: dict, result_id: str = None, claim_token: str = None) -> SubmitAssessmentResponse:
+    """
+    Persist an evaluated submission, mark its session completed and build the API response
+    
+    With a claim token the session is only completed if the claim is still
+    held; otherwise the result is withdrawn and SessionClaimError raised.
+    """
+    # Calculate improvement using Azure ML-inspired analytics
+    with stage("analytics.calculate_improvement"):
+        improvement_delta = await analytics_service.calculate_improvement(
+            db=db,
+            user_id=user_id,
+            assessment_id=session["assessment_id"],
+            score=evaluation["score"]
+        )
+    
+    # Store result
+    result = build_result(session, user_id, user_response, evaluation, improvement_delta, result_id)
+    
+    with stage("mongo.insert_result"):
+        await db.assessment_results.insert_one(compress_fields(result, RESULT_TEXT_FIELDS))
+    
+    # Mark session as completed
+    with stage("mongo.complete_session"):
+        completed = await session_claims.complete(db, session["_id"], claim_token)
+    if not completed:
+        await db.assessment_results.delete_one({"_id": result["_id"]})
+        raise SessionClaimError(409, "Session was claimed by another submission")
+    
+    with stage("analytics.record_result"):
+        await analytics_service.record_result(db, result, session["assessment_title"], session["skills"])
+        await progress_service.record_score(db, result)
+        await leaderboard_service.record_score(db, result)
+    dashboard_cache.invalidate(user_id)
+    
+    await index_similarity([result])
+    
+    return result_to_response(result)
+
+async def index_similarity(results: list):
+    """Flag stored results that copy earlier submissions; never fails the submission"""
+    try:
+        with stage("similarity.index"):
+            await similarity_index.index_results(db, results)
+    except Exception as e:
+        logger.error(f"❌ Error indexing response similarity: {str(e)}")
+
+def require_admin(token: Optional[str]):
+    """Reject admin requests without the configured X-Admin-Token"""
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API is disabled")
+    if not token or not hmac.compare_digest(token, ADMIN_API_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against the current ETag"""
+    if not if_none_match or not etag:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+def result_to_response(result: dict) -> SubmitAssessmentResponse:
+    """Build the submit response from a stored assessment result"""
+    return SubmitAssessmentResponse(
+        result_id=result["_id"],
+        score=result["score"],
+        ai_feedback=decompress_text(result["ai_feedback"]),
+        improvement_delta=result["improvement_delta"],
+        proficiency_level=result["proficiency_level"],
+        strengths=result["strengths"],
+        areas_for_improvement=result["areas_for_improvement"]
+    )
+
+async def process_evaluation_job(job: dict):
+    """Evaluation queue handler: evaluate a queued submission and store it under the job's result_id"""
+    payload = job["payload"]
+    
+    # A previous attempt may have stored the result before the job was marked completed
+    if await db.assessment_results.find_one({"_id": job["_id"]}, {"_id": 1}):
+        await session_claims.complete(db, payload["session_id"], job["_id"])
+        return
+    
+    # The job id is the claim token, so a retried job can claim its own session again
+    try:
+        session, claim_token = await session_claims.claim(db, payload["session_id"], token=job["_id"])
+    except SessionClaimError as e:
+        if e.status_code == 409:
+            raise
+        raise PermanentJobError(e.detail)
+    
+    logger.info(f"🤖 Calling Azure OpenAI to evaluate queued submission {job['_id']}...")
+    try:
+        async with session_claims.held(db, session["_id"], claim_token):
+            evaluation = await evaluation_cache.evaluate(
+                db,
+                scenario=session["scenario"],
+                user_response=payload["user_response"],
+                skills=session["skills"]
+            )
+    except Exception:
+        await session_claims.release(db, session["_id"], claim_token)
+        raise
+    
+    response = await store_evaluation_result(
+        session, payload["user_id"], payload["user_response"], evaluation, result_id=job["_id"], claim_token=claim_token
+    )
+    
+    logger.info(f"✅ Queued assessment evaluated - Score: {response.score}, Proficiency: {response.proficiency_level}")
+
 # ============= API ENDPOINTS =============
 
+@api_router.get("/assessments")
+async def list_assessments(request: Request):
+    """
+    List assessment templates from the in-process catalog
+    Conditional requests with a matching If-None-Match get 304 Not Modified
+    """
+    try:
+        assessments = await assessment_catalog.list_assessments(db)
+        headers = {
+            "ETag": assessment_catalog.etag,
+            "Cache-Control": f"public, max-age={CATALOG_CACHE_MAX_AGE}"
+        }
+        
+        if etag_matches(request.headers.get("if-none-match"), assessment_catalog.etag):
+            return Response(status_code=304, headers=headers)
+        
+        return JSONResponse(
+            content=[Assessment(**a).model_dump(mode="json") for a in assessments],
+            headers=headers
+        )
+        
+    except Exception as e:
+        logger.error(f"❌ Error listing assessments: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.post("/assessments/start", response_model=StartAssessmentResponse)
 async def start_assessment(request: StartAssessmentRequest):
     """
@@ -104,33 +350,48 @@ async def start_assessment(request: StartAssessmentRequest):
     try:
         logger.info(f"📝 Starting assessment: {request.assessment_id} for user: {request.user_id}")
         
-        # Get assessment template
-        assessment = await db.assessments.find_one({"_id": request.assessment_id})
+        # Get assessment template from the in-process catalog
+        with stage("catalog.get_assessment"):
+            assessment = await assessment_catalog.get_assessment(db, request.assessment_id)
         if not assessment:
             raise HTTPException(status_code=404, detail="Assessment not found")
         
-        # Generate scenario using Azure OpenAI
-        logger.info(f"🤖 Calling Azure OpenAI to generate scenario...")
-        scenario = await azure_ai_service.generate_assessment_scenario(
-            assessment_title=assessment["title"],
-            difficulty=assessment["difficulty"],
-            skills=assessment["skills"]
-        )
+        # Use a pre-generated scenario when available, otherwise generate one live
+        with stage("mongo.pop_pooled_scenario"):
+            scenario = await scenario_pool_service.pop_scenario(db, assessment)
+        if scenario:
+            logger.info(f"♻️ Using pooled scenario for {request.assessment_id}")
+        else:
+            logger.info(f"🤖 Scenario pool empty - calling Azure OpenAI to generate scenario...")
+            scenario = await azure_ai_service.generate_assessment_scenario(
+                assessment_title=assessment["title"],
+                difficulty=assessment["difficulty"],
+                skills=assessment["skills"]
+            )
         
-        # Create assessment session
+        # Create assessment session; the scenario text is stored once and referenced
+        with stage("mongo.put_scenario"):
+            scenario_id = await scenario_store.put(db, scenario)
         session_id = str(uuid.uuid4())
+        created_at = datetime.utcnow()
         session = {
             "_id": session_id,
             "user_id": request.user_id,
             "assessment_id": request.assessment_id,
             "assessment_title": assessment["title"],
-            "scenario": scenario,
+            "scenario_id": scenario_id,
             "skills": assessment["skills"],
             "completed": False,
-            "created_at": datetime.utcnow()
+            "status": "pending",
+            "created_at": created_at,
+            "expires_at": session_lifecycle.expires_at(created_at, assessment["duration"])
         }
         
-        await db.assessment_sessions.insert_one(session)
+        with stage("mongo.insert_session"):
+            await db.assessment_sessions.insert_one(session)
+        with stage("analytics.record_session_started"):
+            await analytics_service.record_session_started(db, request.user_id)
+        dashboard_cache.invalidate(request.user_id)
         
         logger.info(f"✅ Assessment session created: {session_id}")
         
@@ -146,100 +407,592 @@ async def start_assessment(request: StartAssessmentRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.post("/assessments/submit", response_model=SubmitAssessmentResponse)
-async def submit_assessment(request: SubmitAssessmentRequest):
+async def submit_assessment(request: SubmitAssessmentRequest, async_mode: bool = False, idempotency_key: Optional[str] = Header(None)):
     """
     Submit assessment response and get AI evaluation
     Uses Azure OpenAI for evaluation and Azure ML for improvement tracking
+    
+    With `async_mode=true` the evaluation is queued and the endpoint returns
+    202 with a `result_id` to poll on GET /api/results/{result_id}
+    
+    The session is claimed atomically before evaluating, so a concurrent
+    duplicate submit gets 409 instead of a second evaluation. Retries sent
+    with the same `Idempotency-Key` header get the stored response replayed.
     """
     try:
         logger.info(f"📤 Submitting assessment: {request.session_id}")
         
-        # Get session
-        session = await db.assessment_sessions.find_one({"_id": request.session_id})
+        scope = f"submit:{request.user_id}"
+        if idempotency_key:
+            with stage("mongo.idempotency_key"):
+                stored = await idempotency_store.begin(
+                    db, scope, idempotency_key, {**request.model_dump(), "async_mode": async_mode}
+                )
+            if stored:
+                logger.info(f"♻️ Replaying stored response for Idempotency-Key {idempotency_key}")
+                return JSONResponse(
+                    status_code=stored["status_code"], content=stored["body"], headers={"Idempotent-Replayed": "true"}
+                )
+        
+        try:
+            status_code, body = await run_submission(request, async_mode)
+        except Exception:
+            if idempotency_key:
+                await idempotency_store.abandon(db, scope, idempotency_key)
+            raise
+        
+        if idempotency_key:
+            await idempotency_store.complete(db, scope, idempotency_key, status_code, body)
+        
+        return JSONResponse(status_code=status_code, content=body)
+        
+    except (SessionClaimError, IdempotencyError) as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error submitting assessment: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def run_submission(request: SubmitAssessmentRequest, async_mode: bool) -> Tuple[int, dict]:
+    """Evaluate or queue a submission; returns the status code and JSON body of the response"""
+    if async_mode:
+        # The queue worker claims the session; reject what is already known to fail
+        with stage("mongo.find_session"):
+            session = await db.assessment_sessions.find_one(
+                {"_id": request.session_id}, {"completed": 1, "status": 1, "expires_at": 1}
+            )
         if not session:
+            if await session_claims.archived(db, [request.session_id]):
+                raise HTTPException(status_code=410, detail="Assessment session expired")
             raise HTTPException(status_code=404, detail="Session not found")
         
         if session["completed"]:
             raise HTTPException(status_code=400, detail="Assessment already submitted")
         
-        # Evaluate using Azure OpenAI
-        logger.info(f"🤖 Calling Azure OpenAI to evaluate submission...")
-        evaluation = await azure_ai_service.evaluate_assessment(
-            scenario=session["scenario"],
-            user_response=request.user_response,
-            skills=session["skills"]
-        )
+        if session_claims.is_expired(session):
+            raise HTTPException(status_code=410, detail="Assessment session expired")
         
-        # Calculate proficiency level
-        proficiency_level = azure_ai_service.calculate_proficiency_level(evaluation["score"])
+        result_id = str(uuid.uuid4())
+        with stage("mongo.enqueue_evaluation"):
+            await evaluation_queue.enqueue(db, result_id, {
+                "session_id": request.session_id,
+                "user_id": request.user_id,
+                "user_response": request.user_response,
+                "time_spent_minutes": request.time_spent_minutes
+            })
         
-        # Calculate improvement using Azure ML-inspired analytics
-        improvement_delta = await analytics_service.calculate_improvement(
-            db=db,
-            user_id=request.user_id,
-            assessment_id=session["assessment_id"]
-        )
+        logger.info(f"📥 Evaluation queued: {result_id}")
         
-        # Store result
-        result_id = str(uuid.uuid4())
-        result = {
-            "_id": result_id,
-            "user_id": request.user_id,
-            "assessment_id": session["assessment_id"],
-            "scenario": session["scenario"],
-            "user_response": request.user_response,
-            "score": evaluation["score"],
-            "ai_feedback": evaluation["feedback"],
-            "improvement_delta": improvement_delta,
-            "strengths": evaluation["strengths"],
-            "areas_for_improvement": evaluation["areas_for_improvement"],
-            "proficiency_level": proficiency_level,
-            "completed_at": datetime.utcnow()
+        return 202, {
+            "result_id": result_id,
+            "status": "pending",
+            "status_url": f"/api/results/{result_id}"
         }
+    
+    with stage("mongo.claim_session"):
+        session, claim_token = await session_claims.claim(db, request.session_id)
+    
+    # Evaluate using Azure OpenAI, reusing the evaluation of an identical earlier submission
+    logger.info(f"🤖 Calling Azure OpenAI to evaluate submission...")
+    try:
+        async with session_claims.held(db, session["_id"], claim_token):
+            evaluation = await evaluation_cache.evaluate(
+                db,
+                scenario=session["scenario"],
+                user_response=request.user_response,
+                skills=session["skills"]
+            )
+    except Exception:
+        await session_claims.release(db, session["_id"], claim_token)
+        raise
+    
+    response = await store_evaluation_result(
+        session, request.user_id, request.user_response, evaluation, claim_token=claim_token
+    )
+    
+    logger.info(f"✅ Assessment evaluated - Score: {response.score}, Proficiency: {response.proficiency_level}")
+    
+    return 200, response.model_dump()
+
+@api_router.post("/assessments/submit/batch", response_model=BatchSubmitResponse)
+async def submit_assessment_batch(request: BatchSubmitRequest):
+    """
+    Submit many assessment responses in one request, e.g. a whole cohort
+    
+    Sessions are claimed and loaded with two queries, evaluations fan out
+    with at most BATCH_EVAL_CONCURRENCY in flight, and results and session
+    completions are written in bulk. Every item gets its own status; a failed
+    or timed-out evaluation does not hold back the rest of the batch.
+    """
+    try:
+        if not request.items:
+            raise HTTPException(status_code=400, detail="No submissions in batch")
+        if len(request.items) > BATCH_SUBMIT_MAX_ITEMS:
+            raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_SUBMIT_MAX_ITEMS} submissions")
+        
+        logger.info(f"📤 Submitting batch of {len(request.items)} assessments")
         
-        await db.assessment_results.insert_one(result)
+        # All sessions of the batch are claimed under one token
+        claim_token = str(uuid.uuid4())
+        session_ids = list({item.session_id for item in request.items})
+        with stage("mongo.claim_sessions"):
+            sessions = await session_claims.claim_many(db, session_ids, claim_token)
+            unclaimed = [session_id for session_id in session_ids if session_id not in sessions]
+            cursor = db.assessment_sessions.find({"_id": {"$in": unclaimed}}, {"completed": 1, "status": 1, "expires_at": 1})
+            unclaimed = {session["_id"]: session async for session in cursor}
+            missing = [session_id for session_id in session_ids if session_id not in sessions and session_id not in unclaimed]
+            archived = await session_claims.archived(db, missing)
         
-        # Mark session as completed
-        await db.assessment_sessions.update_one(
-            {"_id": request.session_id},
-            {"$set": {"completed": True}}
+        statuses: List[Optional[BatchSubmitItemResult]] = [None] * len(request.items)
+        pending = []
+        seen_sessions = set()
+        for index, item in enumerate(request.items):
+            session = sessions.get(item.session_id)
+            if item.session_id in seen_sessions:
+                statuses[index] = BatchSubmitItemResult(session_id=item.session_id, status="duplicate", error="Session appears earlier in the batch")
+            elif session:
+                pending.append((index, item, session))
+            elif item.session_id in archived:
+                statuses[index] = BatchSubmitItemResult(session_id=item.session_id, status="expired", error="Assessment session expired")
+            elif item.session_id not in unclaimed:
+                statuses[index] = BatchSubmitItemResult(session_id=item.session_id, status="not_found", error="Session not found")
+            elif unclaimed[item.session_id]["completed"]:
+                statuses[index] = BatchSubmitItemResult(session_id=item.session_id, status="already_submitted", error="Assessment already submitted")
+            elif session_claims.is_expired(unclaimed[item.session_id]):
+                statuses[index] = BatchSubmitItemResult(session_id=item.session_id, status="expired", error="Assessment session expired")
+            else:
+                statuses[index] = BatchSubmitItemResult(session_id=item.session_id, status="in_progress", error="Assessment submission already in progress")
+            seen_sessions.add(item.session_id)
+        
+        semaphore = asyncio.Semaphore(BATCH_EVAL_CONCURRENCY)
+        
+        async def evaluate(item, session) -> dict:
+            async with semaphore:
+                return await asyncio.wait_for(
+                    evaluation_cache.evaluate(
+                        db,
+                        scenario=session["scenario"],
+                        user_response=item.user_response,
+                        skills=session["skills"]
+                    ),
+                    timeout=BATCH_ITEM_TIMEOUT_SECONDS
+                )
+        
+        logger.info(f"🤖 Evaluating {len(pending)} submissions, {BATCH_EVAL_CONCURRENCY} at a time...")
+        async with session_claims.held(db, [session["_id"] for _, _, session in pending], claim_token):
+            evaluations = await asyncio.gather(
+                *(evaluate(item, session) for _, item, session in pending), return_exceptions=True
+            )
+        
+        # Improvement is measured against each series' first score, as in the single-item path
+        with stage("analytics.calculate_improvement"):
+            summaries = await progress_service.get_summaries(
+                db, [(item.user_id, session["assessment_id"]) for _, item, session in pending]
+            )
+        
+        evaluated = []
+        for (index, item, session), evaluation in zip(pending, evaluations):
+            if isinstance(evaluation, BaseException):
+                error = "Evaluation timed out" if isinstance(evaluation, asyncio.TimeoutError) else str(evaluation)
+                logger.error(f"❌ Batch evaluation failed for session {item.session_id}: {error}")
+                statuses[index] = BatchSubmitItemResult(session_id=item.session_id, status="failed", error=error)
+                continue
+            
+            series_id = progress_service.series_id(item.user_id, session["assessment_id"])
+            improvement_delta = progress_service.improvement_delta(summaries.get(series_id), evaluation["score"])
+            # A series started within this batch measures later items against this score
+            summaries.setdefault(series_id, {"first_score": evaluation["score"]})
+            evaluated.append((index, session, build_result(session, item.user_id, item.user_response, evaluation, improvement_delta)))
+        
+        failed_writes = set()
+        if evaluated:
+            try:
+                with stage("mongo.bulk_insert_results"):
+                    await db.assessment_results.bulk_write(
+                        [InsertOne(compress_fields(result, RESULT_TEXT_FIELDS)) for _, _, result in evaluated], ordered=False
+                    )
+            except BulkWriteError as e:
+                failed_writes = {error["index"] for error in e.details["writeErrors"]}
+            
+            for position in failed_writes:
+                index, session, _ = evaluated[position]
+                statuses[index] = BatchSubmitItemResult(session_id=session["_id"], status="failed", error="Failed to store result")
+            evaluated = [entry for position, entry in enumerate(evaluated) if position not in failed_writes]
+        
+        # Failed items go back to pending so they can be submitted again
+        stored_sessions = {session["_id"] for _, session, _ in evaluated}
+        await session_claims.release(
+            db, [session["_id"] for _, _, session in pending if session["_id"] not in stored_sessions], claim_token
         )
         
-        logger.info(f"✅ Assessment evaluated - Score: {evaluation['score']}, Proficiency: {proficiency_level}")
+        if evaluated:
+            with stage("mongo.bulk_complete_sessions"):
+                completed_sessions = await session_claims.complete_held(db, stored_sessions, claim_token)
+            
+            # Sessions taken over by another submission keep its result, as in the single-item path
+            lost = [entry for entry in evaluated if entry[1]["_id"] not in completed_sessions]
+            if lost:
+                logger.warning(f"⚠️ Batch lost {len(lost)} session claim(s) before completing")
+                await db.assessment_results.delete_many({"_id": {"$in": [result["_id"] for _, _, result in lost]}})
+                for index, session, _ in lost:
+                    statuses[index] = BatchSubmitItemResult(
+                        session_id=session["_id"], status="failed", error="Session was claimed by another submission"
+                    )
+                evaluated = [entry for entry in evaluated if entry[1]["_id"] in completed_sessions]
+        
+        if evaluated:
+            # Stats updates stay sequential per user and run concurrently across users
+            by_user = {}
+            for _, session, result in evaluated:
+                by_user.setdefault(result["user_id"], []).append((session, result))
+            
+            async def record_user_results(user_id: str, entries: list):
+                for session, result in entries:
+                    await analytics_service.record_result(db, result, session["assessment_title"], session["skills"])
+                    await progress_service.record_score(db, result)
+                    await leaderboard_service.record_score(db, result)
+                dashboard_cache.invalidate(user_id)
+            
+            with stage("analytics.record_result"):
+                await asyncio.gather(*(record_user_results(user_id, entries) for user_id, entries in by_user.items()))
+            
+            await index_similarity([result for _, _, result in evaluated])
+            
+            for index, session, result in evaluated:
+                statuses[index] = BatchSubmitItemResult(
+                    session_id=session["_id"], status="completed", result=result_to_response(result)
+                )
+        
+        completed = len(evaluated)
+        logger.info(f"✅ Batch evaluated - {completed}/{len(request.items)} completed")
         
-        return SubmitAssessmentResponse(
+        return BatchSubmitResponse(completed=completed, failed=len(request.items) - completed, items=statuses)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error submitting assessment batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.post("/assessments/submit/stream")
+async def submit_assessment_stream(request: SubmitAssessmentRequest):
+    """
+    Submit assessment response and stream the AI evaluation as Server-Sent Events
+    
+    Events: `token` for each completion chunk, one event per evaluation field
+    (`score`, `feedback`, `strengths`, `areas_for_improvement`) as soon as it is
+    complete, then `result` with the stored result, or `error`.
+    """
+    try:
+        logger.info(f"📤 Submitting assessment (streaming): {request.session_id}")
+        
+        # Claim the session before the stream starts so errors keep their status codes
+        with stage("mongo.claim_session"):
+            session, claim_token = await session_claims.claim(db, request.session_id)
+        
+    except SessionClaimError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error submitting assessment: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def event_stream():
+        stored = False
+        try:
+            cache_key = evaluation_cache.cache_key(session["scenario"], request.user_response, session["skills"])
+            evaluation = await evaluation_cache.get(db, cache_key)
+            
+            if evaluation:
+                for field in STREAMED_FIELDS:
+                    yield format_sse(field, {field: evaluation[field]})
+            else:
+                logger.info(f"🤖 Streaming Azure OpenAI evaluation...")
+                started = time.perf_counter()
+                parser = EvaluationStreamParser()
+                async with session_claims.held(db, session["_id"], claim_token):
+                    async for chunk in azure_ai_service.stream_evaluation(
+                        scenario=session["scenario"],
+                        user_response=request.user_response,
+                        skills=session["skills"]
+                    ):
+                        yield format_sse("token", {"text": chunk})
+                        for field, value in parser.feed(chunk):
+                            yield format_sse(field, {field: value})
+                
+                with stage("llm.parse"):
+                    evaluation = azure_ai_service.parse_evaluation(parser.text)
+                await evaluation_cache.put(db, cache_key, evaluation, (time.perf_counter() - started) * 1000)
+            
+            response = await store_evaluation_result(
+                session, request.user_id, request.user_response, evaluation, claim_token=claim_token
+            )
+            stored = True
+            
+            logger.info(f"✅ Assessment evaluated - Score: {response.score}, Proficiency: {response.proficiency_level}")
+            yield format_sse("result", response.model_dump())
+            
+        except Exception as e:
+            logger.error(f"❌ Error streaming assessment evaluation: {str(e)}")
+            yield format_sse("error", {"detail": str(e)})
+        finally:
+            # Failed or disconnected streams hand the session back; a disconnect cancels
+            # the generator, so the release is shielded to finish instead of holding the claim
+            if not stored:
+                await asyncio.shield(session_claims.release(db, session["_id"], claim_token))
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/results/{result_id}", response_model=EvaluationStatusResponse)
+async def get_result_status(result_id: str):
+    """Status of a queued evaluation, including the result once it is completed"""
+    try:
+        result = await db.assessment_results.find_one({"_id": result_id})
+        if result:
+            return EvaluationStatusResponse(
+                result_id=result_id,
+                status="completed",
+                result=result_to_response(result)
+            )
+        
+        job = await evaluation_queue.get_job(db, result_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Result not found")
+        
+        return EvaluationStatusResponse(
             result_id=result_id,
-            score=evaluation["score"],
-            ai_feedback=evaluation["feedback"],
-            improvement_delta=improvement_delta,
-            proficiency_level=proficiency_level,
-            strengths=evaluation["strengths"],
-            areas_for_improvement=evaluation["areas_for_improvement"]
+            status=job["status"],
+            attempts=job["attempts"],
+            error=job.get("error")
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"❌ Error submitting assessment: {str(e)}")
+        logger.error(f"❌ Error getting result status: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/progress/{user_id}/{assessment_id}", response_model=ProgressSeriesResponse)
+async def get_progress_series(user_id: str, assessment_id: str, limit: int = 100):
+    """Score series for charting a user's progress on one assessment"""
+    try:
+        series = await progress_service.get_series(db, user_id, assessment_id, limit=min(max(limit, 1), 1000))
+        if not series:
+            raise HTTPException(status_code=404, detail="No progress recorded for this assessment")
+        
+        return ProgressSeriesResponse(**series)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error getting progress series: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/assessments/{assessment_id}/leaderboard", response_model=LeaderboardResponse)
+async def get_leaderboard(assessment_id: str, limit: int = 10, user_id: str = None):
+    """
+    Top scorers of an assessment by best score, with the optional user's percentile rank
+    Served from the precomputed leaderboard entries and score distribution
+    """
+    try:
+        with stage("catalog.get_assessment"):
+            assessment = await assessment_catalog.get_assessment(db, assessment_id)
+        if not assessment:
+            raise HTTPException(status_code=404, detail="Assessment not found")
+        
+        with stage("mongo.leaderboard"):
+            leaderboard = await leaderboard_service.get_leaderboard(
+                db, assessment_id, limit=min(max(limit, 1), 100), user_id=user_id
+            )
+        
+        return LeaderboardResponse(**leaderboard)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error getting leaderboard: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/users/{user_id}/results", response_model=ResultHistoryResponse)
+async def list_user_results(
+    user_id: str,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    assessment_id: Optional[str] = None,
+    fields: Optional[str] = None,
+    format: str = "json"
+):
+    """
+    A user's assessment results, newest first
+    
+    Pages of `limit` results; pass `next_cursor` back as `cursor` for the
+    next page. `fields` is a comma-separated projection; the default skips
+    the response and feedback text. `format=ndjson` streams every result
+    after the cursor as newline-delimited JSON instead.
+    """
+    try:
+        projection = result_history.parse_fields(fields)
+        
+        if format == "ndjson":
+            # Validate the cursor before streaming so a bad one still gets a 400
+            if cursor:
+                result_history.decode_cursor(cursor)
+            return StreamingResponse(
+                result_history.stream_ndjson(db, user_id, cursor=cursor, assessment_id=assessment_id, fields=projection),
+                media_type="application/x-ndjson"
+            )
+        
+        if format != "json":
+            raise HTTPException(status_code=400, detail="format must be json or ndjson")
+        
+        with stage("mongo.result_history"):
+            page = await result_history.get_page(
+                db, user_id, limit=limit, cursor=cursor, assessment_id=assessment_id, fields=projection
+            )
+        
+        return ResultHistoryResponse(**page)
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error listing results: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/admin/exports/results")
+async def export_results(
+    format: str = "csv",
+    fields: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    x_admin_token: Optional[str] = Header(None)
+):
+    """
+    Stream assessment_results as CSV or Parquet for offline analysis
+    
+    `fields` is a comma-separated column list and `since`/`until` an ISO
+    completed_at range (inclusive start, exclusive end). Rows are read and
+    written in batches, so memory stays bounded on any collection size.
+    For resumable exports to files use `python maintenance.py export-results`.
+    """
+    require_admin(x_admin_token)
+    try:
+        result_exporter.check_format(format)
+        columns = result_exporter.parse_fields(fields)
+        since_at = datetime.fromisoformat(since) if since else None
+        until_at = datetime.fromisoformat(until) if until else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    filename = f"assessment_results-{datetime.utcnow():%Y%m%dT%H%M%S}.{format}"
+    logger.info(f"📦 Exporting assessment results as {format}")
+    
+    return StreamingResponse(
+        result_exporter.stream(db, format, columns, since=since_at, until=until_at),
+        media_type="text/csv" if format == "csv" else "application/vnd.apache.parquet",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @api_router.get("/dashboard/overview", response_model=DashboardMetrics)
-async def get_dashboard_overview(user_id: str):
+async def get_dashboard_overview(user_id: str, request: Request):
     """
     Get dashboard metrics with Azure ML-powered analytics
     Includes skill progression, improvement trends, and AI feedback
+    
+    Responses carry an ETag of the user's stats version; a matching
+    If-None-Match gets 304 without recomputing while the entry is cached
     """
     try:
         logger.info(f"📊 Getting dashboard metrics for user: {user_id}")
         
-        metrics = await analytics_service.get_dashboard_metrics(db=db, user_id=user_id)
+        cached = dashboard_cache.get(user_id)
+        if cached:
+            etag, metrics = cached
+        else:
+            token = dashboard_cache.token()
+            with stage("analytics.dashboard_metrics"):
+                metrics = await analytics_service.get_dashboard_metrics(db=db, user_id=user_id)
+            version = metrics.pop("version", None)
+            etag = dashboard_cache.make_etag(version, metrics["percentiles"], metrics["trend"]) if version is not None else None
+            if etag:
+                dashboard_cache.put(user_id, etag, metrics, token)
+        
+        headers = {"Cache-Control": "private, no-cache"}
+        if etag:
+            headers["ETag"] = etag
+        
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
         
         logger.info(f"✅ Dashboard metrics retrieved")
         
-        return DashboardMetrics(**metrics)
+        return JSONResponse(content=DashboardMetrics(**metrics).model_dump(), headers=headers)
         
     except Exception as e:
         logger.error(f"❌ Error getting dashboard metrics: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/dashboard/cache/stats")
+async def get_dashboard_cache_stats():
+    """Dashboard cache size, hit ratio, eviction and invalidation counters"""
+    return dashboard_cache.get_stats()
+
+@api_router.get("/assessments/claims/stats")
+async def get_session_claim_stats():
+    """Session claims taken and duplicate submits rejected by this process"""
+    return {**session_claims.get_stats(), "idempotent_replays": idempotency_store.replays}
+
+@api_router.get("/assessments/sessions/stats")
+async def get_session_lifecycle_stats():
+    """Open, overdue and archived assessment sessions"""
+    try:
+        return await session_lifecycle.get_stats(db)
+    except Exception as e:
+        logger.error(f"❌ Error getting session stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/evaluations/cache/stats")
+async def get_evaluation_cache_stats():
+    """LLM evaluation calls and latency saved by the evaluation cache"""
+    try:
+        return await evaluation_cache.get_stats(db)
+    except Exception as e:
+        logger.error(f"❌ Error getting evaluation cache stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/llm/stats")
+async def get_llm_stats():
+    """LLM client pool utilisation, retry counts and circuit breaker state"""
+    return llm_client.get_stats()
+
+@api_router.get("/workers/stats")
+async def get_worker_stats():
+    """This worker's identity and leadership, and the applied migrations"""
+    try:
+        return {
+            "leader": leader_election.get_stats(),
+            "migrations": await migration_runner.status(db)
+        }
+    except Exception as e:
+        logger.error(f"❌ Error getting worker stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/assessments/pool/stats")
+async def get_scenario_pool_stats():
+    """Scenario warm pool depth per template and hit/miss counters"""
+    try:
+        return await scenario_pool_service.get_stats(db)
+    except Exception as e:
+        logger.error(f"❌ Error getting scenario pool stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.get("/")
 async def root():
     return {
@@ -251,6 +1004,31 @@ async def root():
         }
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.middleware("http")
+async def request_timing_middleware(request: Request, call_next):
+    """Record request latency histograms and attach a Server-Timing breakdown of the stages"""
+    started = time.perf_counter()
+    stages = begin_request_timing()
+    HTTP_REQUESTS_IN_FLIGHT.inc()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["Server-Timing"] = server_timing_header(stages, time.perf_counter() - started)
+        return response
+    finally:
+        HTTP_REQUESTS_IN_FLIGHT.dec()
+        # Label by route template, not raw path, to keep label cardinality bounded
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - started, method=request.method, route=route, status=str(status)
+        )
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -264,5 +1042,8 @@ app.add_middleware(
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await leader_election.stop(db)
+    await evaluation_queue.stop()
+    await llm_client.stop()
     client.close()
     logger.info("🔌 Database connection closed")
\ No newline at end of file
@@ -0,0 +1,182 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Optional, Set, Tuple
+import asyncio
+import os
+import uuid
+import logging
+
+from scenario_store import scenario_store
+
+logger = logging.getLogger(__name__)
+
+
+class SessionClaimError(Exception):
+    """A session could not be claimed or completed; carries the HTTP status to answer with"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class SessionClaims:
+    """
+    Atomic claims on assessment sessions for evaluation
+
+    A session moves pending -> evaluating -> completed. Claiming is a single
+    find_one_and_update, so of two concurrent submits only one pays for an
+    evaluation; the other is rejected with one read. A claim holds a random
+    token; completion only succeeds for the current holder, and claims stuck
+    in evaluating longer than SESSION_CLAIM_TIMEOUT_SECONDS can be taken over.
+    Holders renew claimed_at while they evaluate (see `held`), so only claims
+    of crashed holders go stale.
+    """
+
+    def __init__(self):
+        # Above the LLM client's worst case (4 attempts x 120s plus backoff) as a backstop to renewal
+        self.timeout = float(os.getenv("SESSION_CLAIM_TIMEOUT_SECONDS", "900"))
+        self.claims = 0
+        self.conflicts = 0
+
+    @staticmethod
+    def is_expired(session: dict) -> bool:
+        """Whether the session was swept or is past its submission deadline"""
+        expires_at = session.get("expires_at")
+        return session.get("status") == "expired" or (expires_at is not None and expires_at <= datetime.utcnow())
+
+    def _claimable(self, token: str) -> dict:
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=self.timeout)
+        return {
+            "completed": False,
+            # Sessions created before expiry existed have no expires_at
+            "expires_at": {"$not": {"$lte": now}},
+            "$or": [
+                # Sessions created before claims existed have no status
+                {"status": {"$in": [None, "pending"]}},
+                {"status": "evaluating", "claimed_at": {"$lt": stale}},
+                # The same holder, e.g. a queue job retrying, may claim again
+                {"claim_token": token}
+            ]
+        }
+
+    def _claim_update(self, token: str) -> dict:
+        return {"$set": {"status": "evaluating", "claim_token": token, "claimed_at": datetime.utcnow()}}
+
+    async def claim(self, db: AsyncIOMotorDatabase, session_id: str, token: str = None) -> Tuple[dict, str]:
+        """
+        Claim a session for evaluation
+
+        Returns:
+            The claimed session, with its scenario text, and the claim token
+
+        Raises:
+            SessionClaimError: 404 if the session does not exist, 400 if it was
+                already submitted, 410 if it expired, 409 if another submission holds it
+        """
+        token = token or str(uuid.uuid4())
+        session = await db.assessment_sessions.find_one_and_update(
+            {"_id": session_id, **self._claimable(token)},
+            self._claim_update(token),
+            return_document=ReturnDocument.AFTER
+        )
+        if session:
+            self.claims += 1
+            await scenario_store.hydrate(db, [session])
+            return session, token
+
+        self.conflicts += 1
+        existing = await db.assessment_sessions.find_one({"_id": session_id}, {"completed": 1, "status": 1, "expires_at": 1})
+        if not existing:
+            if await self.archived(db, [session_id]):
+                raise SessionClaimError(410, "Assessment session expired")
+            raise SessionClaimError(404, "Session not found")
+        if existing["completed"]:
+            raise SessionClaimError(400, "Assessment already submitted")
+        if self.is_expired(existing):
+            raise SessionClaimError(410, "Assessment session expired")
+        raise SessionClaimError(409, "Assessment submission already in progress")
+
+    async def archived(self, db: AsyncIOMotorDatabase, session_ids: list) -> Set[str]:
+        """Ids of the sessions that expired and were swept into the archive; they answer 410, not 404"""
+        if not session_ids:
+            return set()
+        cursor = db.assessment_sessions_archive.find({"_id": {"$in": list(session_ids)}}, {"_id": 1})
+        return {session["_id"] async for session in cursor}
+
+    async def claim_many(self, db: AsyncIOMotorDatabase, session_ids: list, token: str) -> dict:
+        """Claim every claimable session of the list under one token; returns the claimed sessions by id"""
+        await db.assessment_sessions.update_many(
+            {"_id": {"$in": session_ids}, **self._claimable(token)},
+            self._claim_update(token)
+        )
+        cursor = db.assessment_sessions.find({"_id": {"$in": session_ids}, "claim_token": token, "completed": False})
+        claimed = {session["_id"]: session async for session in cursor}
+        await scenario_store.hydrate(db, claimed.values())
+        self.claims += len(claimed)
+        return claimed
+
+    async def release(self, db: AsyncIOMotorDatabase, session_ids, token: str):
+        """Give up a claim after a failed evaluation so the session can be submitted again"""
+        session_ids = [session_ids] if isinstance(session_ids, str) else list(session_ids)
+        if not session_ids:
+            return
+        await db.assessment_sessions.update_many(
+            {"_id": {"$in": session_ids}, "claim_token": token, "completed": False},
+            {"$set": {"status": "pending"}, "$unset": {"claim_token": "", "claimed_at": ""}}
+        )
+
+    async def renew(self, db: AsyncIOMotorDatabase, session_ids: list, token: str):
+        """Push back claimed_at of the sessions the token still holds"""
+        await db.assessment_sessions.update_many(
+            {"_id": {"$in": session_ids}, "claim_token": token, "completed": False},
+            {"$set": {"claimed_at": datetime.utcnow()}}
+        )
+
+    async def _renew_loop(self, db: AsyncIOMotorDatabase, session_ids: list, token: str):
+        while True:
+            await asyncio.sleep(self.timeout / 3)
+            try:
+                await self.renew(db, session_ids, token)
+            except Exception as e:
+                logger.error(f"❌ Error renewing session claims: {str(e)}")
+
+    @asynccontextmanager
+    async def held(self, db: AsyncIOMotorDatabase, session_ids, token: str):
+        """Renew the claims while the block runs, so a slow evaluation is not taken over"""
+        session_ids = [session_ids] if isinstance(session_ids, str) else list(session_ids)
+        task = asyncio.create_task(self._renew_loop(db, session_ids, token))
+        try:
+            yield
+        finally:
+            task.cancel()
+
+    async def complete(self, db: AsyncIOMotorDatabase, session_ids, token: Optional[str]) -> int:
+        """Mark claimed sessions completed; returns how many the token still held"""
+        session_ids = [session_ids] if isinstance(session_ids, str) else list(session_ids)
+        query = {"_id": {"$in": session_ids}, "completed": False}
+        if token:
+            query["claim_token"] = token
+        result = await db.assessment_sessions.update_many(
+            query,
+            {"$set": {"completed": True, "status": "completed", "completed_at": datetime.utcnow()}}
+        )
+        return result.modified_count
+
+    async def complete_held(self, db: AsyncIOMotorDatabase, session_ids, token: str) -> Set[str]:
+        """Mark claimed sessions completed; returns the ids completed under the token"""
+        session_ids = list(session_ids)
+        await self.complete(db, session_ids, token)
+        cursor = db.assessment_sessions.find(
+            {"_id": {"$in": session_ids}, "claim_token": token, "completed": True}, {"_id": 1}
+        )
+        return {session["_id"] async for session in cursor}
+
+    def get_stats(self) -> dict:
+        return {"claims": self.claims, "conflicts": self.conflicts, "timeout_seconds": self.timeout}
+
+# Create singleton instance
+session_claims = SessionClaims()
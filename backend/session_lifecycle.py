@@ -0,0 +1,162 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import BulkWriteError
+from datetime import datetime, timedelta
+from typing import Optional
+import asyncio
+import os
+import logging
+
+from catalog_service import assessment_catalog
+from dashboard_cache import dashboard_cache
+from session_claims import session_claims
+
+logger = logging.getLogger(__name__)
+
+# Minutes past the assessment duration a session can still be submitted
+SESSION_EXPIRY_GRACE_MINUTES = int(os.getenv("SESSION_EXPIRY_GRACE_MINUTES", "30"))
+
+
+class SessionLifecycle:
+    """
+    Expiry and archival of assessment sessions
+
+    Sessions get `expires_at` = start + template duration + a grace period.
+    A background sweeper moves abandoned sessions past their expiry to
+    `assessment_sessions_archive` (or deletes them with
+    SESSION_ARCHIVE_EXPIRED=false) and takes them off the users' active
+    counts. Completed sessions are kept, so resubmitting one is still
+    rejected with 400 rather than 404.
+    """
+
+    def __init__(self):
+        self.sweep_interval = float(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "300"))
+        self.batch_size = int(os.getenv("SESSION_SWEEP_BATCH_SIZE", "500"))
+        self.archive = os.getenv("SESSION_ARCHIVE_EXPIRED", "true").lower() == "true"
+        self._task: Optional[asyncio.Task] = None
+        self.swept = 0
+
+    @staticmethod
+    def expires_at(created_at: datetime, duration_minutes: int) -> datetime:
+        return created_at + timedelta(minutes=duration_minutes + SESSION_EXPIRY_GRACE_MINUTES)
+
+    async def sweep_expired(self, db: AsyncIOMotorDatabase) -> int:
+        """
+        Archive or delete one batch of abandoned sessions past their expiry
+
+        Sessions are first flipped to `expired` with a conditional update, so
+        a submit claiming the session at the same moment either wins the claim
+        or sees the expiry; never both.
+
+        Returns:
+            Number of sessions swept
+        """
+        now = datetime.utcnow()
+        # Unclaimed sessions, and claims abandoned by a crashed evaluation
+        abandoned = {"completed": False, "expires_at": {"$lte": now}, "$or": [
+            {"status": {"$in": [None, "pending"]}},
+            {"status": "evaluating", "claimed_at": {"$lt": now - timedelta(seconds=session_claims.timeout)}}
+        ]}
+        candidates = await db.assessment_sessions.find(abandoned, {"_id": 1}).limit(self.batch_size).to_list(self.batch_size)
+        if not candidates:
+            return 0
+
+        candidate_ids = [c["_id"] for c in candidates]
+        await db.assessment_sessions.update_many(
+            {"_id": {"$in": candidate_ids}, **abandoned},
+            {"$set": {"status": "expired", "expired_at": now}}
+        )
+        expired = await db.assessment_sessions.find(
+            {"_id": {"$in": candidate_ids}, "status": "expired"}
+        ).to_list(len(candidate_ids))
+        if not expired:
+            return 0
+
+        if self.archive:
+            try:
+                await db.assessment_sessions_archive.insert_many(
+                    [{**session, "archived_at": now} for session in expired], ordered=False
+                )
+            except BulkWriteError as e:
+                # Sessions archived by an earlier, interrupted sweep are already there
+                if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                    raise
+
+        await db.assessment_sessions.delete_many({"_id": {"$in": [s["_id"] for s in expired]}, "status": "expired"})
+
+        per_user = {}
+        for session in expired:
+            per_user[session["user_id"]] = per_user.get(session["user_id"], 0) + 1
+        for user_id, count in per_user.items():
+            await db.user_stats.update_one(
+                {"_id": user_id},
+                {"$inc": {"active_assessments": -count, "version": 1}, "$set": {"updated_at": now}}
+            )
+            dashboard_cache.invalidate(user_id)
+
+        self.swept += len(expired)
+        logger.info(f"🧹 {'Archived' if self.archive else 'Removed'} {len(expired)} expired session(s)")
+        return len(expired)
+
+    async def sweep_all(self, db: AsyncIOMotorDatabase) -> int:
+        """Sweep batches until no expired sessions are left"""
+        total = 0
+        while True:
+            swept = await self.sweep_expired(db)
+            total += swept
+            if swept < self.batch_size:
+                return total
+
+    async def backfill_expiry(self, db: AsyncIOMotorDatabase) -> int:
+        """Set expires_at on open sessions created before sessions carried an expiry"""
+        updated = 0
+        for assessment in await assessment_catalog.list_assessments(db):
+            lifetime_ms = (assessment["duration"] + SESSION_EXPIRY_GRACE_MINUTES) * 60 * 1000
+            result = await db.assessment_sessions.update_many(
+                {"assessment_id": assessment["_id"], "completed": False, "expires_at": {"$exists": False}},
+                [{"$set": {"expires_at": {"$add": ["$created_at", lifetime_ms]}}}]
+            )
+            updated += result.modified_count
+        return updated
+
+    async def _sweep_loop(self, db: AsyncIOMotorDatabase):
+        while True:
+            try:
+                await self.sweep_all(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error sweeping expired sessions: {str(e)}")
+
+            await asyncio.sleep(self.sweep_interval)
+
+    def start(self, db: AsyncIOMotorDatabase):
+        """Start the background sweeper"""
+        if self.sweep_interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._sweep_loop(db))
+        logger.info(f"🧹 Session sweeper started (every {self.sweep_interval:.0f}s)")
+
+    async def stop(self):
+        """Cancel the background sweeper"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def get_stats(self, db: AsyncIOMotorDatabase) -> dict:
+        """Open, overdue and archived session counts plus sessions swept by this process"""
+        now = datetime.utcnow()
+        return {
+            "open": await db.assessment_sessions.count_documents({"completed": False}),
+            "overdue": await db.assessment_sessions.count_documents({"completed": False, "expires_at": {"$lte": now}}),
+            "archived": await db.assessment_sessions_archive.estimated_document_count(),
+            "swept": self.swept,
+            "archive_expired": self.archive
+        }
+
+# Create singleton instance
+session_lifecycle = SessionLifecycle()
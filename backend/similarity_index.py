@@ -0,0 +1,232 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from bson import Binary
+from typing import List, Optional
+import hashlib
+import os
+import re
+import zlib
+import logging
+
+import numpy as np
+
+from text_compression import decompress_text
+
+logger = logging.getLogger(__name__)
+
+# MinHash permutations, split into LSH bands of SIMILARITY_NUM_PERM / SIMILARITY_BANDS rows;
+# 128 / 16 puts the 50% candidate probability near 0.7 Jaccard similarity
+SIMILARITY_NUM_PERM = int(os.getenv("SIMILARITY_NUM_PERM", "128"))
+SIMILARITY_BANDS = int(os.getenv("SIMILARITY_BANDS", "16"))
+# Estimated Jaccard similarity of word shingles at which two responses are flagged
+SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.8"))
+SIMILARITY_SHINGLE_SIZE = int(os.getenv("SIMILARITY_SHINGLE_SIZE", "5"))
+# Shorter responses overlap by chance and are not indexed
+SIMILARITY_MIN_SHINGLES = int(os.getenv("SIMILARITY_MIN_SHINGLES", "10"))
+# Candidates verified per result, bounding the cost of crowded buckets (e.g. boilerplate answers)
+SIMILARITY_MAX_CANDIDATES = int(os.getenv("SIMILARITY_MAX_CANDIDATES", "100"))
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+DUPLICATE_KEY_ERROR = 11000
+
+
+def _permutation(seed: str) -> int:
+    # Derived from SHA-256 rather than a RNG so signatures stay comparable across NumPy versions
+    return int.from_bytes(hashlib.sha256(seed.encode()).digest()[:8], "big") % ((1 << 61) - 1)
+
+
+class SimilarityIndex:
+    """
+    MinHash/LSH index of submitted responses per assessment
+
+    Each response gets a MinHash signature over its word shingles, stored
+    on the result as `minhash`. The signature is cut into bands; a result
+    is stored in `lsh_buckets` under one key per band, so earlier results
+    sharing any band are found with one indexed query instead of a scan of
+    the assessment's results. Candidates from other users are verified on
+    their full signatures, and those at SIMILARITY_THRESHOLD or above are
+    recorded in `similar_results` on both results, which get
+    `similarity_flagged`.
+    """
+
+    def __init__(self):
+        if SIMILARITY_NUM_PERM % SIMILARITY_BANDS:
+            raise ValueError("SIMILARITY_NUM_PERM must be a multiple of SIMILARITY_BANDS")
+        self.rows_per_band = SIMILARITY_NUM_PERM // SIMILARITY_BANDS
+        self._a = np.array([_permutation(f"minhash-a-{i}") | 1 for i in range(SIMILARITY_NUM_PERM)], dtype=np.uint64)
+        self._b = np.array([_permutation(f"minhash-b-{i}") for i in range(SIMILARITY_NUM_PERM)], dtype=np.uint64)
+
+    @staticmethod
+    def shingles(text: str) -> set:
+        words = re.findall(r"\w+", text.lower())
+        return {" ".join(words[i:i + SIMILARITY_SHINGLE_SIZE]) for i in range(len(words) - SIMILARITY_SHINGLE_SIZE + 1)}
+
+    def signature(self, text: Optional[str]) -> Optional[np.ndarray]:
+        """MinHash signature (uint32 per permutation), or None if the text is too short to compare"""
+        shingles = self.shingles(text or "")
+        if len(shingles) < SIMILARITY_MIN_SHINGLES:
+            return None
+
+        hashes = np.array([zlib.crc32(s.encode("utf-8")) for s in shingles], dtype=np.uint64)
+        # Universal hashing of every shingle under every permutation at once; uint64 products wrap,
+        # which keeps the family well mixed after the modulus and mask
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def signature_binary(self, text: Optional[str]) -> Optional[Binary]:
+        """Signature as stored on the result"""
+        signature = self.signature(text)
+        return Binary(signature.tobytes()) if signature is not None else None
+
+    @staticmethod
+    def from_binary(value) -> np.ndarray:
+        return np.frombuffer(bytes(value), dtype=np.uint32)
+
+    def band_keys(self, signature: np.ndarray) -> List[str]:
+        """One bucket key per band: the band index and a hash of its rows"""
+        rows = signature.reshape(SIMILARITY_BANDS, self.rows_per_band)
+        return [f"{band}:{hashlib.blake2b(rows[band].tobytes(), digest_size=8).hexdigest()}" for band in range(SIMILARITY_BANDS)]
+
+    async def index_results(self, db: AsyncIOMotorDatabase, results: List[dict], recompute: bool = False) -> int:
+        """
+        Match stored results against earlier ones and add them to the index
+
+        Results are processed in order, so later results in the list are also
+        matched against earlier ones in it. Returns the number flagged.
+        """
+        entries = []
+        for result in results:
+            if recompute or not result.get("minhash"):
+                signature = self.signature(decompress_text(result.get("user_response")))
+            else:
+                signature = self.from_binary(result["minhash"])
+            if signature is not None:
+                entries.append((result, signature, self.band_keys(signature)))
+        if not entries:
+            return 0
+
+        # Earlier results sharing a bucket with any of these, in one query
+        buckets = {}
+        cursor = db.lsh_buckets.find(
+            {
+                "assessment_id": {"$in": list({result["assessment_id"] for result, _, _ in entries})},
+                "key": {"$in": list({key for _, _, keys in entries for key in keys})}
+            },
+            {"_id": 0, "assessment_id": 1, "key": 1, "result_id": 1, "user_id": 1}
+        )
+        async for bucket in cursor:
+            buckets.setdefault((bucket["assessment_id"], bucket["key"]), []).append((bucket["result_id"], bucket["user_id"]))
+
+        candidates = []
+        for result, _, keys in entries:
+            found = {}
+            for key in keys:
+                for result_id, user_id in buckets.get((result["assessment_id"], key), []):
+                    if user_id != result["user_id"] and result_id != result["_id"]:
+                        found[result_id] = user_id
+            candidates.append(dict(list(found.items())[:SIMILARITY_MAX_CANDIDATES]))
+
+        signatures = {}
+        candidate_ids = list({result_id for found in candidates for result_id in found})
+        if candidate_ids:
+            async for doc in db.assessment_results.find({"_id": {"$in": candidate_ids}}, {"minhash": 1}):
+                if doc.get("minhash"):
+                    signatures[doc["_id"]] = self.from_binary(doc["minhash"])
+
+        updates = []
+        bucket_docs = []
+        flagged = 0
+        # Entries of this call were not in the index yet when it was queried
+        local = {}
+        for (result, signature, keys), found in zip(entries, candidates):
+            for key in keys:
+                for result_id, user_id in local.get((result["assessment_id"], key), []):
+                    if user_id != result["user_id"]:
+                        found[result_id] = user_id
+
+            matches = []
+            for result_id, user_id in found.items():
+                if result_id not in signatures:
+                    continue
+                similarity = float(np.mean(signatures[result_id] == signature))
+                if similarity >= SIMILARITY_THRESHOLD:
+                    matches.append({"result_id": result_id, "user_id": user_id, "similarity": round(similarity, 3)})
+
+            update = {}
+            if recompute or not result.get("minhash"):
+                update["$set"] = {"minhash": Binary(signature.tobytes())}
+            if matches:
+                flagged += 1
+                update.setdefault("$set", {})["similarity_flagged"] = True
+                update["$addToSet"] = {"similar_results": {"$each": matches}}
+                logger.warning(f"⚠️ Result {result['_id']} matches {len(matches)} earlier submission(s) by other users")
+            if update:
+                updates.append(UpdateOne({"_id": result["_id"]}, update))
+            for match in matches:
+                updates.append(UpdateOne({"_id": match["result_id"]}, {
+                    "$set": {"similarity_flagged": True},
+                    "$addToSet": {"similar_results": {
+                        "result_id": result["_id"], "user_id": result["user_id"], "similarity": match["similarity"]
+                    }}
+                }))
+
+            signatures[result["_id"]] = signature
+            for key in keys:
+                local.setdefault((result["assessment_id"], key), []).append((result["_id"], result["user_id"]))
+            bucket_docs.extend(
+                InsertOne({"assessment_id": result["assessment_id"], "key": key, "result_id": result["_id"], "user_id": result["user_id"]})
+                for key in keys
+            )
+
+        if updates:
+            await db.assessment_results.bulk_write(updates, ordered=False)
+        try:
+            await db.lsh_buckets.bulk_write(bucket_docs, ordered=False)
+        except BulkWriteError as e:
+            # Results indexed before (a retried call) keep their existing entries
+            if any(error["code"] != DUPLICATE_KEY_ERROR for error in e.details["writeErrors"]):
+                raise
+
+        return flagged
+
+    async def rebuild(self, db: AsyncIOMotorDatabase, batch_size: int = 1000) -> dict:
+        """
+        Recreate signatures, buckets and flags for every result, oldest first
+
+        Results are read in keyset batches on (completed_at, _id) and each
+        batch is matched with one bucket query, so the rebuild runs in
+        bounded memory over any collection size.
+        """
+        await db.lsh_buckets.delete_many({})
+        await db.assessment_results.update_many(
+            {"similarity_flagged": {"$exists": True}},
+            {"$unset": {"similarity_flagged": "", "similar_results": ""}}
+        )
+
+        indexed = flagged = 0
+        after = None
+        while True:
+            query = {}
+            if after:
+                query["$or"] = [
+                    {"completed_at": {"$gt": after[0]}},
+                    {"completed_at": after[0], "_id": {"$gt": after[1]}}
+                ]
+            batch = await db.assessment_results.find(
+                query,
+                {"user_id": 1, "assessment_id": 1, "user_response": 1, "completed_at": 1}
+            ).sort([("completed_at", 1), ("_id", 1)]).limit(batch_size).to_list(batch_size)
+            if not batch:
+                break
+
+            flagged += await self.index_results(db, batch, recompute=True)
+            indexed += len(batch)
+            after = (batch[-1]["completed_at"], batch[-1]["_id"])
+            logger.info(f"🔎 Indexed {indexed} result(s), {flagged} flagged")
+
+        return {"indexed": indexed, "flagged": flagged}
+
+# Create singleton instance
+similarity_index = SimilarityIndex()
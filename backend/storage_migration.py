@@ -0,0 +1,137 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from typing import Optional
+import logging
+
+from scenario_store import scenario_store
+from text_compression import compress_text, RESULT_TEXT_FIELDS, TEXT_COMPRESSION_THRESHOLD_BYTES
+
+logger = logging.getLogger(__name__)
+
+# Collections whose documents embedded the scenario text before the scenario store
+SCENARIO_COLLECTIONS = ("assessment_sessions", "assessment_sessions_archive", "assessment_results")
+# Fields analytics queries read from a result; everything else is cold text
+RESULT_ANALYTICS_FIELDS = ("user_id", "assessment_id", "score", "improvement_delta", "proficiency_level", "skills", "completed_at")
+
+
+class StorageMigration:
+    """Converts documents to scenario references and compressed text, and reports storage use"""
+
+    @staticmethod
+    def _large_text(field: str) -> dict:
+        """Filter for a plain string field at or above the compression threshold"""
+        # $strLenBytes fails on non-strings, so the length is only taken of strings
+        return {field: {"$type": "string"}, "$expr": {"$cond": [
+            {"$eq": [{"$type": f"${field}"}, "string"]},
+            {"$gte": [{"$strLenBytes": f"${field}"}, TEXT_COMPRESSION_THRESHOLD_BYTES]},
+            False
+        ]}}
+
+    async def _migrate_collection(self, db: AsyncIOMotorDatabase, collection: str, batch_size: int) -> int:
+        text_fields = RESULT_TEXT_FIELDS if collection == "assessment_results" else ()
+        # Documents still embedding a scenario, or holding a large plain-text field
+        legacy = {"$or": [{"scenario": {"$exists": True}}] + [self._large_text(field) for field in text_fields]}
+
+        migrated = 0
+        last_id = None
+        while True:
+            query = dict(legacy)
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            batch = await db[collection].find(query).sort("_id", 1).limit(batch_size).to_list(batch_size)
+            if not batch:
+                return migrated
+
+            operations = []
+            for doc in batch:
+                update = {"$set": {}, "$unset": {}}
+                if isinstance(doc.get("scenario"), str):
+                    update["$set"]["scenario_id"] = await scenario_store.put(db, doc["scenario"])
+                    update["$unset"]["scenario"] = ""
+                for field in text_fields:
+                    packed = compress_text(doc.get(field))
+                    if packed is not doc.get(field):
+                        update["$set"][field] = packed
+                update = {op: fields for op, fields in update.items() if fields}
+                if update:
+                    operations.append(UpdateOne({"_id": doc["_id"]}, update))
+
+            if operations:
+                await db[collection].bulk_write(operations, ordered=False)
+            migrated += len(operations)
+            last_id = batch[-1]["_id"]
+            logger.info(f"🗜️ {collection}: migrated {migrated} document(s)")
+
+    async def migrate(self, db: AsyncIOMotorDatabase, batch_size: int = 500) -> dict:
+        """
+        Move embedded scenarios into the scenario store and compress large result text
+
+        Idempotent and resumable: only documents still in the old layout are
+        touched. Small plain strings are left as they are.
+
+        Returns:
+            Documents migrated per collection
+        """
+        return {
+            collection: await self._migrate_collection(db, collection, batch_size)
+            for collection in SCENARIO_COLLECTIONS
+        }
+
+    async def _collection_stats(self, db: AsyncIOMotorDatabase, collection: str) -> Optional[dict]:
+        try:
+            stats = await db.command("collStats", collection)
+        except Exception:
+            return None
+        return {
+            "documents": stats.get("count", 0),
+            "data_bytes": stats.get("size", 0),
+            "storage_bytes": stats.get("storageSize", 0),
+            "index_bytes": stats.get("totalIndexSize", 0),
+            "avg_document_bytes": stats.get("avgObjSize", 0)
+        }
+
+    async def report(self, db: AsyncIOMotorDatabase) -> dict:
+        """
+        Storage per collection, plus how much of the result documents analytics actually reads
+
+        `analytics_share` is the fraction of result bytes in the fields analytics
+        queries read; the rest is cold text that only occupies cache.
+        """
+        collections = {
+            collection: await self._collection_stats(db, collection)
+            for collection in SCENARIO_COLLECTIONS + ("scenarios",)
+        }
+
+        sizes = await db.assessment_results.aggregate([
+            {"$group": {
+                "_id": None,
+                "document_bytes": {"$sum": {"$bsonSize": "$$ROOT"}},
+                "analytics_bytes": {"$sum": {"$bsonSize": {
+                    field: {"$ifNull": [f"${field}", None]} for field in RESULT_ANALYTICS_FIELDS
+                }}},
+                "legacy_documents": {"$sum": {"$cond": [{"$ifNull": ["$scenario", False]}, 1, 0]}}
+            }}
+        ]).to_list(1)
+        sizes = sizes[0] if sizes else {"document_bytes": 0, "analytics_bytes": 0, "legacy_documents": 0}
+
+        scenarios = await db.scenarios.aggregate([
+            {"$group": {"_id": None, "count": {"$sum": 1}, "text_bytes": {"$sum": "$size"}}}
+        ]).to_list(1)
+        scenarios = scenarios[0] if scenarios else {"count": 0, "text_bytes": 0}
+
+        return {
+            "collections": collections,
+            "results": {
+                "document_bytes": sizes["document_bytes"],
+                "analytics_bytes": sizes["analytics_bytes"],
+                "analytics_share": round(sizes["analytics_bytes"] / sizes["document_bytes"], 3) if sizes["document_bytes"] else 0.0,
+                "legacy_documents": sizes["legacy_documents"]
+            },
+            "scenarios": {
+                "unique": scenarios["count"],
+                "text_bytes": scenarios["text_bytes"]
+            }
+        }
+
+# Create singleton instance
+storage_migration = StorageMigration()
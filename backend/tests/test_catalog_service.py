@@ -0,0 +1,48 @@
+import asyncio
+from types import SimpleNamespace
+
+import catalog_service
+from catalog_service import AssessmentCatalog
+
+
+class FakeAssessments:
+    def __init__(self, assessments):
+        self.assessments = assessments
+        self.loads = 0
+
+    def find(self, query):
+        collection = self
+
+        class Cursor:
+            def sort(self, key, direction):
+                return self
+
+            async def to_list(self, length):
+                collection.loads += 1
+                return list(collection.assessments)
+
+        return Cursor()
+
+
+def test_first_access_loads_on_a_freshly_booted_host(monkeypatch):
+    # monotonic() counts from boot, so it is below the TTL right after a host starts
+    monkeypatch.setattr(catalog_service.time, "monotonic", lambda: 5.0)
+    db = SimpleNamespace(assessments=FakeAssessments([{"_id": "a1", "title": "Leadership"}]))
+    catalog = AssessmentCatalog()
+
+    assert asyncio.run(catalog.list_assessments(db)) == [{"_id": "a1", "title": "Leadership"}]
+    assert asyncio.run(catalog.get_assessment(db, "a1"))["title"] == "Leadership"
+    assert db.assessments.loads == 1
+
+
+def test_invalidate_forces_a_reload_within_the_ttl(monkeypatch):
+    monkeypatch.setattr(catalog_service.time, "monotonic", lambda: 5.0)
+    db = SimpleNamespace(assessments=FakeAssessments([]))
+    catalog = AssessmentCatalog()
+
+    asyncio.run(catalog.list_assessments(db))
+    db.assessments.assessments = [{"_id": "a2"}]
+    catalog.invalidate()
+
+    assert asyncio.run(catalog.list_assessments(db)) == [{"_id": "a2"}]
+    assert db.assessments.loads == 2
@@ -0,0 +1,60 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+from coordination import LeaseLock, SharedSemaphore
+
+
+class FakeCollection:
+    """Records update_one calls; the first `fail_updates` raise"""
+
+    def __init__(self, fail_updates: int = 0):
+        self.updates = []
+        self.fail_updates = fail_updates
+
+    async def update_one(self, filter, update, upsert=False):
+        if self.fail_updates:
+            self.fail_updates -= 1
+            raise ConnectionError("primary stepped down")
+        self.updates.append((filter, update))
+
+    async def delete_one(self, filter):
+        pass
+
+    async def find_one_and_update(self, filter, update, projection=None):
+        return {"_id": "llm:0"}
+
+
+def test_slot_lease_is_renewed_while_the_holder_runs():
+    slots = FakeCollection()
+    semaphore = SharedSemaphore(SimpleNamespace(concurrency_slots=slots), "llm", 1, lease_seconds=0.06)
+
+    async def scenario():
+        async with semaphore.slot():
+            await asyncio.sleep(0.1)
+
+    asyncio.run(scenario())
+
+    renewals = [update for _, update in slots.updates if "expires_at" in update["$set"]]
+    assert len(renewals) >= 2
+    assert renewals[-1]["$set"]["expires_at"] > datetime.utcnow()
+    # The slot is freed last, and only under the holder's token
+    filter, update = slots.updates[-1]
+    assert update == {"$set": {"holder": None}} and filter["_id"] == "llm:0" and "holder" in filter
+
+
+def test_lock_renewal_survives_a_failed_acquire():
+    # The initial acquire succeeds, then the first renewal fails
+    locks = FakeCollection()
+    lock = LeaseLock("startup", lease_seconds=0.06)
+    db = SimpleNamespace(locks=locks)
+
+    async def scenario():
+        async with lock.hold(db):
+            locks.fail_updates = 1
+            await asyncio.sleep(0.1)
+
+    asyncio.run(scenario())
+
+    # One acquire before the block, a renewal after the failed one
+    assert len(locks.updates) >= 2
@@ -0,0 +1,33 @@
+from dashboard_cache import DashboardCache
+
+
+def test_put_is_dropped_after_a_concurrent_invalidate():
+    cache = DashboardCache()
+    token = cache.token()
+    cache.invalidate("u1")
+    cache.put("u1", '"dashboard-1"', {"stale": True}, token)
+
+    assert cache.get("u1") is None
+    assert cache.stale_puts == 1
+
+
+def test_put_of_other_users_is_kept():
+    cache = DashboardCache()
+    token = cache.token()
+    cache.invalidate("u2")
+    cache.put("u1", '"dashboard-1"', {}, token)
+
+    assert cache.get("u1") == ('"dashboard-1"', {})
+
+
+def test_tokens_older_than_pruned_invalidations_are_stale():
+    cache = DashboardCache()
+    cache.max_entries = 2
+    token = cache.token()
+    for user_id in ("u1", "u2", "u3"):
+        cache.invalidate(user_id)
+    cache.put("u1", '"dashboard-1"', {}, token)
+
+    assert cache.get("u1") is None
+    cache.put("u1", '"dashboard-2"', {}, cache.token())
+    assert cache.get("u1") == ('"dashboard-2"', {})
@@ -0,0 +1,85 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+from evaluation_queue import EvaluationQueue
+
+
+class FakeJobs:
+    """Just enough of evaluation_jobs to run one claimed job through a worker"""
+
+    def __init__(self, jobs, fail_updates: int = 0):
+        self.jobs = list(jobs)
+        self.updates = []
+        self.fail_updates = fail_updates
+
+    async def find_one_and_update(self, *args, **kwargs):
+        return self.jobs.pop(0) if self.jobs else None
+
+    async def update_one(self, filter, update):
+        if self.fail_updates:
+            self.fail_updates -= 1
+            raise ConnectionError("primary stepped down")
+        self.updates.append((filter, update))
+
+
+def job(job_id: str) -> dict:
+    return {"_id": job_id, "attempts": 1, "max_attempts": 3, "payload": {}}
+
+
+def make_queue() -> EvaluationQueue:
+    queue = EvaluationQueue()
+    queue.workers = 1
+    queue.visibility_timeout = 0.3
+    queue.poll_interval = 0.01
+    return queue
+
+
+def test_heartbeat_extends_visibility_while_the_handler_runs():
+    queue = make_queue()
+    jobs = FakeJobs([job("slow")])
+    db = SimpleNamespace(evaluation_jobs=jobs)
+
+    async def handler(job):
+        await asyncio.sleep(0.35)
+
+    asyncio.run(queue._process(db, jobs.jobs.pop(0), handler))
+
+    extensions = [update for filter, update in jobs.updates if "visible_at" in update["$set"]]
+    assert len(extensions) >= 2
+    assert all(update["$set"]["visible_at"] > datetime.utcnow() for update in extensions)
+    # The last write marks the job completed; nothing extends it afterwards
+    assert jobs.updates[-1][1]["$set"]["status"] == "completed"
+
+
+def test_heartbeat_only_touches_the_claim_it_holds():
+    queue = make_queue()
+    jobs = FakeJobs([])
+    db = SimpleNamespace(evaluation_jobs=jobs)
+
+    async def handler(job):
+        await asyncio.sleep(0.15)
+
+    asyncio.run(queue._process(db, job("slow"), handler))
+
+    filter, _ = jobs.updates[0]
+    assert filter == {"_id": "slow", "status": "running", "attempts": 1}
+
+
+def test_worker_survives_a_failed_status_write():
+    queue = make_queue()
+    # Both the completion and the retry write of the first job fail; the worker must still run the second
+    jobs = FakeJobs([job("first"), job("second")], fail_updates=2)
+    db = SimpleNamespace(evaluation_jobs=jobs)
+    handled = []
+
+    async def handler(job):
+        handled.append(job["_id"])
+
+    async def scenario():
+        await queue.start(db, handler)
+        await asyncio.sleep(0.1)
+        await queue.stop()
+
+    asyncio.run(scenario())
+    assert handled == ["first", "second"]
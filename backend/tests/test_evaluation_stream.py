@@ -0,0 +1,38 @@
+import json
+
+from evaluation_stream import EvaluationStreamParser, format_sse
+
+
+def feed_all(parser: EvaluationStreamParser, chunks: list) -> list:
+    return [emitted for chunk in chunks for emitted in parser.feed(chunk)]
+
+
+def test_fields_are_emitted_as_soon_as_they_complete():
+    parser = EvaluationStreamParser()
+    assert parser.feed('{"score": 8') == []
+    assert parser.feed('5, "feedback": "Clear') == [("score", 85)]
+    assert parser.feed(' answer", "strengths": ["a"') == [("feedback", "Clear answer")]
+    assert parser.feed(', "b"], "areas_for_improvement": []}') == [
+        ("strengths", ["a", "b"]), ("areas_for_improvement", [])
+    ]
+
+
+def test_number_at_the_end_of_the_object_completes_on_the_brace():
+    parser = EvaluationStreamParser(fields=["score"])
+    assert parser.feed('{"score": 70') == []
+    assert parser.feed("}") == [("score", 70)]
+
+
+def test_every_field_is_emitted_once_whatever_the_chunking():
+    completion = json.dumps({"score": 91, "feedback": "ok", "strengths": ["x"], "areas_for_improvement": ["y"]})
+    parser = EvaluationStreamParser()
+
+    emitted = feed_all(parser, list(completion))
+
+    assert dict(emitted) == json.loads(completion)
+    assert len(emitted) == 4
+    assert parser.text == completion
+
+
+def test_format_sse():
+    assert format_sse("score", {"score": 85}) == 'event: score\ndata: {"score": 85}\n\n'
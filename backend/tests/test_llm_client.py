@@ -0,0 +1,152 @@
+import asyncio
+
+import pytest
+
+from llm_client import CircuitBreaker, CircuitOpenError, LLMClient
+
+
+class Upstream(Exception):
+    status_code = 503
+
+
+def open_breaker(breaker: CircuitBreaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    # Pretend the reset timeout has passed
+    breaker.opened_at -= breaker.reset_timeout
+
+
+def make_client() -> LLMClient:
+    client = LLMClient()
+    client.max_retries = 0
+    client.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    client.timeouts = {"evaluation": 0.2}
+    client.stream_chunk_timeout = 0.2
+    return client
+
+
+def test_breaker_opens_after_threshold_and_fails_fast():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_half_open_admits_a_single_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    open_breaker(breaker)
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+
+
+def test_probe_outcome_closes_or_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    open_breaker(breaker)
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+    open_breaker(breaker)
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.times_opened == 3
+
+
+def test_released_probe_lets_the_next_call_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    open_breaker(breaker)
+    breaker.allow()
+    breaker.release_probe()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+def test_cancelled_call_releases_the_probe():
+    client = make_client()
+    open_breaker(client.breaker)
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    async def scenario():
+        task = asyncio.create_task(client.call("evaluation", hang))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert client.breaker.state == "half_open"
+    assert client.breaker.allow()
+
+
+def test_closed_stream_releases_the_probe():
+    client = make_client()
+    open_breaker(client.breaker)
+
+    async def chunks():
+        for chunk in ("a", "b", "c"):
+            yield chunk
+
+    async def scenario():
+        stream = client.stream("evaluation", chunks)
+        assert await stream.__anext__() == "a"
+        await stream.aclose()
+
+    asyncio.run(scenario())
+    assert client.breaker.allow()
+    assert client.in_flight == 0
+
+
+def test_stream_times_out_waiting_for_the_first_chunk():
+    client = make_client()
+
+    async def silent():
+        await asyncio.sleep(10)
+        yield "never"
+
+    async def scenario():
+        return [chunk async for chunk in client.stream("evaluation", silent)]
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(scenario())
+    assert client.timeouts_hit == 1
+
+
+def test_stream_times_out_between_chunks():
+    client = make_client()
+
+    async def stalls():
+        yield "first"
+        await asyncio.sleep(10)
+        yield "never"
+
+    received = []
+
+    async def scenario():
+        async for chunk in client.stream("evaluation", stalls):
+            received.append(chunk)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(scenario())
+    assert received == ["first"]
+
+
+def test_open_breaker_rejects_without_calling_upstream():
+    client = make_client()
+    for _ in range(2):
+        client.breaker.record_failure()
+    calls = []
+
+    async def request():
+        calls.append(1)
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(client.call("evaluation", request))
+    assert calls == []
+    assert client.rejected == 1
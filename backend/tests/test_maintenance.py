@@ -0,0 +1,38 @@
+import pytest
+
+import maintenance
+
+
+COMMANDS = [
+    (["migrate"], maintenance.migrate),
+    (["migrate", "--status"], maintenance.migrate),
+    (["rebuild-user-stats", "--user-id", "u1"], maintenance.rebuild_user_stats),
+    (["rebuild-progress"], maintenance.rebuild_progress),
+    (["rebuild-leaderboards"], maintenance.rebuild_leaderboards),
+    (["sweep-sessions", "--backfill-expiry"], maintenance.sweep_sessions),
+    (["migrate-storage", "--batch-size", "10"], maintenance.migrate_storage),
+    (["storage-report", "--output", "report.json"], maintenance.storage_report),
+    (["export-results", "out", "--format", "csv", "--since", "2024-01-01"], maintenance.export_results),
+    (["import-results", "results.jsonl", "--dry-run"], maintenance.import_results),
+    (["compute-trends"], maintenance.compute_trends),
+    (["benchmark-trends", "--results", "1000"], maintenance.benchmark_trends),
+    (["benchmark-trends", "--compute-only", "--database", "scratch"], maintenance.benchmark_trends),
+    (["rebuild-similarity", "--batch-size", "50"], maintenance.rebuild_similarity),
+]
+
+
+@pytest.mark.parametrize("argv,handler", COMMANDS)
+def test_every_command_parses_to_its_handler(argv, handler):
+    args = maintenance.build_parser().parse_args(argv)
+    assert args.handler is handler
+
+
+def test_every_subcommand_is_covered():
+    parser = maintenance.build_parser()
+    subparsers = next(a for a in parser._actions if a.dest == "command")
+    assert set(subparsers.choices) == {argv[0] for argv, _ in COMMANDS}
+
+
+def test_command_is_required():
+    with pytest.raises(SystemExit):
+        maintenance.build_parser().parse_args([])
@@ -0,0 +1,76 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import progress_service as progress_module
+from progress_service import EMA_ALPHA, ProgressService
+
+
+def results(user_id: str, assessment_id: str, scores: list) -> list:
+    start = datetime(2024, 1, 1)
+    return [
+        {"_id": f"{user_id}-{assessment_id}-{i}", "user_id": user_id, "assessment_id": assessment_id,
+         "score": score, "completed_at": start + timedelta(days=i)}
+        for i, score in enumerate(scores)
+    ]
+
+
+class FakeCollection:
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.inserts = 0
+
+    async def delete_many(self, query):
+        self.docs = []
+
+    async def insert_many(self, docs, ordered=True):
+        self.inserts += 1
+        self.docs.extend(docs)
+
+    def find(self, query, projection=None):
+        docs = self.docs
+
+        class Cursor:
+            def sort(self, keys):
+                return self
+
+            async def __aiter__(self):
+                for doc in sorted(docs, key=lambda d: (d["user_id"], d["assessment_id"], d["completed_at"])):
+                    yield doc
+
+        return Cursor()
+
+
+def test_series_documents_match_incremental_summary():
+    _, summary = ProgressService.series_documents("u:a", results("u", "a", [50, 60, 80]))
+
+    ema = 50
+    for score in (60, 80):
+        ema = EMA_ALPHA * score + (1 - EMA_ALPHA) * ema
+    assert summary["count"] == 3
+    assert (summary["first_score"], summary["latest_score"]) == (50, 80)
+    assert summary["ema"] == ema
+    assert (summary["sum_x"], summary["sum_xx"], summary["sum_y"], summary["sum_xy"]) == (3, 5, 190, 220)
+    assert ProgressService.trend_slope(summary) == 15.0
+
+
+def test_series_documents_split_events_into_buckets(monkeypatch):
+    monkeypatch.setattr(progress_module, "BUCKET_SIZE", 2)
+    buckets, _ = ProgressService.series_documents("u:a", results("u", "a", [1, 2, 3]))
+
+    assert [bucket["count"] for bucket in buckets] == [2, 1]
+    assert buckets[1]["start_at"] == buckets[1]["end_at"] == datetime(2024, 1, 3)
+
+
+def test_rebuild_series_writes_every_series_in_bulk():
+    db = SimpleNamespace(
+        assessment_results=FakeCollection(results("u1", "a", [40, 60]) + results("u1", "b", [70]) + results("u2", "a", [90])),
+        progress_buckets=FakeCollection(),
+        progress_series=FakeCollection()
+    )
+
+    count = asyncio.run(ProgressService().rebuild_series(db, ["u1", "u2"]))
+
+    assert count == 4
+    assert {summary["_id"]: summary["count"] for summary in db.progress_series.docs} == {"u1:a": 2, "u1:b": 1, "u2:a": 1}
+    assert db.progress_series.inserts == db.progress_buckets.inserts == 1
@@ -0,0 +1,39 @@
+from datetime import datetime
+
+import pytest
+
+from result_history import DEFAULT_FIELDS, ResultHistory
+
+
+def test_cursor_round_trips_the_last_row():
+    row = {"completed_at": datetime(2024, 5, 1, 12, 30, 15, 123000), "_id": "r-1"}
+
+    cursor = ResultHistory.encode_cursor(row)
+
+    assert "=" not in cursor
+    assert ResultHistory.decode_cursor(cursor) == (row["completed_at"], "r-1")
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", "bm90IGpzb24", "WzFd"])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        ResultHistory.decode_cursor(cursor)
+
+
+def test_next_page_starts_strictly_after_the_cursor():
+    row = {"completed_at": datetime(2024, 5, 1), "_id": "r-1"}
+
+    query = ResultHistory()._query("u1", "a1", ResultHistory.encode_cursor(row))
+
+    assert query["user_id"] == "u1" and query["assessment_id"] == "a1"
+    assert query["$or"] == [
+        {"completed_at": {"$lt": row["completed_at"]}},
+        {"completed_at": row["completed_at"], "_id": {"$lt": "r-1"}}
+    ]
+
+
+def test_parse_fields():
+    assert ResultHistory.parse_fields(None) == DEFAULT_FIELDS
+    assert ResultHistory.parse_fields("score, skills,") == ("score", "skills")
+    with pytest.raises(ValueError):
+        ResultHistory.parse_fields("score,password")
@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+
+from result_import import ResultImporter
+
+
+class FakeResults:
+    """assessment_results answering the first-score aggregation with fixed groups"""
+
+    def __init__(self, groups):
+        self.groups = groups
+
+    def aggregate(self, pipeline):
+        async def cursor():
+            for group in self.groups:
+                yield group
+        return cursor()
+
+
+def keys(rows: list) -> dict:
+    return {
+        "user_id": [row[0] for row in rows],
+        "assessment_id": [row[1] for row in rows],
+        "score": [row[2] for row in rows],
+        "completed_at": [datetime.fromisoformat(row[3]) for row in rows]
+    }
+
+
+def test_proficiency_levels_match_the_thresholds():
+    levels = ResultImporter.proficiency_levels(np.array([100, 85, 84.9, 70, 10]))
+    assert list(levels) == ["Advanced", "Advanced", "Intermediate", "Intermediate", "Beginner"]
+
+
+def test_improvement_deltas_are_rounded_and_zero_for_a_zero_base():
+    deltas = ResultImporter.improvement_deltas(np.array([75.0, 50.0, 30.0]), np.array([60.0, 0.0, 45.0]))
+    assert list(deltas) == [25.0, 0.0, -33.3]
+
+
+def test_imported_rows_measure_against_the_earliest_score_of_their_series():
+    db = SimpleNamespace(assessment_results=FakeResults([]))
+    rows = keys([
+        ("u1", "a", 80, "2024-03-01"),
+        ("u1", "a", 40, "2024-01-01"),
+        ("u1", "b", 90, "2024-02-01"),
+        ("u2", "a", 60, "2024-01-01"),
+    ])
+
+    derived = asyncio.run(ResultImporter().compute_derived(db, rows))
+
+    assert list(derived["improvement_delta"]) == [100.0, 0.0, 0.0, 0.0]
+    assert list(derived["proficiency_level"]) == ["Intermediate", "Beginner", "Advanced", "Beginner"]
+    assert derived["rebased"] == []
+
+
+def test_stored_series_keep_or_lose_their_first_score_by_date():
+    db = SimpleNamespace(assessment_results=FakeResults([
+        {"_id": {"user_id": "u1", "assessment_id": "a"}, "score": 50, "completed_at": datetime(2023, 1, 1)},
+        {"_id": {"user_id": "u2", "assessment_id": "a"}, "score": 50, "completed_at": datetime(2025, 1, 1)},
+    ]))
+    rows = keys([("u1", "a", 75, "2024-01-01"), ("u2", "a", 40, "2024-01-01")])
+
+    derived = asyncio.run(ResultImporter().compute_derived(db, rows))
+
+    # u1's stored result is earlier and stays the base; u2's import predates it and rebases the series
+    assert list(derived["improvement_delta"]) == [50.0, 0.0]
+    assert derived["rebased"] == [("u2", "a", 40.0)]
@@ -0,0 +1,88 @@
+import asyncio
+from types import SimpleNamespace
+
+from session_claims import SessionClaims
+
+
+class FakeSessions:
+    """Just enough of assessment_sessions to match claim filters by id, token and completion"""
+
+    def __init__(self, sessions):
+        self.sessions = {session["_id"]: session for session in sessions}
+        self.renewals = 0
+
+    def _matches(self, session, filter):
+        return (
+            session["_id"] in filter["_id"]["$in"]
+            and session.get("claim_token") == filter.get("claim_token", session.get("claim_token"))
+            and session["completed"] == filter["completed"]
+        )
+
+    async def update_many(self, filter, update):
+        matched = [session for session in self.sessions.values() if self._matches(session, filter)]
+        if "claimed_at" in update["$set"]:
+            self.renewals += 1
+        for session in matched:
+            session.update(update["$set"])
+        return SimpleNamespace(modified_count=len(matched))
+
+    def find(self, filter, projection=None):
+        async def cursor():
+            for session in list(self.sessions.values()):
+                if self._matches(session, filter):
+                    yield session
+        return cursor()
+
+
+def test_complete_held_returns_only_sessions_the_token_still_held():
+    sessions = FakeSessions([
+        {"_id": "kept", "claim_token": "batch", "completed": False},
+        {"_id": "taken", "claim_token": "other", "completed": False},
+    ])
+    db = SimpleNamespace(assessment_sessions=sessions)
+
+    completed = asyncio.run(SessionClaims().complete_held(db, {"kept", "taken"}, "batch"))
+
+    assert completed == {"kept"}
+    assert sessions.sessions["taken"]["completed"] is False
+
+
+def test_held_renews_claims_until_the_block_exits():
+    claims = SessionClaims()
+    claims.timeout = 0.03
+    sessions = FakeSessions([{"_id": "slow", "claim_token": "t", "completed": False}])
+    db = SimpleNamespace(assessment_sessions=sessions)
+
+    async def scenario():
+        async with claims.held(db, "slow", "t"):
+            await asyncio.sleep(0.05)
+        renewals = sessions.renewals
+        await asyncio.sleep(0.05)
+        return renewals
+
+    renewals = asyncio.run(scenario())
+    assert renewals >= 2
+    assert sessions.renewals == renewals
+    assert "claimed_at" in sessions.sessions["slow"]
+
+
+class FakeArchive:
+    def __init__(self, ids):
+        self.ids = set(ids)
+
+    def find(self, filter, projection=None):
+        async def cursor():
+            for session_id in filter["_id"]["$in"]:
+                if session_id in self.ids:
+                    yield {"_id": session_id}
+        return cursor()
+
+    async def find_one(self, filter, projection=None):
+        return {"_id": filter["_id"]} if filter["_id"] in self.ids else None
+
+
+def test_archived_sessions_are_told_apart_from_unknown_ones():
+    db = SimpleNamespace(assessment_sessions_archive=FakeArchive(["swept"]))
+
+    assert asyncio.run(SessionClaims().archived(db, ["swept", "unknown"])) == {"swept"}
+    assert asyncio.run(SessionClaims().archived(db, [])) == set()
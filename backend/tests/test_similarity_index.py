@@ -0,0 +1,50 @@
+import numpy as np
+
+from similarity_index import SIMILARITY_BANDS, SIMILARITY_NUM_PERM, SimilarityIndex
+
+RESPONSE = (
+    "I would start by meeting the team to understand the root cause of the missed deadline, "
+    "then agree on a recovery plan with clear owners, communicate the new dates to the client "
+    "and review our estimation process in the next retrospective so it does not happen again"
+)
+
+
+def test_signature_is_deterministic_and_case_insensitive():
+    index = SimilarityIndex()
+    signature = index.signature(RESPONSE)
+
+    assert signature.shape == (SIMILARITY_NUM_PERM,)
+    assert signature.dtype == np.uint32
+    assert np.array_equal(signature, SimilarityIndex().signature(RESPONSE.upper()))
+
+
+def test_short_responses_are_not_indexed():
+    assert SimilarityIndex().signature("Too short to compare") is None
+    assert SimilarityIndex().signature(None) is None
+
+
+def test_near_copy_shares_a_band_and_scores_above_unrelated_text():
+    index = SimilarityIndex()
+    original = index.signature(RESPONSE)
+    copy = index.signature(RESPONSE.replace("client", "customer"))
+    unrelated = index.signature(
+        "Our quarterly numbers look strong, so I would invest the surplus in training, hire two "
+        "more engineers for the platform team and expand the support rota to cover weekends"
+    )
+
+    assert set(index.band_keys(original)) & set(index.band_keys(copy))
+    assert not set(index.band_keys(original)) & set(index.band_keys(unrelated))
+    assert np.mean(original == copy) > np.mean(original == unrelated)
+
+
+def test_band_keys_cover_every_band():
+    index = SimilarityIndex()
+    keys = index.band_keys(index.signature(RESPONSE))
+
+    assert len(keys) == SIMILARITY_BANDS
+    assert [key.split(":")[0] for key in keys] == [str(band) for band in range(SIMILARITY_BANDS)]
+
+
+def test_stored_signature_round_trips():
+    signature = SimilarityIndex().signature(RESPONSE)
+    assert np.array_equal(SimilarityIndex.from_binary(signature.tobytes()), signature)
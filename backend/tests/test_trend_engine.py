@@ -0,0 +1,153 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+
+from progress_service import EMA_ALPHA
+from trend_engine import TrendEngine, grouped_trends
+
+
+def test_grouped_trends_match_a_per_group_fit():
+    codes = np.array([0, 0, 0, 1, 1, 2])
+    scores = np.array([50.0, 60.0, 80.0, 90.0, 70.0, 40.0])
+
+    trends = grouped_trends(codes, scores, 3)
+
+    for group in range(3):
+        ys = scores[codes == group]
+        slope = np.polyfit(np.arange(len(ys)), ys, 1)[0] if len(ys) > 1 else 0.0
+        ema = ys[0]
+        for y in ys[1:]:
+            ema = EMA_ALPHA * y + (1 - EMA_ALPHA) * ema
+        assert trends["count"][group] == len(ys)
+        assert (trends["first"][group], trends["latest"][group]) == (ys[0], ys[-1])
+        assert np.isclose(trends["slope"][group], slope)
+        assert np.isclose(trends["ema"][group], ema)
+
+
+def test_grouped_trends_project_and_measure_along_the_fitted_line():
+    trends = grouped_trends(np.array([0, 0, 0, 1]), np.array([50.0, 60.0, 80.0, 99.0]), 2)
+
+    # Fitted line 48.33 + 15x: next attempt 93.33, improvement (78.33 - 48.33) / 48.33
+    assert np.isclose(trends["projected_next"][0], 48.3333 + 15 * 3, atol=1e-3)
+    assert np.isclose(trends["improvement"][0], 30 / 48.3333 * 100, atol=1e-2)
+    # A single score has no slope, projects itself and shows no improvement
+    assert (trends["slope"][1], trends["projected_next"][1], trends["improvement"][1]) == (0.0, 99.0, 0.0)
+
+
+def test_projection_is_clipped_to_the_score_range():
+    trends = grouped_trends(np.zeros(3, dtype=np.int64), np.array([80.0, 90.0, 100.0]), 1)
+    assert trends["projected_next"][0] == 100
+
+
+def test_compute_benchmark_reports_what_it_measured():
+    run = TrendEngine().benchmark_compute(results=2000, users=100, assessments=3)
+
+    assert run["measured"] == "compute"
+    assert run["results"] == 2000
+    assert run["users"] <= 100
+
+
+class FakeCollection:
+    """The assessment_results, user_trends and job_runs calls a trend refresh makes"""
+
+    def __init__(self):
+        self.docs = []
+
+    async def drop(self):
+        self.docs = []
+
+    async def insert_many(self, docs, ordered=True):
+        self.docs.extend(docs)
+
+    async def create_index(self, keys):
+        pass
+
+    def find(self, query, projection=None):
+        docs = sorted(self.docs, key=lambda d: (d["user_id"], d["assessment_id"], d["completed_at"]))
+
+        class Cursor:
+            def sort(self, keys):
+                return self
+
+            def batch_size(self, size):
+                return self
+
+            async def __aiter__(self):
+                for doc in docs:
+                    yield doc
+
+        return Cursor()
+
+    async def bulk_write(self, operations, ordered=True):
+        self.docs.extend(operations)
+
+    async def delete_many(self, query):
+        pass
+
+    async def replace_one(self, filter, doc, upsert=False):
+        self.docs = [doc]
+
+
+def test_refresh_benchmark_seeds_and_times_each_phase():
+    db = SimpleNamespace(assessment_results=FakeCollection(), user_trends=FakeCollection(), job_runs=FakeCollection())
+
+    run = asyncio.run(TrendEngine().benchmark(db, results=500, users=20, assessments=2))
+
+    assert run["measured"] == "refresh"
+    assert run["results"] == len(db.assessment_results.docs) == 500
+    assert run["users"] == len(db.user_trends.docs) <= 20
+    assert {"load_seconds", "compute_seconds", "write_seconds", "seed_seconds"} <= set(run)
+
+
+class FakeJobRuns:
+    def __init__(self, run=None):
+        self.run = run
+
+    async def find_one(self, filter, projection=None):
+        return self.run
+
+
+def run_loop(engine: TrendEngine, db, seconds: float) -> list:
+    refreshed = []
+
+    async def refresh(db):
+        refreshed.append(datetime.utcnow())
+        db.job_runs.run = {"at": datetime.utcnow()}
+
+    engine.refresh = refresh
+
+    async def scenario():
+        engine.start(db)
+        await asyncio.sleep(seconds)
+        await engine.stop()
+
+    asyncio.run(scenario())
+    return refreshed
+
+
+def test_overdue_refresh_runs_at_startup():
+    engine = TrendEngine()
+    engine.refresh_interval = 3600
+    db = SimpleNamespace(job_runs=FakeJobRuns({"at": datetime.utcnow() - timedelta(hours=2)}))
+
+    assert len(run_loop(engine, db, 0.05)) == 1
+
+
+def test_first_refresh_runs_at_startup():
+    engine = TrendEngine()
+    engine.refresh_interval = 3600
+    db = SimpleNamespace(job_runs=FakeJobRuns())
+
+    assert len(run_loop(engine, db, 0.05)) == 1
+
+
+def test_recent_refresh_waits_for_the_remaining_interval():
+    engine = TrendEngine()
+    engine.refresh_interval = 0.2
+    db = SimpleNamespace(job_runs=FakeJobRuns({"at": datetime.utcnow() - timedelta(seconds=0.1)}))
+
+    refreshed = run_loop(engine, db, 0.15)
+    # Due 0.1s after start, not a full interval later
+    assert len(refreshed) == 1
@@ -0,0 +1,75 @@
+from bson import Binary
+from typing import Any, Iterable
+import os
+import zlib
+import logging
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Text fields at least this large (UTF-8 bytes) are stored compressed
+TEXT_COMPRESSION_THRESHOLD_BYTES = int(os.getenv("TEXT_COMPRESSION_THRESHOLD_BYTES", "1024"))
+# zstd when the optional zstandard package is installed, zlib otherwise
+TEXT_COMPRESSION_CODEC = os.getenv("TEXT_COMPRESSION_CODEC", "zstd" if zstandard else "zlib")
+
+# Free-text fields of assessment_results that analytics never reads
+RESULT_TEXT_FIELDS = ("user_response", "ai_feedback")
+
+
+def compress_text(text: Any) -> Any:
+    """
+    Compressed envelope of a large string: {"codec", "data", "size"}
+
+    Small strings, non-strings and text that does not shrink are returned as is,
+    so stored fields are either plain strings or envelopes.
+    """
+    if not isinstance(text, str):
+        return text
+
+    raw = text.encode("utf-8")
+    if len(raw) < TEXT_COMPRESSION_THRESHOLD_BYTES:
+        return text
+
+    if TEXT_COMPRESSION_CODEC == "zstd" and zstandard is not None:
+        codec, data = "zstd", zstandard.ZstdCompressor(level=3).compress(raw)
+    else:
+        codec, data = "zlib", zlib.compress(raw, 6)
+
+    if len(data) >= len(raw):
+        return text
+    return {"codec": codec, "data": Binary(data), "size": len(raw)}
+
+
+def decompress_text(value: Any) -> Any:
+    """Inverse of compress_text; plain strings pass through"""
+    if not isinstance(value, dict) or "codec" not in value:
+        return value
+
+    data = bytes(value["data"])
+    if value["codec"] == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd-compressed text found but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    return zlib.decompress(data).decode("utf-8")
+
+
+def compress_fields(doc: dict, fields: Iterable[str]) -> dict:
+    """Copy of the document with the given text fields compressed"""
+    packed = dict(doc)
+    for field in fields:
+        if field in packed:
+            packed[field] = compress_text(packed[field])
+    return packed
+
+
+def decompress_fields(doc: dict, fields: Iterable[str]) -> dict:
+    """Copy of the document with the given text fields decompressed"""
+    unpacked = dict(doc)
+    for field in fields:
+        if field in unpacked:
+            unpacked[field] = decompress_text(unpacked[field])
+    return unpacked
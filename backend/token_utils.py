@@ -0,0 +1,46 @@
+from functools import lru_cache
+import logging
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+TOKEN_ENCODING = "o200k_base"
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    """Tokenizer for the deployed model family; None if the BPE ranks cannot be loaded"""
+    try:
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception as e:
+        logger.warning(f"⚠️ Tokenizer unavailable, estimating tokens from characters: {str(e)}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Number of model tokens in text (roughly four characters per token without the tokenizer)"""
+    if not text:
+        return 0
+
+    encoding = _encoding()
+    if encoding is None:
+        return max(len(text) // 4, 1)
+
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, from_end: bool = False) -> str:
+    """First (or last) max_tokens tokens of text"""
+    if max_tokens <= 0:
+        return ""
+
+    encoding = _encoding()
+    if encoding is None:
+        chars = max_tokens * 4
+        return text[-chars:] if from_end else text[:chars]
+
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[-max_tokens:] if from_end else tokens[:max_tokens])
@@ -0,0 +1,318 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, ReplaceOne
+from datetime import datetime
+from typing import Optional
+import asyncio
+import os
+import time
+import logging
+
+import numpy as np
+
+from progress_service import EMA_ALPHA
+
+logger = logging.getLogger(__name__)
+
+# user_trends documents written per bulk_write
+TREND_WRITE_BATCH_SIZE = 1000
+# Results fetched per round trip while loading the score series
+TREND_READ_BATCH_SIZE = 10000
+# job_runs document holding the last refresh
+TREND_JOB_ID = "trends"
+
+
+def grouped_trends(codes: np.ndarray, scores: np.ndarray, groups: int) -> dict:
+    """
+    Least-squares slope, EMA and projected next score of every group
+
+    Args:
+        codes: group index of each score, with rows sorted by (group, completed_at)
+        scores: scores in the same order
+        groups: number of groups
+
+    Returns:
+        Arrays indexed by group: count, first, latest, slope, ema, projected_next, improvement
+    """
+    count = np.bincount(codes, minlength=groups).astype(np.float64)
+    starts = np.concatenate(([0], np.cumsum(count)[:-1])).astype(np.int64)
+    # x is the attempt index within the group, so the slope is the change per attempt
+    x = np.arange(len(scores), dtype=np.float64) - starts[codes]
+
+    sum_x = np.bincount(codes, weights=x, minlength=groups)
+    sum_y = np.bincount(codes, weights=scores, minlength=groups)
+    sum_xx = np.bincount(codes, weights=x * x, minlength=groups)
+    sum_xy = np.bincount(codes, weights=x * scores, minlength=groups)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        denominator = count * sum_xx - sum_x ** 2
+        slope = np.where(denominator > 0, (count * sum_xy - sum_x * sum_y) / denominator, 0.0)
+        intercept = (sum_y - slope * sum_x) / count
+
+        # EMA seeded with the first score, as progress_service keeps it:
+        # ema = (1-a)^(n-1) * y0 + sum over i >= 1 of a * (1-a)^(n-1-i) * yi
+        age = count[codes] - 1 - x
+        weights = np.where(x == 0, 1.0, EMA_ALPHA) * (1 - EMA_ALPHA) ** age
+        ema = np.bincount(codes, weights=weights * scores, minlength=groups)
+
+        # Improvement along the fitted line rather than between two noisy endpoints
+        fitted_first = intercept
+        fitted_latest = intercept + slope * (count - 1)
+        improvement = np.where(
+            (count >= 2) & (fitted_first > 0),
+            (fitted_latest - fitted_first) / fitted_first * 100,
+            0.0
+        )
+
+    last = starts + count.astype(np.int64) - 1
+    return {
+        "count": count.astype(np.int64),
+        "first": scores[starts],
+        "latest": scores[last],
+        "slope": slope,
+        "ema": ema,
+        "projected_next": np.clip(intercept + slope * count, 0, 100),
+        "improvement": improvement
+    }
+
+
+class TrendEngine:
+    """
+    Batch computation of score trends into `user_trends`
+
+    All results are read in one pass sorted by (user, assessment,
+    completed_at) and grouped into NumPy arrays; slope, EMA and projected
+    next score are computed for every user and every (user, assessment)
+    series at once. The dashboard reads the stored document instead of
+    deriving an improvement from first and latest score on each request.
+    The job runs every TREND_REFRESH_INTERVAL_SECONDS (nightly by default),
+    counted from the last run recorded in `job_runs`, so a restart runs an
+    overdue refresh right away instead of waiting a full interval.
+    """
+
+    def __init__(self):
+        self.refresh_interval = float(os.getenv("TREND_REFRESH_INTERVAL_SECONDS", str(24 * 3600)))
+        self._task: Optional[asyncio.Task] = None
+        self.last_run: Optional[dict] = None
+
+    async def load_series(self, db: AsyncIOMotorDatabase) -> dict:
+        """Columns of every result, sorted by user, assessment and completed_at"""
+        users, assessments, scores, times = [], [], [], []
+        cursor = db.assessment_results.find(
+            {},
+            {"_id": 0, "user_id": 1, "assessment_id": 1, "score": 1, "completed_at": 1}
+        ).sort([
+            ("user_id", ASCENDING), ("assessment_id", ASCENDING), ("completed_at", ASCENDING)
+        ]).batch_size(TREND_READ_BATCH_SIZE)
+        async for result in cursor:
+            users.append(result["user_id"])
+            assessments.append(result["assessment_id"])
+            scores.append(result["score"])
+            times.append(result["completed_at"])
+
+        return {
+            "user_id": np.asarray(users, dtype=object),
+            "assessment_id": np.asarray(assessments, dtype=object),
+            "score": np.asarray(scores, dtype=np.float64),
+            "completed_at": np.asarray(times, dtype="datetime64[ms]")
+        }
+
+    @staticmethod
+    def _summary(trends: dict, group: int) -> dict:
+        return {
+            "count": int(trends["count"][group]),
+            "first_score": float(trends["first"][group]),
+            "latest_score": float(trends["latest"][group]),
+            "slope": round(float(trends["slope"][group]), 3),
+            "ema": round(float(trends["ema"][group]), 1),
+            "projected_next": round(float(trends["projected_next"][group]), 1),
+            "improvement": round(float(trends["improvement"][group]), 1)
+        }
+
+    def compute(self, series: dict) -> list:
+        """user_trends documents from series columns sorted by (user, assessment, completed_at)"""
+        if not len(series["score"]):
+            return []
+
+        computed_at = datetime.utcnow()
+        scores = series["score"]
+
+        # Rows are sorted by (user, assessment), so group boundaries are where either key changes
+        user_ids, user_codes = np.unique(series["user_id"], return_inverse=True)
+        pair_change = np.r_[True, (series["user_id"][1:] != series["user_id"][:-1])
+                            | (series["assessment_id"][1:] != series["assessment_id"][:-1])]
+        pair_codes = np.cumsum(pair_change) - 1
+        pair_starts = np.flatnonzero(pair_change)
+
+        pairs = grouped_trends(pair_codes, scores, len(pair_starts))
+        # The overall series of a user interleaves assessments, so it is re-sorted by (user, completed_at)
+        order = np.lexsort((series["completed_at"], user_codes))
+        overall = grouped_trends(user_codes[order], scores[order], len(user_ids))
+
+        docs = {
+            user_id: {"_id": user_id, "overall": self._summary(overall, group), "assessments": {}, "computed_at": computed_at}
+            for group, user_id in enumerate(user_ids)
+        }
+        for group, start in enumerate(pair_starts):
+            docs[series["user_id"][start]]["assessments"][series["assessment_id"][start]] = self._summary(pairs, group)
+
+        return list(docs.values())
+
+    async def refresh(self, db: AsyncIOMotorDatabase) -> dict:
+        """Recompute every user's trends and replace the user_trends collection contents"""
+        started = time.perf_counter()
+        run_at = datetime.utcnow()
+
+        series = await self.load_series(db)
+        loaded = time.perf_counter()
+        docs = await asyncio.to_thread(self.compute, series)
+        computed = time.perf_counter()
+
+        for start in range(0, len(docs), TREND_WRITE_BATCH_SIZE):
+            await db.user_trends.bulk_write(
+                [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs[start:start + TREND_WRITE_BATCH_SIZE]],
+                ordered=False
+            )
+        # Users whose results are all gone
+        await db.user_trends.delete_many({"computed_at": {"$lt": run_at}})
+
+        self.last_run = {
+            "at": run_at,
+            "results": int(len(series["score"])),
+            "users": len(docs),
+            "load_seconds": round(loaded - started, 2),
+            "compute_seconds": round(computed - loaded, 2),
+            "write_seconds": round(time.perf_counter() - computed, 2)
+        }
+        logger.info(f"📈 Trends computed for {len(docs)} user(s) from {self.last_run['results']} result(s) "
+                    f"(load {self.last_run['load_seconds']}s, compute {self.last_run['compute_seconds']}s, "
+                    f"write {self.last_run['write_seconds']}s)")
+        await db.job_runs.replace_one({"_id": TREND_JOB_ID}, {"_id": TREND_JOB_ID, **self.last_run}, upsert=True)
+        return self.last_run
+
+    async def seconds_until_due(self, db: AsyncIOMotorDatabase) -> float:
+        """Seconds until the next refresh is due, 0 if none was recorded or it is overdue"""
+        run = await db.job_runs.find_one({"_id": TREND_JOB_ID}, {"at": 1})
+        if not run:
+            return 0.0
+        elapsed = (datetime.utcnow() - run["at"]).total_seconds()
+        return max(0.0, self.refresh_interval - elapsed)
+
+    async def get_trend(self, db: AsyncIOMotorDatabase, user_id: str) -> Optional[dict]:
+        """The user's overall trend from the last batch run, or None"""
+        trend = await db.user_trends.find_one({"_id": user_id}, {"overall": 1, "computed_at": 1})
+        if not trend:
+            return None
+        return {**trend["overall"], "computed_at": trend["computed_at"].isoformat()}
+
+    @staticmethod
+    def synthetic_series(results: int, users: int, assessments: int, seed: int = 0) -> dict:
+        """Random series columns sorted like load_series returns them"""
+        rng = np.random.default_rng(seed)
+        user_index = rng.integers(0, users, results)
+        assessment_index = rng.integers(0, assessments, results)
+        times = np.datetime64("2024-01-01T00:00", "ms") + rng.integers(0, 365 * 86_400_000, results)
+        # Zero-padded ids sort like their indexes, matching the database sort order
+        order = np.lexsort((times, assessment_index, user_index))
+        return {
+            "user_id": np.array([f"user-{i:07d}" for i in range(users)], dtype=object)[user_index[order]],
+            "assessment_id": np.array([f"assessment-{i:03d}" for i in range(assessments)], dtype=object)[assessment_index[order]],
+            "score": np.clip(rng.normal(70, 12, results), 0, 100).round(),
+            "completed_at": times[order]
+        }
+
+    def benchmark_compute(self, results: int = 1_000_000, users: int = 50_000, assessments: int = 5, seed: int = 0) -> dict:
+        """Time compute() alone on synthetic series, without a database; excludes loading and writing"""
+        series = self.synthetic_series(results, users, assessments, seed)
+
+        started = time.perf_counter()
+        docs = self.compute(series)
+        seconds = time.perf_counter() - started
+        return {
+            "measured": "compute",
+            "results": results,
+            "users": len(docs),
+            "compute_seconds": round(seconds, 3),
+            "results_per_second": round(results / seconds) if seconds else results
+        }
+
+    async def benchmark(self, db: AsyncIOMotorDatabase, results: int = 1_000_000, users: int = 50_000,
+                        assessments: int = 5, seed: int = 0) -> dict:
+        """
+        Time refresh() end to end on synthetic results seeded into `db`
+
+        `db` must be a scratch database: its assessment_results, user_trends
+        and job_runs are replaced. Load (the sorted Mongo scan into arrays),
+        compute and write (the user_trends bulk writes) are reported
+        separately, as the refresh job spends them.
+        """
+        series = self.synthetic_series(results, users, assessments, seed)
+        await db.assessment_results.drop()
+        await db.user_trends.drop()
+        await db.job_runs.drop()
+
+        started = time.perf_counter()
+        for start in range(0, results, TREND_READ_BATCH_SIZE):
+            stop = min(start + TREND_READ_BATCH_SIZE, results)
+            await db.assessment_results.insert_many([
+                {
+                    "user_id": series["user_id"][i],
+                    "assessment_id": series["assessment_id"][i],
+                    "score": float(series["score"][i]),
+                    "completed_at": series["completed_at"][i].astype(datetime)
+                }
+                for i in range(start, stop)
+            ], ordered=False)
+        # The sort load_series relies on
+        await db.assessment_results.create_index(
+            [("user_id", ASCENDING), ("assessment_id", ASCENDING), ("completed_at", ASCENDING)]
+        )
+        seed_seconds = time.perf_counter() - started
+
+        run = await self.refresh(db)
+        seconds = run["load_seconds"] + run["compute_seconds"] + run["write_seconds"]
+        return {
+            "measured": "refresh",
+            "results": run["results"],
+            "users": run["users"],
+            "seed_seconds": round(seed_seconds, 2),
+            "load_seconds": run["load_seconds"],
+            "compute_seconds": run["compute_seconds"],
+            "write_seconds": run["write_seconds"],
+            "seconds": round(seconds, 2),
+            "results_per_second": round(run["results"] / seconds) if seconds else run["results"]
+        }
+
+    async def _refresh_loop(self, db: AsyncIOMotorDatabase):
+        while True:
+            try:
+                delay = await self.seconds_until_due(db)
+                if delay <= 0:
+                    await self.refresh(db)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error computing trends: {str(e)}")
+                delay = self.refresh_interval
+            await asyncio.sleep(delay)
+
+    def start(self, db: AsyncIOMotorDatabase):
+        """Start the periodic trend refresh"""
+        if self.refresh_interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._refresh_loop(db))
+        logger.info(f"📈 Trend engine started (every {self.refresh_interval:.0f}s)")
+
+    async def stop(self):
+        """Cancel the periodic trend refresh"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+# Create singleton instance
+trend_engine = TrendEngine()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+SkillSphere Backend Load Test
+Drives start -> submit -> dashboard flows at a target concurrency and reports
+per-endpoint latency percentiles and throughput
+
+Run the backend locally against a local mongod with the fake LLM provider:
+
+    cd backend
+    LLM_PROVIDER=fake FAKE_LLM_LATENCY_MS=800 SCENARIO_POOL_DEPTH=0 \\
+        uvicorn server:app --port 8001 --workers 1
+
+Then:
+
+    python load_test.py --concurrency 50 --flows 500 --output baselines/current.json
+    python load_test.py --concurrency 50 --flows 500 --compare baselines/current.json
+"""
+
+import argparse
+import asyncio
+import aiohttp
+import json
+import logging
+import math
+import os
+import time
+from datetime import datetime
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "http://localhost:8001/api"
+ASSESSMENT_IDS = ["frontend-engineering", "backend-development", "system-design"]
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class LoadTester:
+    def __init__(self, base_url: str, concurrency: int, flows: int, user_pool: int):
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.flows = flows
+        self.user_pool = user_pool
+        self.latencies = {"start": [], "submit": [], "dashboard": []}
+        self.errors = {"start": 0, "submit": 0, "dashboard": 0}
+        self.session = None
+
+    async def _timed(self, endpoint: str, method: str, path: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            async with self.session.request(method, f"{self.base_url}{path}", **kwargs) as response:
+                body = await response.json()
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                if response.status != 200:
+                    self.errors[endpoint] += 1
+                    return None
+                self.latencies[endpoint].append(elapsed_ms)
+                return body
+        except Exception as e:
+            logger.debug(f"{endpoint} failed: {str(e)}")
+            self.errors[endpoint] += 1
+            return None
+
+    async def run_flow(self, flow_number: int):
+        """One candidate journey: start an assessment, submit it, load the dashboard"""
+        user_id = f"loadtest-user-{flow_number % self.user_pool}"
+        assessment_id = ASSESSMENT_IDS[flow_number % len(ASSESSMENT_IDS)]
+
+        started = await self._timed("start", "POST", "/assessments/start", json={
+            "assessment_id": assessment_id,
+            "user_id": user_id
+        })
+        if not started:
+            return
+
+        # Unique responses so the evaluation cache does not short-circuit the LLM path
+        await self._timed("submit", "POST", "/assessments/submit", json={
+            "session_id": started["session_id"],
+            "user_id": user_id,
+            "user_response": f"Load test response {flow_number}: use a cache-aside layer, "
+                             "paginate the API, add retries with backoff and measure p99 latency.",
+            "time_spent_minutes": 30
+        })
+
+        await self._timed("dashboard", "GET", f"/dashboard/overview?user_id={user_id}")
+
+    async def run(self) -> dict:
+        self.session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=300),
+            connector=aiohttp.TCPConnector(limit=self.concurrency)
+        )
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(flow_number: int):
+            async with semaphore:
+                await self.run_flow(flow_number)
+
+        logger.info(f"🚀 Running {self.flows} flows at concurrency {self.concurrency} against {self.base_url}")
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(bounded(i) for i in range(self.flows)))
+        finally:
+            await self.session.close()
+        duration = time.perf_counter() - started
+
+        return self.report(duration)
+
+    def report(self, duration: float) -> dict:
+        endpoints = {}
+        for endpoint, values in self.latencies.items():
+            values = sorted(values)
+            endpoints[endpoint] = {
+                "requests": len(values),
+                "errors": self.errors[endpoint],
+                "rps": round(len(values) / duration, 2) if duration else 0.0,
+                "p50_ms": round(percentile(values, 50), 1),
+                "p95_ms": round(percentile(values, 95), 1),
+                "p99_ms": round(percentile(values, 99), 1),
+                "max_ms": round(values[-1], 1) if values else 0.0
+            }
+
+        return {
+            "run_at": datetime.utcnow().isoformat(),
+            "base_url": self.base_url,
+            "concurrency": self.concurrency,
+            "flows": self.flows,
+            "duration_seconds": round(duration, 2),
+            "endpoints": endpoints
+        }
+
+
+def print_report(report: dict, baseline: dict = None):
+    logger.info("\n" + "="*80)
+    logger.info(f"📊 LOAD TEST REPORT - {report['flows']} flows @ concurrency {report['concurrency']} in {report['duration_seconds']}s")
+    logger.info("="*80)
+
+    for endpoint, stats in report["endpoints"].items():
+        line = (f"  {endpoint:<10} req={stats['requests']:<6} err={stats['errors']:<4} rps={stats['rps']:<8} "
+                f"p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms")
+        logger.info(line)
+
+        previous = (baseline or {}).get("endpoints", {}).get(endpoint)
+        if previous:
+            deltas = []
+            for key in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+                if previous[key]:
+                    change = (stats[key] - previous[key]) / previous[key] * 100
+                    deltas.append(f"{key} {change:+.1f}%")
+            logger.info(f"  {'':<10} vs baseline: {', '.join(deltas)}")
+
+    logger.info("="*80)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="SkillSphere backend load test")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--flows", type=int, default=200, help="Number of start -> submit -> dashboard flows")
+    parser.add_argument("--users", type=int, default=50, help="Distinct user ids to spread flows over")
+    parser.add_argument("--output", help="Write the report as a JSON baseline to this path")
+    parser.add_argument("--compare", help="Baseline JSON to diff the report against")
+    args = parser.parse_args()
+
+    tester = LoadTester(args.base_url, args.concurrency, args.flows, args.users)
+    report = await tester.run()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    print_report(report, baseline)
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"💾 Baseline written to {args.output}")
+
+if __name__ == "__main__":
+    asyncio.run(main())